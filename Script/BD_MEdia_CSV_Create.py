@@ -2,40 +2,48 @@ import os
 import sys
 import csv
 from datetime import datetime
-import sys
-import io
 
-# Windows stdout を UTF-8 に強制
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="")
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python scan_mp4_to_csv.py <root_path>", file=sys.stderr)
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python BD_MEdia_CSV_Create.py <root_path> [output.csv]", file=sys.stderr)
         sys.exit(1)
 
     root_path = sys.argv[1]
 
-    writer = csv.writer(sys.stdout, lineterminator="\n")
-    # CSVヘッダー
-    writer.writerow(["path", "file_name", "upload_date"])
-
-    for dirpath, dirnames, filenames in os.walk(root_path):
-        for filename in filenames:
-            if filename.lower().endswith(".mp4"):
-                full_path = os.path.join(dirpath, filename)
-
-                try:
-                    ctime = os.path.getctime(full_path)
-                    upload_date = datetime.fromtimestamp(ctime).strftime("%Y-%m-%d")
-                except OSError:
-                    # 取得失敗時は空欄（後で人間が補正）
-                    upload_date = ""
-
-                writer.writerow([
-                    dirpath,
-                    filename,
-                    upload_date
-                ])
+    # ファイルに書く場合は BOM つき UTF-8（Excel で開いても cp932 と誤認されない）。
+    # 標準出力の場合は、Windows のコンソール・リダイレクトでも UTF-8 になるように切り替える
+    if len(sys.argv) == 3:
+        out = open(sys.argv[2], "w", newline="", encoding="utf-8-sig")
+    else:
+        sys.stdout.reconfigure(encoding="utf-8", newline="")
+        out = sys.stdout
+
+    try:
+        writer = csv.writer(out, lineterminator="\n")
+        # CSVヘッダー
+        writer.writerow(["path", "file_name", "upload_date"])
+
+        for dirpath, dirnames, filenames in os.walk(root_path):
+            for filename in filenames:
+                if filename.lower().endswith(".mp4"):
+                    full_path = os.path.join(dirpath, filename)
+
+                    try:
+                        ctime = os.path.getctime(full_path)
+                        upload_date = datetime.fromtimestamp(ctime).strftime("%Y-%m-%d")
+                    except OSError:
+                        # 取得失敗時は空欄（後で人間が補正）
+                        upload_date = ""
+
+                    writer.writerow([
+                        dirpath,
+                        filename,
+                        upload_date
+                    ])
+    finally:
+        if out is not sys.stdout:
+            out.close()
 
 if __name__ == "__main__":
     main()
@@ -1,48 +1,15 @@
-import ctypes
-import string
-import os
+import lib.volume as volume
 
-# Windowsのドライブ種別
-DRIVE_TYPES = {
-    0: "Unknown",
-    1: "No Root Directory",
-    2: "Removable Disk",
-    3: "Local Disk",
-    4: "Network Drive",
-    5: "CD-ROM",
-    6: "RAM Disk"
-}
 
 def get_cdrom_drives():
-    """システム上のCD-ROMドライブを取得"""
-    drives = []
-    bitmask = ctypes.cdll.kernel32.GetLogicalDrives()
-    for i, letter in enumerate(string.ascii_uppercase):
-        if bitmask & (1 << i):
-            drive = f"{letter}:\\"
-            drive_type = ctypes.cdll.kernel32.GetDriveTypeW(ctypes.c_wchar_p(drive))
-            if drive_type == 5:  # CD-ROM
-                drives.append(drive)
-    return drives
+    """システム上のCD-ROMドライブを取得（Windows: D:\\ など、Linux: /dev/sr0 など）"""
+    return volume.list_optical_drives()
+
 
 def check_media(drive):
-    """ドライブにメディアがセットされているか確認"""
-    try:
-        volume_label = os.path.basename(os.path.normpath(drive))
-        volume_label = ctypes.create_unicode_buffer(1024)
-        ctypes.windll.kernel32.GetVolumeInformationW(
-            ctypes.c_wchar_p(drive),
-            volume_label,
-            ctypes.sizeof(volume_label),
-            None,
-            None,
-            None,
-            None,
-            0
-        )
-        return volume_label.value if volume_label.value else None
-    except Exception:
-        return None
+    """ドライブにメディアがセットされているか確認（セットされていればボリューム名を返す）"""
+    return volume.volume_label(drive)
+
 
 def user_confirm(prompt):
     """Yes/Noの確認"""
@@ -1,96 +1,139 @@
+import argparse
 import sqlite3
-import subprocess
 import sys
-import csv
 import os
-import hashlib
+
+import lib.csv_ingest as csv_ingest
+import lib.filename_parser as filename_parser
+import lib.sha256 as sha256
+import lib.stats as stats
+import lib.volume as volume
+from config.settings import IO_LIMITS
 
 DB_PATH = "database/media.db"
 WRITE_COUNT = 1
 
 
-def get_volume_label_windows(drive_letter):
+def ensure_source_id(conn):
     """
-    Windowsでボリュームラベルを取得
+    File.source_id 列と索引が無ければ追加し、既存レコードは file_name から埋める。
     """
-    try:
-        result = subprocess.check_output(
-            ["cmd", "/c", f"vol {drive_letter}"],
-            encoding="cp932",
-            errors="ignore"
-        )
-        for line in result.splitlines():
-            if "ボリューム ラベル" in line or "Volume label" in line:
-                return line.split(" : ")[-1].strip()
-    except Exception as e:
-        print("ボリュームラベル取得失敗:", e)
-    return None
-
-
-def calc_checksum(filepath):
-    sha256 = hashlib.sha256()
-    try:
-        with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                sha256.update(chunk)
-        return sha256.hexdigest()
-    except OSError:
-        return ""
+    cur = conn.cursor()
+    cols = {r[1] for r in cur.execute("PRAGMA table_info(File)")}
+    if "source_id" in cols:
+        return
+    print("File テーブルに source_id 列を追加します")
+    cur.execute("ALTER TABLE File ADD COLUMN source_id TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_file_source_id ON File(source_id)")
+    rows = cur.execute("SELECT file_id, file_name FROM File WHERE file_name IS NOT NULL").fetchall()
+    ids = filename_parser.parse_columns([r[1] for r in rows])["video_id"]
+    cur.executemany(
+        "UPDATE File SET source_id = ? WHERE file_id = ?",
+        [(vid, r[0]) for r, vid in zip(rows, ids) if vid],
+    )
+    conn.commit()
 
 
-def main():
-    if len(sys.argv) != 3:
-        print("Usage: python BD_Volume_and_File_Insert.py <drive_letter> <csv_path>")
-        sys.exit(1)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="BD の Volume と、CSV に並べたファイルを media.db に登録する")
+    parser.add_argument("drive", help="ドライブレター（例: D:）・マウントポイント・デバイス・.iso")
+    parser.add_argument("csv_path", help="BD_MEdia_CSV_Create.py で作った CSV")
+    parser.add_argument("--human-number", help="省略時は入力を求める")
+    parser.add_argument("--notes", help="省略時は入力を求める（--human-number を指定した場合は空）")
+    args = parser.parse_args(argv)
 
-    drive_letter = sys.argv[1]
-    csv_path = sys.argv[2]
+    csv_path = args.csv_path
 
     # --- Volume 登録 ---
-    volume_label = get_volume_label_windows(drive_letter)
-    if not volume_label:
+    info = volume.identify(args.drive)
+    if info is None or not info.label:
         print("ボリュームラベルを取得できませんでした")
         sys.exit(1)
 
-    print(f"検出された Volume Label: {volume_label}")
+    print(f"検出された Volume Label: {info.label} (UUID: {info.uuid})")
 
-    human_number = input("human_number（手入力）: ").strip()
-    notes = input("notes（手入力・省略可）: ").strip()
+    if args.human_number is not None:
+        human_number = args.human_number
+        notes = args.notes or ""
+    else:
+        human_number = input("human_number（手入力）: ").strip()
+        notes = args.notes if args.notes is not None else input("notes（手入力・省略可）: ").strip()
 
     conn = sqlite3.connect(DB_PATH)
+    ensure_source_id(conn)
+    stats.ensure_media_stats(conn)
     cur = conn.cursor()
 
     try:
-        cur.execute("""
-            INSERT INTO Volume (volume_label, human_number, notes, write_count)
-            VALUES (?, ?, ?, ?)
-        """, (volume_label, human_number, notes, WRITE_COUNT))
-        conn.commit()
-        volume_id = cur.lastrowid
+        volume_id, created = volume.register_volume(conn, info, human_number, notes, WRITE_COUNT)
+    except volume.VolumeConflict as e:
+        print(e)
+        conn.close()
+        sys.exit(1)
+    if created:
         print(f"Volume 登録完了 (volume_id={volume_id})")
-
-    except sqlite3.IntegrityError:
-        cur.execute("""
-            SELECT volume_id
-            FROM Volume
-            WHERE volume_label = ?
-              AND human_number = ?
-        """, (volume_label, human_number))
-        volume_id = cur.fetchone()[0]
+    else:
         print(f"既存 Volume を再利用 (volume_id={volume_id})")
 
 
     # --- File 登録 ---
-    with open(csv_path, newline='', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-
-        inserted = 0
-        skipped = 0
-
-        for line_no, row in enumerate(reader, start=2):
-            full_path = os.path.join(row["path"], row["file_name"])
-            checksum = calc_checksum(full_path)
-
+    # 1) CSV を読み、登録済み・重複の行を除いた登録対象を集める
+    # 2) 登録対象のチェックサムを計算し、終わった順に INSERT する。
+    #    同じ BD ドライブ（HDD）のファイルは 1 本ずつパス順に読む（IO_LIMITS）
+    inserted = 0
+    skipped = 0
+    duplicated = 0
+    pending = {}            # full_path -> [(line_no, row, source_id), ...]
+    pending_sources = {}    # この CSV で登録予定の動画ID -> file_name
+
+    # 文字コード（UTF-8 / BOM / cp932 の混在）は行ごとに判定し、読めない行・列数の違う行は
+    # 飛ばして <CSV>.errors.csv に書き出す
+    reader = csv_ingest.CsvReader(csv_path, required=["path", "file_name"])
+    for line_no, row in reader:
+        source_id = filename_parser.parse_filename(row["file_name"]).video_id
+
+        # 同じ Volume に同じ動画ID が登録済みなら、再ダウンロード分としてハッシュ計算せずにスキップ
+        if source_id:
+            cur.execute("""
+                SELECT volume_id, path, file_name
+                FROM File
+                WHERE source_id = ?
+            """, (source_id,))
+            same = cur.fetchall()
+            if (volume_id, row["path"], row["file_name"]) in same:
+                skipped += 1
+                continue
+            dup = [r for r in same if r[0] == volume_id]
+            if dup:
+                print(f"{line_no} 動画ID {source_id} は登録済みです（{dup[0][2]}）。スキップします。")
+                duplicated += 1
+                continue
+            if source_id in pending_sources and pending_sources[source_id] != row["file_name"]:
+                print(f"{line_no} 動画ID {source_id} は登録済みです（{pending_sources[source_id]}）。スキップします。")
+                duplicated += 1
+                continue
+            pending_sources[source_id] = row["file_name"]
+            for r in same:
+                if r[0] != volume_id:
+                    print(f"{line_no} 動画ID {source_id} は volume_id={r[0]} にも保存されています。")
+
+        full_path = os.path.join(row["path"], row["file_name"])
+        pending.setdefault(full_path, []).append((line_no, row, source_id))
+
+    print(reader.summary())
+    if reader.issues:
+        report = os.path.splitext(csv_path)[0] + ".errors.csv"
+        reader.write_report(report)
+        for issue in reader.issues:
+            print(f"{issue.line_no} {issue.reason}{'。スキップします。' if issue.skipped else ''}")
+        print(f"問題のあった行を {report} に書き出しました")
+
+    for full_path, checksum in sha256.hash_files(pending, IO_LIMITS):
+        try:
+            file_size = os.path.getsize(full_path)
+        except OSError:
+            file_size = None
+        for line_no, row, source_id in pending[full_path]:
             print(f"{line_no} 実行中です。")
             try:
                 cur.execute("""
@@ -104,21 +147,25 @@ def main():
                         owner,
                         readonly_flag,
                         encrypted_flag,
-                        notes
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        notes,
+                        source_id,
+                        file_size
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """, (
                     volume_id,
-                    row["channel_name"],
+                    row.get("channel_name"),
                     row["file_name"],
-                    row["upload_date"],
+                    row.get("upload_date"),
                     row["path"],
                     checksum,
                     row.get("owner"),
                     1 if row.get("readonly_flag", "").upper() == "TRUE" else 0,
                     1 if row.get("encrypted_flag", "").upper() == "TRUE" else 0,
-                    row.get("notes")
+                    row.get("notes"),
+                    source_id,
+                    file_size
                 ))
-                
+
                 if cur.rowcount == 0:
                     skipped += 1
                 else:
@@ -135,6 +182,8 @@ def main():
 
     print(f"  新規追加: {inserted}")
     print(f"  既存スキップ: {skipped}")
+    print(f"  動画ID重複スキップ: {duplicated}")
+    print(f"  CSV の問題でスキップ: {reader.skipped}")
 
     print("Volume + File の登録がすべて完了しました")
 
@@ -12,7 +12,8 @@ CREATE TABLE IF NOT EXISTS Volume (
     human_number TEXT,
     date_added DATE DEFAULT (DATE('now')),
     notes TEXT,
-    write_count INTEGER DEFAULT 1
+    write_count INTEGER DEFAULT 1,
+    volume_uuid TEXT
 )
 """)
 
@@ -22,6 +23,11 @@ CREATE UNIQUE INDEX IF NOT EXISTS idx_volume_unique
 ON Volume(volume_label, human_number);
 """)
 
+# 同じディスクの二重登録の検出用（lib/volume.py の register_volume）
+c.execute("""
+CREATE INDEX IF NOT EXISTS idx_volume_uuid ON Volume(volume_uuid);
+""")
+
 # File table（セキュリティ情報追加版）
 c.execute("""
 CREATE TABLE IF NOT EXISTS File (
@@ -36,14 +42,31 @@ CREATE TABLE IF NOT EXISTS File (
     readonly_flag BOOLEAN DEFAULT 0,
     encrypted_flag BOOLEAN DEFAULT 0,
     notes TEXT,
+    source_id TEXT,
+    file_size INTEGER,
     FOREIGN KEY(volume_id) REFERENCES Volume(volume_id)
 )
 """)
 
 # UNIQUE INDEX（重複防止）
 c.execute("""
-CREATE UNIQUE INDEX idx_file_unique ON File(volume_id, path, file_name);
-ON Volume(volume_label, human_number);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_file_unique ON File(volume_id, path, file_name);
+""")
+
+# yt-dlp の動画ID による再ダウンロード検出用
+c.execute("""
+CREATE INDEX IF NOT EXISTS idx_file_source_id ON File(source_id);
+""")
+
+# ボリューム・月ごとの集計（lib/stats.py が File のトリガで増減させる）
+c.execute("""
+CREATE TABLE IF NOT EXISTS MediaStats (
+    dim    TEXT    NOT NULL,
+    key    TEXT    NOT NULL,
+    files  INTEGER NOT NULL DEFAULT 0,
+    bytes  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dim, key)
+) WITHOUT ROWID
 """)
 
 conn.commit()
@@ -1,32 +1,16 @@
 import sqlite3
-import subprocess
 import sys
 from datetime import date
 
+import lib.volume as volume
+
 DB_PATH = "mediadb.sqlite"
 WRITE_COUNT = 1
 
-def get_volume_label_windows(drive_letter):
-    """
-    Windowsでボリュームラベルを取得
-    """
-    try:
-        result = subprocess.check_output(
-            ["cmd", "/c", f"vol {drive_letter}"],
-            encoding="cp932",
-            errors="ignore"
-        )
-        for line in result.splitlines():
-            if "ボリューム ラベル" in line or "Volume label" in line:
-                return line.split(" : ")[-1].strip()
-    except Exception as e:
-        print("ボリュームラベル取得失敗:", e)
-    return None
-
 def main():
-    drive_letter = input("ブルーレイドライブのドライブ文字（例: D:）を入力: ").strip()
+    drive_letter = input("ブルーレイドライブのドライブ文字（例: D: / /dev/sr0 / マウントポイント）を入力: ").strip()
 
-    volume_label = get_volume_label_windows(drive_letter)
+    volume_label = volume.volume_label(drive_letter)
     if not volume_label:
         print("ボリュームラベルを取得できませんでした")
         sys.exit(1)
@@ -0,0 +1,178 @@
+"""bench_catalog_sync.py
+
+カタログを別の PC へ運ぶ方法のベンチマーク（大きさと時間）。
+
+  - DB ファイルのコピー: videos.db + media.db をそのまま
+  - CSV: 表ごとに csv.writer で書き出し、取り込みは 1 行ずつ INSERT
+  - catalog_sync 全件: 列指向・圧縮（MMCB）で書き出し、主キーで一括 upsert
+  - catalog_sync 差分: 1% の行を更新した後の差分だけ
+
+使い方（例）:
+  python Script\\bench_catalog_sync.py                 # テスト用の DB を作って測る
+  python Script\\bench_catalog_sync.py --videos 200000
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import lib.catalog_sync as catalog_sync
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_dbs(root, videos):
+    vdb = os.path.join(root, "videos.db")
+    mdb = os.path.join(root, "media.db")
+    conn = sqlite3.connect(vdb)
+    with open(os.path.join(SCRIPT_DIR, "Create_Videos.txt"), encoding="utf-8") as f:
+        conn.executescript(f.read())
+    authors = [f"チャンネル{i}" for i in range(300)]
+    rows = []
+    for i in range(1, videos + 1):
+        rows.append((i, f"{i:08X}", f"動画のタイトル その{i} [{os.urandom(6).hex()}]", random.choice(authors),
+                     f"2025-{i % 12 + 1:02d}-01", 1, 0, f"2025-07-20 10:{i % 60:02d}:00",
+                     f"original_{i}.mp4", os.urandom(32).hex(), f"{i:08X}.mp4", os.urandom(6).hex()))
+    conn.executemany("""INSERT INTO Videos (id, file_id, title, author, publish_date, HDD_flag, RMB_flag, checkin_time,
+                                            original_filename, checksum, file_name, source_id)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+    conn.executemany("INSERT INTO HDD (file_id, folder_path) VALUES (?, ?)",
+                     [(r[1], f"media/2025/{r[0] % 12 + 1:02d}") for r in rows])
+    conn.executemany("INSERT INTO Playlist (video_id, title, thumbnail) VALUES (?, ?, ?)",
+                     [(r[0], r[2], f"thumbnail/{r[1]}.jpg") for r in rows])
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(mdb)
+    conn.executescript("""
+        CREATE TABLE Volume (volume_id INTEGER PRIMARY KEY AUTOINCREMENT, volume_label TEXT, human_number TEXT,
+            date_added DATE DEFAULT (DATE('now')), notes TEXT, write_count INTEGER DEFAULT 1, volume_uuid TEXT);
+        CREATE TABLE File (file_id INTEGER PRIMARY KEY AUTOINCREMENT, volume_id INTEGER, channel_name TEXT,
+            file_name TEXT, upload_date DATE, path TEXT, checksum TEXT, owner TEXT, readonly_flag BOOLEAN DEFAULT 0,
+            encrypted_flag BOOLEAN DEFAULT 0, notes TEXT, source_id TEXT);
+    """)
+    conn.executemany("INSERT INTO Volume (volume_label, human_number) VALUES (?, ?)",
+                     [(f"BD_{n:04d}", str(n)) for n in range(1, videos // 500 + 2)])
+    conn.executemany("""INSERT INTO File (volume_id, channel_name, file_name, upload_date, path, checksum, readonly_flag)
+                        VALUES (?, ?, ?, ?, ?, ?, 1)""",
+                     [(i // 500 + 1, random.choice(authors), f"{i:08X}.mp4", "2025-01-01", "/ch", os.urandom(32).hex())
+                      for i in range(videos)])
+    conn.commit()
+    conn.close()
+    return vdb, mdb
+
+
+def empty_copy(src_root, dst_root):
+    """同じスキーマの空の DB を作る。"""
+    os.makedirs(dst_root, exist_ok=True)
+    for name in ("videos.db", "media.db"):
+        src = sqlite3.connect(os.path.join(src_root, name))
+        dst = sqlite3.connect(os.path.join(dst_root, name))
+        # FTS5 の内部テーブル（SubtitleFTS_data など）は仮想テーブルを作ると一緒にできる
+        shadow = {r[1] for r in src.execute("PRAGMA table_list") if r[2] == "shadow"}
+        for name, sql in src.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND sql IS NOT NULL "
+                                     "AND name NOT LIKE 'sqlite_%'"):
+            if name not in shadow:
+                dst.execute(sql)
+        dst.commit()
+        src.close()
+        dst.close()
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, n)) for n in os.listdir(path))
+
+
+def csv_export(conns, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    for db, conn in conns.items():
+        for table, _ in catalog_sync.TABLES[db]:
+            cur = conn.execute(f"SELECT * FROM {table}")
+            with open(os.path.join(out_dir, f"{table}.csv"), "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow([d[0] for d in cur.description])
+                writer.writerows(cur)
+
+
+def csv_import(conns, in_dir):
+    for db, conn in conns.items():
+        for table, _ in catalog_sync.TABLES[db]:
+            with open(os.path.join(in_dir, f"{table}.csv"), newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                columns = next(reader)
+                sql = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+                for row in reader:
+                    conn.execute(sql, [v if v != "" else None for v in row])
+        conn.commit()
+
+
+def connect(root):
+    return {db: sqlite3.connect(os.path.join(root, f"{db}.db")) for db in ("videos", "media")}
+
+
+def timed(label, func, size_path=None):
+    t = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - t
+    size = f", {dir_size(size_path) / 2**20:7.2f} MiB" if size_path else ""
+    print(f"  {label:<28} {elapsed:6.2f} 秒{size}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="catalog export/import benchmark")
+    parser.add_argument("--videos", type=int, default=50000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    tmp = tempfile.mkdtemp(prefix="bench_catalog_sync_")
+    try:
+        src = os.path.join(tmp, "src")
+        os.makedirs(src)
+        print(f"テスト用の DB を作成中: Videos / HDD / Playlist / File 各 {args.videos} 行 ({tmp})")
+        make_dbs(src, args.videos)
+        db_bytes = sum(os.path.getsize(os.path.join(src, n)) for n in ("videos.db", "media.db"))
+        print(f"  {'DB ファイルのコピー':<28} {'':>9}  {db_bytes / 2**20:7.2f} MiB")
+
+        conns = connect(src)
+        timed("CSV 書き出し", lambda: csv_export(conns, os.path.join(tmp, "csv")), os.path.join(tmp, "csv"))
+        empty_copy(src, os.path.join(tmp, "dst_csv"))
+        dst = connect(os.path.join(tmp, "dst_csv"))
+        timed("CSV 取り込み", lambda: csv_import(dst, os.path.join(tmp, "csv")))
+
+        full = os.path.join(tmp, "full")
+        timed("catalog_sync 全件書き出し", lambda: catalog_sync.export_catalog(conns, full, fmt="mmcb"), full)
+        empty_copy(src, os.path.join(tmp, "dst"))
+        dst = connect(os.path.join(tmp, "dst"))
+        timed("catalog_sync 全件取り込み", lambda: catalog_sync.import_catalog(dst, full))
+
+        # 1% の行を更新して差分だけを運ぶ
+        watermarks = {db: catalog_sync.current_seq(conn) for db, conn in conns.items()}
+        changed = random.sample(range(1, args.videos + 1), max(1, args.videos // 100))
+        conns["videos"].executemany("UPDATE Playlist SET play_count = play_count + 1 WHERE video_id = ?",
+                                    [(i,) for i in changed])
+        conns["videos"].commit()
+        diff = os.path.join(tmp, "diff")
+        timed("catalog_sync 差分書き出し", lambda: catalog_sync.export_catalog(conns, diff, watermarks, fmt="mmcb"), diff)
+        timed("catalog_sync 差分取り込み", lambda: catalog_sync.import_catalog(dst, diff))
+
+        same = all(
+            conns[db].execute(f"SELECT * FROM {t} ORDER BY {pk}").fetchall()
+            == dst[db].execute(f"SELECT * FROM {t} ORDER BY {pk}").fetchall()
+            for db in conns for t, pk in catalog_sync.TABLES[db]
+        )
+        print(f"取り込み結果の一致: {'OK' if same else 'NG'}")
+        for c in list(conns.values()) + list(dst.values()):
+            c.close()
+        if not same:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
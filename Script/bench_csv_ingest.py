@@ -0,0 +1,116 @@
+"""bench_csv_ingest.py
+
+CSV 読み込み（lib/csv_ingest.py）の速さを、今までの読み方と、取り込み先の SQLite への
+INSERT の速さと比べる。読み込みが INSERT より十分速ければ、取り込みの足を引っ張らない。
+
+  - csv.DictReader（utf-8-sig）: 今までの読み方（cp932 の行があると止まる）
+  - CsvReader: UTF-8 / BOM つき UTF-8 / cp932 / UTF-8 と cp932 の混在
+  - SQLite INSERT: 読み込んだ行を File と同じ列の表に executemany する
+
+使い方（例）:
+  python Script\\bench_csv_ingest.py
+  python Script\\bench_csv_ingest.py --rows 500000
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import lib.csv_ingest as csv_ingest
+
+HEADER = ["channel_name", "path", "file_name", "upload_date", "owner", "readonly_flag", "encrypted_flag", "notes"]
+
+
+def make_rows(n):
+    words = ["ゆっくり実況", "作業用BGM", "Live", "【公式】", "ダイジェスト", "Boots", "雨の日", "#shorts"]
+    rows = []
+    for i in range(n):
+        channel = f"チャンネル{i % 300}"
+        title = " ".join(random.sample(words, 3))
+        rows.append([channel, f"G:\\{channel}\\2025", f"{title} [{os.urandom(6).hex()[:11]}].mp4",
+                     f"2025-{i % 12 + 1:02d}-01", "owner", "TRUE", "FALSE", "#tag"])
+    return rows
+
+
+def write_csv(path, rows, encoding, mixed=False):
+    with open(path, "wb") as f:
+        f.write(",".join(HEADER).encode(encoding) + b"\n")
+        for i, row in enumerate(rows):
+            line = ",".join(row) + "\n"
+            f.write(line.encode("cp932" if mixed and i % 50 == 0 else encoding))
+
+
+def read_dictreader(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return sum(1 for _ in csv.DictReader(f))
+
+
+def read_ingest(path):
+    reader = csv_ingest.CsvReader(path, required=["path", "file_name"])
+    return sum(1 for _ in reader)
+
+
+def insert_rows(path):
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE File (file_id INTEGER PRIMARY KEY, {', '.join(HEADER)})")
+    conn.execute("CREATE UNIQUE INDEX idx_file_unique ON File(path, file_name)")
+    reader = csv_ingest.CsvReader(path)
+    rows = [tuple(row[c] for c in HEADER) for _, row in reader]
+    t = time.perf_counter()
+    conn.executemany(f"INSERT OR IGNORE INTO File ({', '.join(HEADER)}) VALUES ({', '.join('?' * len(HEADER))})", rows)
+    conn.commit()
+    conn.close()
+    return len(rows), time.perf_counter() - t
+
+
+def report(label, size, count, elapsed):
+    print(f"  {label:<34} {elapsed:6.2f} 秒, {size / 2**20 / elapsed:7.1f} MiB/s, {count / elapsed:10,.0f} 行/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV ingest benchmark")
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    tmp = tempfile.mkdtemp(prefix="bench_csv_ingest_")
+    try:
+        rows = make_rows(args.rows)
+        files = {
+            "utf-8": os.path.join(tmp, "utf8.csv"),
+            "utf-8-sig": os.path.join(tmp, "utf8sig.csv"),
+            "cp932": os.path.join(tmp, "cp932.csv"),
+            "mixed": os.path.join(tmp, "mixed.csv"),
+        }
+        write_csv(files["utf-8"], rows, "utf-8")
+        write_csv(files["utf-8-sig"], rows, "utf-8-sig")
+        write_csv(files["cp932"], rows, "cp932")
+        write_csv(files["mixed"], rows, "utf-8", mixed=True)
+        size = os.path.getsize(files["utf-8"])
+        print(f"{args.rows} 行, {size / 2**20:.1f} MiB")
+
+        for label, func, path in (
+            ("csv.DictReader (utf-8-sig)", read_dictreader, files["utf-8-sig"]),
+            ("CsvReader utf-8", read_ingest, files["utf-8"]),
+            ("CsvReader utf-8-sig", read_ingest, files["utf-8-sig"]),
+            ("CsvReader cp932", read_ingest, files["cp932"]),
+            ("CsvReader 混在 (2% cp932)", read_ingest, files["mixed"]),
+        ):
+            t = time.perf_counter()
+            count = func(path)
+            report(label, os.path.getsize(path), count, time.perf_counter() - t)
+            if count != args.rows:
+                print(f"    行数が違います: {count}")
+
+        count, elapsed = insert_rows(files["utf-8"])
+        report("SQLite INSERT（参考）", size, count, elapsed)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""bench_filename_parser.py
+
+lib.filename_parser のベンチマークとサンプル CSV による確認。
+
+使い方（例）:
+  python Script\\bench_filename_parser.py
+  python Script\\bench_filename_parser.py --count 100000 --csv temp\\1925_20072025.csv
+"""
+import argparse
+import csv
+import random
+import re
+import string
+import sys
+import time
+from pathlib import Path
+
+import lib.filename_parser as filename_parser
+
+_ID_CHARS = string.ascii_letters + string.digits + "-_"
+
+
+def make_names(count: int, seed: int = 0):
+    """yt-dlp の出力に近い形式のファイル名を count 件生成する。"""
+    rnd = random.Random(seed)
+    names = []
+    for i in range(count):
+        title = f"video {i} " + "".join(rnd.choices(string.ascii_letters + " ()", k=rnd.randint(10, 60)))
+        vid = "".join(rnd.choices(_ID_CHARS, k=11))
+        kind = i % 4
+        if kind == 0:
+            names.append(f"{title} [{vid}](channel {i % 97}@handle{i % 97},2024{i % 12 + 1:02d}15).mp4")
+        elif kind == 1:
+            names.append(f"{title} [{vid}](channel@handle,20250101,00h03m{i % 60:02d}s).mkv")
+        elif kind == 2:
+            names.append(f"{title} [{vid}].webm")
+        else:
+            names.append(f"{title}.mp4")
+    return names
+
+
+def bench(names):
+    t = time.perf_counter()
+    for n in names:
+        filename_parser.parse_filename(n)
+    single = time.perf_counter() - t
+
+    t = time.perf_counter()
+    filename_parser.parse_filenames(names)
+    batch = time.perf_counter() - t
+
+    t = time.perf_counter()
+    filename_parser.parse_columns(names)
+    columns = time.perf_counter() - t
+
+    n = len(names)
+    print(f"parse_filename x{n}: {single:.3f}s ({n / single:,.0f} names/s)")
+    print(f"parse_filenames   : {batch:.3f}s ({n / batch:,.0f} names/s)")
+    print(f"parse_columns     : {columns:.3f}s ({n / columns:,.0f} names/s)")
+
+
+_ID_TOKEN = re.compile(r"\[[0-9A-Za-z_-]{11}\]")
+_DATE_TOKEN = re.compile(r"@[^,()]*,\d{8}[,)]")
+
+
+def check_corpus(csv_path: Path) -> int:
+    """サンプル CSV の file_name 列を解析し、ID と日付の取りこぼしを数える。"""
+    with open(csv_path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        names = [row["file_name"] for row in csv.DictReader(f)]
+
+    errors = 0
+    for name, meta in zip(names, filename_parser.parse_filenames(names)):
+        if _ID_TOKEN.search(name) and meta.video_id is None:
+            print(f"NG video_id: {name!r}")
+            errors += 1
+        if _DATE_TOKEN.search(name) and meta.publish_date is None:
+            print(f"NG publish_date: {name!r}")
+            errors += 1
+        if meta.author and meta.author.lower().endswith((".mp4", ".mkv", ".webm")):
+            print(f"NG author: {name!r} -> {meta.author!r}")
+            errors += 1
+    print(f"corpus: {len(names)} names, {errors} errors ({csv_path})")
+    return errors
+
+
+def main():
+    default_csv = Path(__file__).resolve().parent.parent / "temp" / "1925_20072025.csv"
+    parser = argparse.ArgumentParser(description="filename_parser benchmark")
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--csv", type=Path, default=default_csv)
+    args = parser.parse_args()
+
+    bench(make_names(args.count))
+    errors = check_corpus(args.csv) if args.csv.exists() else 0
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
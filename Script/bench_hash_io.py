@@ -0,0 +1,145 @@
+"""bench_hash_io.py
+
+チェックサム計算の読み込み方式のベンチマーク。
+
+  - 旧方式: 8 KiB ずつ、1 ファイルずつ順番に読む
+  - 単純な並列: デバイスを区別せず 8 スレッドで同時に読む
+  - hash_files: デバイスごとの並列数（IO_LIMITS）で 1 MiB ずつ読み、fadvise でキャッシュを捨てる
+
+各方式の前に posix_fadvise(DONTNEED) で対象ファイルをページキャッシュから追い出すので、
+root 権限なしでもディスクから読む状態で測れる（Linux のみ。Windows では 2 回目以降はキャッシュから読む）。
+ページキャッシュの増加量は /proc/meminfo の Cached で測る。
+
+使い方（例）:
+  python Script\\bench_hash_io.py                       # 一時フォルダにテスト用ファイルを作って測る
+  python Script\\bench_hash_io.py --files 64 --size-mb 32
+  python Script\\bench_hash_io.py --dir D:\\media\\2025  # 既存のフォルダ（再帰）を読む
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lib.device as device
+import lib.sha256 as sha256
+from config.settings import IO_LIMITS
+
+
+def old_checksum(filepath):
+    """変更前の実装（8 KiB ずつ読む）。"""
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(8192), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def make_tree(root, files, size_mb):
+    block = os.urandom(1024 * 1024)
+    paths = []
+    for i in range(files):
+        sub = os.path.join(root, f"{i % 8:02d}")
+        os.makedirs(sub, exist_ok=True)
+        path = os.path.join(sub, f"file{i:04d}.bin")
+        with open(path, "wb") as f:
+            for j in range(size_mb):
+                # ファイルごとに中身を変える（同じ内容だとストレージ側で重複排除されることがある）
+                f.write(block[: len(block) - 8] + i.to_bytes(4, "little") + j.to_bytes(4, "little"))
+            f.flush()
+            os.fsync(f.fileno())
+        paths.append(path)
+    return paths
+
+
+def list_tree(root):
+    return sorted(os.path.join(d, name) for d, _, names in os.walk(root) for name in names)
+
+
+def evict(paths):
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for p in paths:
+        fd = os.open(p, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def cached_kib():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("Cached:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def run_old(paths):
+    return {p: old_checksum(p) for p in paths}
+
+
+def run_naive_parallel(paths):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return dict(zip(paths, pool.map(old_checksum, paths)))
+
+
+def run_hash_files(paths):
+    return dict(sha256.hash_files(paths, IO_LIMITS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="checksum I/O benchmark")
+    parser.add_argument("--dir", help="既存のフォルダを読む（省略時は一時フォルダにファイルを作る）")
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--size-mb", type=int, default=16)
+    args = parser.parse_args()
+
+    tmp = None
+    if args.dir:
+        paths = list_tree(args.dir)
+    else:
+        tmp = tempfile.mkdtemp(prefix="bench_hash_io_")
+        print(f"テスト用ファイルを作成中: {args.files} x {args.size_mb} MiB ({tmp})")
+        paths = make_tree(tmp, args.files, args.size_mb)
+
+    try:
+        total = sum(os.path.getsize(p) for p in paths)
+        for name, files in sha256.group_by_device(paths).items():
+            print(f"デバイス {name}: {device.device_kind(name)}, 並列数 {device.concurrency_for(name, IO_LIMITS)}, "
+                  f"{len(files)} ファイル")
+        print(f"合計 {len(paths)} ファイル, {total / 2**20:.0f} MiB")
+
+        results = {}
+        for name, func in (
+            ("旧方式 (8 KiB, 逐次)", run_old),
+            ("単純な並列 (8 KiB, x8)", run_naive_parallel),
+            ("hash_files", run_hash_files),
+        ):
+            evict(paths)
+            before = cached_kib()
+            t = time.perf_counter()
+            results[name] = func(paths)
+            elapsed = time.perf_counter() - t
+            after = cached_kib()
+            cache = f", キャッシュ増加 {(after - before) / 1024:+7.0f} MiB" if before is not None else ""
+            print(f"  {name:<24} {elapsed:6.2f} 秒, {total / 2**20 / elapsed:7.1f} MiB/s{cache}")
+
+        expected = results["旧方式 (8 KiB, 逐次)"]
+        ok = all(r == expected for r in results.values())
+        print(f"チェックサムの一致: {'OK' if ok else 'NG'}")
+        if not ok:
+            sys.exit(1)
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""bench_make_base36.py
+
+lib.make_base36 のベンチマークと、並列採番時の衝突チェック。
+
+  - to_base36 の速度（旧実装との比較）
+  - IdAllocator.next_id の採番速度
+  - スレッド / プロセスを並べて同時に採番し、重複が無いこと・各採番元で単調増加であること
+  - decode_id でチェックイン時刻が戻ること、旧形式の ID と混ぜても時刻順に並ぶこと
+
+使い方（例）:
+  python Script\\bench_make_base36.py
+  python Script\\bench_make_base36.py --count 200000 --threads 8 --processes 4
+"""
+import argparse
+import multiprocessing
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import lib.make_base36 as make_base36
+
+
+def old_to_base36(n: int) -> str:
+    """変更前の実装（1 桁ずつ divmod）。"""
+    if n == 0:
+        return "0"
+    chars = []
+    while n:
+        n, r = divmod(n, 36)
+        chars.append(make_base36._ALPHABET[r])
+    return "".join(reversed(chars))
+
+
+def bench_encode(count: int) -> None:
+    base = make_base36.datetime_to_int(datetime(2025, 7, 20, 12, 0, 0)) * 36 ** 3
+    values = [base + i * 7919 for i in range(count)]
+    for name, func in (("old to_base36", old_to_base36), ("to_base36", make_base36.to_base36)):
+        t = time.perf_counter()
+        for v in values:
+            func(v)
+        elapsed = time.perf_counter() - t
+        print(f"{name:<14} {count / elapsed / 1e6:6.2f} M/s")
+    assert all(old_to_base36(v) == make_base36.to_base36(v) for v in values[:10000])
+
+
+def bench_allocator(count: int) -> None:
+    alloc = make_base36.IdAllocator(node=0)
+    t = time.perf_counter()
+    for _ in range(count):
+        alloc.next_id()
+    elapsed = time.perf_counter() - t
+    print(f"{'next_id':<14} {count / elapsed / 1e6:6.2f} M/s ({elapsed / count * 1e6:.2f} us/id)")
+
+
+def _allocate(alloc, count, out):
+    out.extend(alloc.next_id() for _ in range(count))
+
+
+def check_threads(threads: int, count: int) -> int:
+    """1 つの IdAllocator を複数スレッドで共有する。"""
+    alloc = make_base36.IdAllocator()
+    results = [[] for _ in range(threads)]
+    workers = [threading.Thread(target=_allocate, args=(alloc, count, out)) for out in results]
+    t = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t
+    return _report(f"threads x{threads}", results, elapsed)
+
+
+def _process_worker(args):
+    count, lock_dir = args
+    alloc = make_base36.IdAllocator(lock_dir=lock_dir)
+    return [alloc.next_id() for _ in range(count)]
+
+
+def check_processes(processes: int, count: int, method: str) -> int:
+    """プロセスごとに IdAllocator を作る（node はロックファイルで確保）。"""
+    ctx = multiprocessing.get_context(method)
+    t = time.perf_counter()
+    with ctx.Pool(processes) as pool:
+        results = pool.map(_process_worker, [(count, make_base36.NODE_LOCK_DIR)] * processes)
+    elapsed = time.perf_counter() - t
+    return _report(f"{method} x{processes}", results, elapsed)
+
+
+def check_fork_inherit(count: int) -> int:
+    """採番済みの IdAllocator を fork した子プロセスと親が同時に使っても重複しないこと。"""
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return 0
+    make_base36.new_file_id()
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(2) as pool:
+        async_result = pool.map_async(_inherit_worker, [count] * 2)
+        mine = [make_base36.new_file_id() for _ in range(count)]
+        results = async_result.get() + [mine]
+    return _report("fork inherit", results, 0.0)
+
+
+def _inherit_worker(count):
+    return [make_base36.new_file_id() for _ in range(count)]
+
+
+def _report(name, results, elapsed) -> int:
+    total = sum(len(r) for r in results)
+    unique = len({i for r in results for i in r})
+    monotonic = all(all(a < b for a, b in zip(r, r[1:])) for r in results)
+    rate = f"{total / elapsed / 1e6:6.2f} M/s" if elapsed else ""
+    print(f"{name:<14} {total} ids, duplicates {total - unique}, monotonic {monotonic} {rate}")
+    return (total - unique) + (0 if monotonic else 1)
+
+
+def check_decode() -> int:
+    errors = 0
+    alloc = make_base36.IdAllocator(node=5)
+    now = datetime(2025, 7, 20, 12, 34, 56, 789000)
+    ids = [alloc.next_id(now) for _ in range(3000)]   # 同じミリ秒で連番を使い切る
+
+    dt, node, seq = make_base36.decode_id(ids[0])
+    if (dt, node, seq) != (now, 5, 0):
+        print(f"NG decode: {ids[0]} -> {(dt, node, seq)}")
+        errors += 1
+    # 連番を使い切った分は 1ms 先の時刻になる
+    dt, node, seq = make_base36.decode_id(ids[-1])
+    if dt != now + timedelta(milliseconds=2) or node != 5:
+        print(f"NG overflow: {ids[-1]} -> {(dt, node, seq)}")
+        errors += 1
+
+    # 旧形式（11 桁）との混在
+    legacy = make_base36.make_timestamp_name(now)
+    if make_base36.decode_id(legacy)[0] != now or not ids[0].startswith(legacy):
+        print(f"NG legacy: {legacy}")
+        errors += 1
+    earlier = make_base36.make_timestamp_name(now - timedelta(milliseconds=1))
+    later = make_base36.make_timestamp_name(now + timedelta(seconds=1))
+    if sorted([later, ids[0], earlier]) != [earlier, ids[0], later]:
+        print("NG sort order with legacy ids")
+        errors += 1
+    print(f"decode         {'OK' if errors == 0 else 'NG'} ({ids[0]} -> {make_base36.decode_id(ids[0])})")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="make_base36 benchmark / collision check")
+    parser.add_argument("--count", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    bench_encode(args.count)
+    bench_allocator(args.count)
+
+    errors = check_decode()
+    per_worker = args.count // max(args.threads, args.processes)
+    errors += check_threads(args.threads, per_worker)
+    errors += check_processes(args.processes, per_worker, "spawn")
+    if "fork" in multiprocessing.get_all_start_methods():
+        errors += check_processes(args.processes, per_worker, "fork")
+    errors += check_fork_inherit(per_worker)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""bench_startup.py
+
+movie_mng の起動時間のベンチマーク。
+cron / フォルダ監視から「何もすることが無い」状態で呼ばれたときの所要時間と、
+各サブコマンドが読み込むモジュールの import 時間を測る。
+
+使い方（例）:
+  python Script\\bench_startup.py
+  python Script\\bench_startup.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+SUBCOMMAND_MODULES = {
+    "checkin": "checkin_tool",
+    "playlist": "playlist_register",
+    "bd-import": "BD_Volume_and_File_Insert",
+    "scan": "media_scan",
+    "ocr": "moji_okoshi",
+}
+
+
+def wall_time(cmd, cwd, runs):
+    times = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t)
+    return statistics.median(times) * 1000, proc.returncode
+
+
+def import_time(module, cwd):
+    """python -X importtime の累積値（ms）。import に失敗したら None。"""
+    code = f"import sys; sys.path.insert(0, {str(SCRIPT_DIR)!r}); import {module}"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    if proc.returncode != 0:
+        return None
+    for line in reversed(proc.stderr.splitlines()):
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="movie_mng startup benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    # 空の Checkin フォルダを持つ作業ディレクトリ（cron の空振りを想定）
+    work = tempfile.mkdtemp()
+    os.makedirs(os.path.join(work, "Checkin"))
+    py = sys.executable
+    mng = str(SCRIPT_DIR / "movie_mng.py")
+
+    print(f"起動時間（中央値, {args.runs} 回）")
+    cases = [
+        ("python -c pass", [py, "-c", "pass"]),
+        ("movie_mng --help", [py, mng, "--help"]),
+        ("movie_mng checkin (空)", [py, mng, "checkin"]),
+        ("checkin_tool.py (空)", [py, str(SCRIPT_DIR / "checkin_tool.py")]),
+    ]
+    for name, cmd in cases:
+        ms, rc = wall_time(cmd, work, args.runs)
+        print(f"  {name:<24} {ms:7.1f} ms  (exit {rc})")
+
+    print("サブコマンドのモジュールの import 時間（movie_mng は実行するサブコマンドの分だけ読み込む）")
+    for command, module in SUBCOMMAND_MODULES.items():
+        ms = import_time(module, work)
+        text = f"{ms:7.1f} ms" if ms is not None else "  (import できません: 依存パッケージ未インストール)"
+        print(f"  {command:<10} {module:<28} {text}")
+
+
+if __name__ == "__main__":
+    main()
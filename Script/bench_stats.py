@@ -0,0 +1,128 @@
+"""bench_stats.py
+
+ライブラリの統計のベンチマーク。
+
+  - その場で集計: Videos / HDD / Playlist を作者・月ごとに GROUP BY（全件をなめる）
+  - 集計表: LibraryStats をグループ数だけ読む（/api/stats と同じ queries.library_stats）
+  - トリガの負担: 集計表のトリガがある / 無い DB に、同じ動画を登録する時間
+  - 最後に、トリガで増減させた集計表と全件から作り直した集計表が一致するかを確かめる
+
+使い方（例）:
+  python Script\\bench_stats.py                  # テスト用の DB を作って測る
+  python Script\\bench_stats.py --videos 500000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import lib.stats as stats
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPT_DIR), "video_app"))
+import queries
+
+ADHOC = """
+    SELECT 'author' AS dim, v.author AS key, COUNT(*), SUM(v.file_size), SUM(v.duration),
+           COUNT(h.file_id), COUNT(p.video_id), SUM(p.favorite), SUM(p.play_count)
+    FROM Videos v LEFT JOIN HDD h ON h.file_id = v.file_id LEFT JOIN Playlist p ON p.video_id = v.id
+    GROUP BY v.author
+    UNION ALL
+    SELECT 'month', substr(COALESCE(v.publish_date, v.checkin_time), 1, 7), COUNT(*), SUM(v.file_size), SUM(v.duration),
+           COUNT(h.file_id), COUNT(p.video_id), SUM(p.favorite), SUM(p.play_count)
+    FROM Videos v LEFT JOIN HDD h ON h.file_id = v.file_id LEFT JOIN Playlist p ON p.video_id = v.id
+    GROUP BY 2
+"""
+
+
+def create_db(path):
+    conn = sqlite3.connect(path)
+    with open(os.path.join(SCRIPT_DIR, "Create_Videos.txt"), encoding="utf-8") as f:
+        conn.executescript(f.read())
+    return conn
+
+
+def video_rows(start, count, authors):
+    return [(f"{i:08X}", f"動画のタイトル その{i}", random.choice(authors), f"20{i % 10 + 15}-{i % 12 + 1:02d}-01",
+             "2025-07-20T10:00:00", os.urandom(32).hex(), f"{i:08X}.mp4",
+             random.randrange(50, 2000) * 2**20, random.uniform(60, 3600))
+            for i in range(start, start + count)]
+
+
+def insert_videos(conn, rows):
+    # checkin_tool（insert_video）と同じく、Videos と HDD を登録し、半分はプレイリストにも載せる
+    conn.executemany("""INSERT INTO Videos (file_id, title, author, publish_date, HDD_flag, checkin_time,
+                                            checksum, file_name, file_size, duration)
+                        VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?)""", rows)
+    conn.executemany("INSERT INTO HDD (file_id, folder_path) VALUES (?, 'media/2025/07/20')", [(r[0],) for r in rows])
+    conn.execute("""INSERT INTO Playlist (video_id, title, thumbnail, favorite, play_count)
+                    SELECT id, title, 'thumbnail/' || file_id || '.jpg', id % 7 = 0, id % 5
+                    FROM Videos WHERE file_id IN (SELECT file_id FROM HDD) AND id % 2 = 0
+                      AND id NOT IN (SELECT video_id FROM Playlist)""")
+    conn.commit()
+
+
+def timed(label, func, repeat=1):
+    t = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - t) / repeat
+    print(f"  {label:<36} {elapsed * 1000:9.2f} ms")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="library stats benchmark")
+    parser.add_argument("--videos", type=int, default=200000)
+    parser.add_argument("--insert", type=int, default=20000, help="トリガの負担を測るときに登録する動画数")
+    args = parser.parse_args()
+
+    random.seed(0)
+    authors = [f"チャンネル{i}" for i in range(300)]
+    tmp = tempfile.mkdtemp(prefix="bench_stats_")
+    try:
+        print(f"テスト用の DB を作成中: Videos {args.videos} 行 ({tmp})")
+        rows = video_rows(1, args.videos, authors)
+        plain = create_db(os.path.join(tmp, "plain.db"))
+        insert_videos(plain, rows)
+        shutil.copy(os.path.join(tmp, "plain.db"), os.path.join(tmp, "stats.db"))
+        conn = sqlite3.connect(os.path.join(tmp, "stats.db"))
+        timed("集計表の作成（rebuild）", lambda: stats.ensure_stats(conn))
+        groups = conn.execute("SELECT COUNT(*) FROM LibraryStats").fetchone()[0]
+
+        print(f"読み出し（{groups} グループ）")
+        adhoc = timed("その場で集計（GROUP BY）", lambda: plain.execute(ADHOC).fetchall(), repeat=3)
+        reader = queries.connect(os.path.join(tmp, "stats.db"))
+        table = timed("集計表（queries.library_stats）", lambda: queries.library_stats(reader, 50), repeat=50)
+        print(f"  -> {adhoc / table:.0f} 倍")
+
+        print(f"登録 {args.insert} 件（Videos + HDD + Playlist）")
+        more = video_rows(args.videos + 1, args.insert, authors)
+        base = timed("トリガ無し", lambda: insert_videos(plain, more))
+        with_stats = timed("集計表のトリガあり", lambda: insert_videos(conn, more))
+        print(f"  -> 1 件あたり +{(with_stats - base) / args.insert * 1e6:.1f} µs")
+
+        # 更新・削除も混ぜてから、作り直した結果と比べる
+        ids = random.sample(range(1, args.videos + args.insert + 1), 2000)
+        conn.executemany("UPDATE Videos SET author = ? WHERE id = ?", [(random.choice(authors), i) for i in ids[:1000]])
+        conn.executemany("UPDATE Playlist SET play_count = play_count + 1, favorite = 1 WHERE video_id = ?", [(i,) for i in ids[1000:1500]])
+        conn.executemany("DELETE FROM Videos WHERE id = ?", [(i,) for i in ids[1500:]])
+        conn.commit()
+        incremental = sorted(conn.execute("SELECT * FROM LibraryStats"))
+        stats.rebuild_stats(conn)
+        same = incremental == sorted(conn.execute("SELECT * FROM LibraryStats"))
+        print(f"トリガの集計と作り直しの一致: {'OK' if same else 'NG'}")
+        for c in (plain, conn, reader):
+            c.close()
+        if not same:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
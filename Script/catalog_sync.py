@@ -0,0 +1,130 @@
+"""catalog_sync.py
+
+カタログ（videos.db の Videos / HDD / Playlist と media.db の Volume / File）を、
+別の PC（Windows のチェックイン用 PC と Linux のサーバなど）へ運ぶために書き出し・取り込みする。
+DB ファイルをまるごとコピーしたり CSV を手で直したりせずに、変更した行だけを運べる。
+
+  - 書き出しは表ごとの列指向・圧縮ファイル（pyarrow があれば Parquet、無ければ MMCB）と manifest.json
+  - 書き出し先（--target）ごとに前回の位置（ウォーターマーク）を覚え、次回はそれ以降に
+    変更・削除した行だけを書き出す（lib/catalog_sync.py の SyncLog）
+  - 取り込みは主キーで一括 upsert し、削除された行は消す（DB ごとに 1 トランザクション）
+
+使い方（例）:
+  python Script\\catalog_sync.py export D:\\sync\\20250720 --target server      # 前回 server に書き出した後の差分
+  python Script\\catalog_sync.py export D:\\sync\\full --full                    # 全件
+  python Script/catalog_sync.py import /mnt/share/sync/20250720
+  python Script/catalog_sync.py status
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+#------------------------------
+# 初期変数の読み込み
+#------------------------------
+from config.settings import VIDEO_DB_PATH, MEDIA_DB_PATH
+# ファイル名のみ（例: my_script.py）
+script_name = os.path.basename(__file__)
+
+
+#------------------------------
+# ログ出力
+#------------------------------
+import lib.log as log
+import lib.catalog_sync as catalog_sync
+
+
+def open_dbs(args) -> dict:
+    conns = {}
+    if args.db in ("all", "videos"):
+        conns["videos"] = sqlite3.connect(args.videos_db)
+    if args.db in ("all", "media"):
+        conns["media"] = sqlite3.connect(args.media_db)
+    return conns
+
+
+def cmd_export(args, conns) -> int:
+    since = {}
+    for db, conn in conns.items():
+        catalog_sync.ensure_sync(conn, db)
+        if args.full:
+            since[db] = None
+        elif args.since is not None:
+            since[db] = args.since
+        else:
+            since[db] = catalog_sync.get_watermark(conn, args.target)
+
+    t = time.perf_counter()
+    manifest = catalog_sync.export_catalog(conns, args.out_dir, since, args.format)
+    elapsed = time.perf_counter() - t
+
+    for table in manifest["tables"]:
+        log.logprint(script_name, f"書き出し {table['name']}: {table['rows']} 行, 削除 {len(table['deleted'])} 件, "
+                                  f"{table['bytes']:,} bytes ({table['format']})")
+    for db, info in manifest["databases"].items():
+        catalog_sync.set_watermark(conns[db], args.target, info["watermark"])
+        start = "全件" if info["since"] is None else f"seq {info['since']}"
+        log.logprint(script_name, f"{db}: {start} -> seq {info['watermark']}（target={args.target}）")
+    log.logprint(script_name, f"書き出し完了: {args.out_dir} ({elapsed:.2f} 秒)")
+    return 0
+
+
+def cmd_import(args, conns) -> int:
+    t = time.perf_counter()
+    try:
+        counts = catalog_sync.import_catalog(conns, args.in_dir)
+    except (sqlite3.Error, ValueError, RuntimeError) as e:
+        log.logprint(script_name, f"取り込みに失敗しました（この DB の分は取り込んでいません）: {e}")
+        return 1
+    for table, (upserted, deleted) in counts.items():
+        log.logprint(script_name, f"取り込み {table}: {upserted} 行, 削除 {deleted} 件")
+    log.logprint(script_name, f"取り込み完了: {args.in_dir} ({time.perf_counter() - t:.2f} 秒)")
+    return 0
+
+
+def cmd_status(args, conns) -> int:
+    for db, conn in conns.items():
+        catalog_sync.ensure_sync(conn, db)
+        print(f"{db}: 現在の seq {catalog_sync.current_seq(conn)}")
+        for target, seq, exported_at in conn.execute("SELECT target, seq, exported_at FROM SyncWatermark ORDER BY target"):
+            print(f"  target={target}: seq {seq}（{exported_at}）")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="カタログを別の PC へ運ぶために書き出し・取り込みする")
+    parser.add_argument("--videos-db", default=str(VIDEO_DB_PATH))
+    parser.add_argument("--media-db", default=str(MEDIA_DB_PATH))
+    parser.add_argument("--db", choices=["all", "videos", "media"], default="all", help="対象の DB")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="変更した行（--full なら全件）をフォルダに書き出す")
+    p.add_argument("out_dir")
+    p.add_argument("--target", default="default", help="書き出し先の名前（ウォーターマークを target ごとに覚える）")
+    p.add_argument("--full", action="store_true", help="全件を書き出す")
+    p.add_argument("--since", type=int, help="この seq より後の変更を書き出す（ウォーターマークを無視する）")
+    p.add_argument("--format", choices=["auto", "parquet", "mmcb"], default="auto",
+                   help="auto は pyarrow があれば parquet、無ければ mmcb")
+
+    p = sub.add_parser("import", help="書き出したフォルダを取り込む")
+    p.add_argument("in_dir")
+
+    sub.add_parser("status", help="現在の seq と target ごとのウォーターマークを表示する")
+
+    args = parser.parse_args(argv)
+    conns = open_dbs(args)
+    try:
+        if args.command == "export":
+            return cmd_export(args, conns)
+        if args.command == "import":
+            return cmd_import(args, conns)
+        return cmd_status(args, conns)
+    finally:
+        for conn in conns.values():
+            conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,8 @@
-import ffmpeg
 import sys
 
 def has_cover_image(video_path):
+    # ffmpeg-python は使うときに読み込む（import しただけで読み込まないように）
+    import ffmpeg
     try:
         # ffprobeを実行してメタデータを取得
         probe = ffmpeg.probe(video_path)
@@ -24,8 +25,9 @@ def has_cover_image(video_path):
     return False
 
 # 使用例
-video_file = 'E:\MOVIE_MNG\media\2025\12\20\5jegi4g3ef3.mp4' # ここに動画ファイルのパスを指定してください
-if has_cover_image(video_file):
-    print(f"'{video_file}' にはカバー画像が埋め込まれています。")
-else:
-    print(f"'{video_file}' にはカバー画像が埋め込まれていません。")
+if __name__ == "__main__":
+    video_file = 'E:\MOVIE_MNG\media\2025\12\20\5jegi4g3ef3.mp4' # ここに動画ファイルのパスを指定してください
+    if has_cover_image(video_file):
+        print(f"'{video_file}' にはカバー画像が埋め込まれています。")
+    else:
+        print(f"'{video_file}' にはカバー画像が埋め込まれていません。")
@@ -26,7 +26,7 @@ import lib.log as log
 # --------------------
 # init 処理
 # --------------------
-from config.settings import VIDEO_DB_PATH, MEDIA_DIR, CHECKIN_DIR
+from config.settings import VIDEO_DB_PATH, MEDIA_DIR, CHECKIN_DIR, IO_LIMITS
 
 
 # --------------------
@@ -67,14 +67,34 @@ def collect_files(cwd: pathlib.Path, exts: Optional[List[str]] = None, pattern:
     return files
 
 
-def process_file(p: pathlib.Path, dest_root: pathlib.Path, db: Optional[DBWriter]) -> Dict[str, str]:
+def precompute_checksums(files: List[pathlib.Path], dbw) -> Dict[pathlib.Path, str]:
+    """
+    チェックサムを先にまとめて計算する。同じデバイスのファイルは IO_LIMITS の本数で読む
+    （HDD は 1 本ずつ順番に、SSD は並列に）。動画IDが登録済みのファイルは計算しない。
+    """
+    targets = []
+    for p in files:
+        video_id = filename_parser.parse_filename(p.name).video_id
+        if video_id and dbw.select_source_id(video_id) is not None:
+            continue
+        targets.append(p)
+
+    log.logprint(script_name, f"チェックサムの計算を開始。({len(targets)} 件)")
+    checksums = {}
+    for p, checksum in sha256.hash_files(targets, IO_LIMITS):
+        log.logprint(script_name, f"ファイルのチェックサム値（{checksum}) {p.name}")
+        checksums[p] = checksum
+    return checksums
+
+
+def process_file(p: pathlib.Path, dest_root: pathlib.Path, db: Optional[DBWriter], checksum: Optional[str] = None) -> Dict[str, str]:
     orig_name = p.name
     parsed = filename_parser.parse_filename(p.name)
     log.logprint(script_name, f"parsed = {parsed}")
 
-    # 1) Rename to base36 (use current time for uniqueness)
+    # 1) Rename to base36（同じミリ秒でも衝突しないよう、時刻 + node + 連番で採番する）
     checkin_time = datetime.now()
-    file_id = make_base36.make_timestamp_name(checkin_time)
+    file_id = make_base36.new_file_id(checkin_time)
     # We'll construct new name as file_id + original ext; but use rename_to_base36 to avoid collision logic duplication
 
     new_name = file_id + p.suffix
@@ -93,11 +113,24 @@ def process_file(p: pathlib.Path, dest_root: pathlib.Path, db: Optional[DBWriter
     moved_path = pathlib.Path(dest_root) / checkin_time.strftime("%Y") / checkin_time.strftime("%m") / checkin_time.strftime("%d") 
     # print(f"moved_oath = {moved_path}")
     
-    # チェックサム計算
     source_full_path = CHECKIN_DIR / orig_name
-    log.logprint(script_name, f"ファイルのチェックサム計算を開始。{source_full_path}")
-    check_sha256 = sha256.calc_checksum(source_full_path)
-    log.logprint(script_name, f"ファイルのチェックサム値（{check_sha256})")
+    target_full_path = moved_path / new_name
+
+    # 動画ID（source_id）が登録済みなら、ハッシュ計算せずに再ダウンロードとしてスキップする。
+    if parsed.video_id:
+        ret = db.select_source_id(parsed.video_id)
+        if ret is not None:
+            log.logprint(script_name, f"同じ動画ID（{parsed.video_id}）が登録済みです。処理をスキップします。({ret})")
+            return True, [file_id, parsed.title, parsed.author, parsed.publish_date, str(moved_path), checkin_time.isoformat(), p.name, "", new_name, parsed.video_id], [CHECKIN_DIR, orig_name, moved_path, new_name]
+
+    # チェックサム計算
+    db.journal_write(file_id, "hash", source_full_path, target_full_path)
+    if checksum:
+        check_sha256 = checksum
+    else:
+        log.logprint(script_name, f"ファイルのチェックサム計算を開始。{source_full_path}")
+        check_sha256 = sha256.calc_checksum(source_full_path)
+        log.logprint(script_name, f"ファイルのチェックサム値（{check_sha256})")
     
     # Videosテーブルからchecksumを検索する。
     log.logprint(script_name, "Videosテーブルからchecksum値を検索。")
@@ -112,19 +145,97 @@ def process_file(p: pathlib.Path, dest_root: pathlib.Path, db: Optional[DBWriter
         log.logprint(script_name, "対象ファイルが、登録されています。処理をスキップします。")
         skip_flag = True
     
+    db_data = [file_id, parsed.title, parsed.author, parsed.publish_date, str(moved_path), checkin_time.isoformat(), p.name, check_sha256, new_name, parsed.video_id]
+
     # ファイルの移動処理
     if skip_flag == False:
+        # 移動前にジャーナルへ登録内容を書き込んでおく（--recover で再実行できるように）
+        db.journal_write(file_id, "move", source_full_path, target_full_path, db_data)
         res = file_operation.move_to_date_folder(CHECKIN_DIR, orig_name, moved_path, new_name)
-    return skip_flag, [file_id, parsed.title, parsed.author, parsed.publish_date, str(moved_path), checkin_time.isoformat(), p.name, check_sha256, new_name], [CHECKIN_DIR, orig_name, moved_path, new_name]
+    else:
+        db.journal_clear(file_id)
+    return skip_flag, db_data, [CHECKIN_DIR, orig_name, moved_path, new_name]
+
+
+def recover_journal(dbw, rollback: bool = False) -> None:
+    """
+    CheckinJournal に残っている未完了のチェックインを処理する。
+
+    - 移動前（hash / move 未実施）のものはジャーナルを削除するだけ
+    - 移動元・移動先の両方にあるもの（移動の途中で停止）は、不完全な移動先を削除して移動前に戻す
+    - 移動済みで Videos 未登録のものは、rollback=False なら登録を再実行し、
+      rollback=True なら Checkin フォルダへ戻す
+    - 登録済みのものはジャーナルを削除する
+    """
+    pending = dbw.journal_pending()
+    if not pending:
+        log.logprint(script_name, "未完了のジャーナルはありません。")
+        return
+
+    for entry in pending:
+        file_id = entry["file_id"]
+        src = entry["src_path"]
+        dst = entry["dst_path"]
+        log.logprint(script_name, f"ジャーナル復旧 ({file_id}: {entry['step']}) {src} -> {dst}")
+
+        if dbw.select_file_id(file_id) is not None:
+            log.logprint(script_name, "Videos 登録済みのため、ジャーナルを削除します。")
+            dbw.journal_clear(file_id)
+            continue
+
+        if not dst.exists():
+            # 移動前に停止している。元ファイルはそのまま残っている。
+            if not src.exists():
+                log.logprint(script_name, f"移動元・移動先ともにファイルが見つかりません。({file_id})", level="Error")
+                continue
+            log.logprint(script_name, "ファイルは未移動のため、ジャーナルを削除します。")
+            dbw.journal_clear(file_id)
+            continue
+
+        if src.exists():
+            # 移動元が残っているなら移動は完了していない（別ドライブへの shutil.move はコピー後に元を消す）。
+            # 移動先はコピー途中の不完全なファイルなので削除し、元ファイルを残す。
+            dst.unlink()
+            log.logprint(script_name, f"移動途中のファイルを削除しました。元ファイルは未移動のままです。({dst})")
+            dbw.journal_clear(file_id)
+            continue
+
+        if rollback or entry["payload"] is None:
+            src.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(dst, src)
+            log.logprint(script_name, f"移動したファイルを元に戻しました。({src})")
+            dbw.journal_clear(file_id)
+            continue
+
+        d = entry["payload"]
+        dbw.journal_write(file_id, "insert", src, dst)
+        if dbw.insert_video(*d):
+            log.logprint(script_name, f"データ {d[1]} の登録を再実行しました。")
+            dbw.journal_clear(file_id)
 
 
 def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Checkin フォルダの動画を media/ へ移動し Videos.db に登録する")
+    parser.add_argument("--recover", action="store_true", help="中断したチェックインをジャーナルから再実行する")
+    parser.add_argument("--rollback", action="store_true", help="--recover 時、再実行せずにファイルを Checkin へ戻す")
+    args = parser.parse_args(argv)
+
     #cwd = pathlib.Path(".").resolve()
     log.logprint(script_name, "スクリプトを開始しました")
     log.logprint(script_name, "変数の初期化を開始")
     cwd = pathlib.Path("Checkin/").resolve()
     dest_root = pathlib.Path("media/").resolve()
 
+    if args.recover:
+        dbw = db.videosDBWriter(VIDEO_DB_PATH)
+        dbw.ensure_journal()
+        dbw.ensure_source_id()
+        dbw.ensure_playlist_queue()
+        recover_journal(dbw, rollback=args.rollback)
+        dbw.close()
+        log.logprint(script_name, "スクリプトを終了しました")
+        return
+
     log.logprint(script_name, "対象ファイルの確認")
     files = collect_files(cwd)
     if not files:
@@ -139,19 +250,33 @@ def main(argv: Optional[List[str]] = None):
         log.logprint(script_name, "テーブルが初期化されていません。", level="Error")
         log.logprint(script_name, "スクリプトを終了します。")
         sys.exit()
+    dbw.ensure_journal()
+    dbw.ensure_source_id()
+    dbw.ensure_playlist_queue()
+    if dbw.journal_pending():
+        log.logprint(script_name, "未完了のチェックインがあります。先に --recover を実行してください。", level="Error")
+        dbw.close()
+        sys.exit(1)
+
+    checksums = precompute_checksums(files, dbw)
 
     results = []
     for f in files:
+        file_info = None
+        db_data = None
         try:
             log.logprint(script_name, f"対象ファイル名。{f}")
-            skip_flag, db_data, file_info = process_file(f, dest_root, dbw)
+            skip_flag, db_data, file_info = process_file(f, dest_root, dbw, checksums.get(f))
             # DB処理
             if skip_flag == False:
                 print(db_data)
                 log.logprint(script_name, f"データ {db_data[1]} の追加処理開始")
-                dbw = db.videosDBWriter(VIDEO_DB_PATH)
+                dbw.journal_write(db_data[0], "insert", file_info[0] / file_info[1], file_info[2] / file_info[3])
                 #                       file_id     title        author      
-                ret = dbw.insert_video(db_data[0], db_data[1], db_data[2], db_data[3], db_data[4], db_data[5], db_data[6], db_data[7], db_data[8])
+                ret = dbw.insert_video(db_data[0], db_data[1], db_data[2], db_data[3], db_data[4], db_data[5], db_data[6], db_data[7], db_data[8], db_data[9])
+                if not ret:
+                    raise RuntimeError(f"Videos への登録に失敗しました。({db_data[0]})")
+                dbw.journal_clear(db_data[0])
                 log.logprint(script_name, f"データ {db_data[1]} の追加処理終了")
                 res = {
                     "original": db_data[6],
@@ -167,14 +292,22 @@ def main(argv: Optional[List[str]] = None):
                 log.logprint(script_name, "データ追加処理はスキップします。")
         except Exception as e:
             log.logprint(script_name,f"データのインサート処理でエラーが発生しました。 {e}", level="Error")
-            log.logprint(script_name,"移動したファイルを元に戻します。")
+            if file_info is None:
+                # process_file の途中で失敗。ジャーナルが残っていれば --recover で処理する。
+                continue
             target_full_path = file_info[2] / file_info[3]
             orig_full_path = file_info[0] / file_info[1]
-            shutil.move(target_full_path, orig_full_path)
-            log.logprint(script_name,f"戻したファイル ({target_full_path})")
-            log.logprint(script_name, "スクリプトを終了しました")
+            if target_full_path.exists():
+                log.logprint(script_name,"移動したファイルを元に戻します。")
+                shutil.move(target_full_path, orig_full_path)
+                log.logprint(script_name,f"戻したファイル ({target_full_path})")
+            dbw.journal_clear(db_data[0])
 
     if dbw:
+        # Videos の変更を動画一覧（gzip 済み JSON ページ）に反映する
+        dbw.refresh_listing()
+        # 統計（library_stats.py）用に、登録した動画のサイズを記録する
+        dbw.fill_stats_sizes([res["file_id"] for res in results])
         dbw.close()
     log.logprint(script_name, "スクリプトを終了しました")
 
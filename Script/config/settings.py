@@ -13,3 +13,27 @@ THUMBNAIL_DIR = BASE_DIR / "thumbnail"
 # database
 VIDEO_DB_PATH = BASE_DIR / "database" / "videos.db"
 MEDIA_DB_PATH  = BASE_DIR / "database" / "media.db"
+
+# near-duplicate detection (pHash)
+PHASH_FRAMES = 8      # 1 動画あたりのサンプルフレーム数
+PHASH_THRESHOLD = 6   # 同一とみなすハミング距離の上限
+
+# preview sprites / storyboards
+PREVIEW_FRAMES = 60   # スプライト 1 枚あたりのコマ数（10 列で並べる）
+PREVIEW_WORKERS = 4   # 同時に動かす ffmpeg の数
+
+# background jobs (job_runner.py)
+JOB_WORKERS = 4       # 1 つのランナーで同時に実行するジョブ数の上限
+JOB_LIMITS = {        # 資源ごとの同時実行数（"disk" は物理ディスク 1 台ごと）
+    "disk": 1,
+    "ffmpeg": 2,
+    "ocr": 1,
+}
+
+# disk I/O (hashing)
+IO_LIMITS = {         # デバイスごとの同時読み込み数。種類（optical / hdd / ssd / unknown）かデバイス名（"sdb"）で指定
+    "optical": 1,
+    "hdd": 1,
+    "ssd": 4,
+    "unknown": 1,
+}
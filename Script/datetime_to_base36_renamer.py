@@ -9,42 +9,20 @@
     指定ファイルをリネーム（同名衝突時はサフィックス追加）
 - rename_files_in_dir(dirpath, pattern="*", **kwargs):
     ディレクトリ中の複数ファイルを順にリネーム（glob パターン指定可）
+- plan_renames / write_plan / execute_plan / undo_plan:
+    一括リネームを計画ファイル・取り消しファイル付きで行う（--dry-run, --plan, --undo）
 """
 
 from __future__ import annotations
+import fnmatch
 import os
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import pathlib
 import typing
-import glob
-
-_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
-
-def to_base36(n: int) -> str:
-    """非負整数 n を base36 小文字文字列に変換。0 は '0' を返す。"""
-    if n < 0:
-        raise ValueError("n must be non-negative")
-    if n == 0:
-        return "0"
-    chars = []
-    base = 36
-    while n:
-        n, r = divmod(n, base)
-        chars.append(_ALPHABET[r])
-    return "".join(reversed(chars))
-
-def datetime_to_int(dt: datetime) -> int:
-    """datetime -> 整数 YYYYMMDDHHMMSSmmm を返す（ミリ秒3桁）。"""
-    ms = int(dt.microsecond / 1000)  # ミリ秒
-    s = dt.strftime("%Y%m%d%H%M%S")
-    return int(f"{s}{ms:03d}")
-
-def make_timestamp_name(dt: typing.Optional[datetime] = None) -> str:
-    """datetime (省略時=now) を base36 に変換したファイル名ベースを返す。"""
-    if dt is None:
-        dt = datetime.now()
-    n = datetime_to_int(dt)
-    return to_base36(n)
+
+# 36進変換・日時の変換は lib.make_base36 と共通（3 桁ずつ表引きする高速版）
+from lib.make_base36 import to_base36, datetime_to_int, make_timestamp_name
 
 def _unique_target_path(target_path: pathlib.Path, allow_suffix: bool = True) -> pathlib.Path:
     """target_path が存在する場合、_1, _2... を付けてユニークにする（allow_suffix True の場合）。"""
@@ -81,6 +59,114 @@ def rename_file_to_timestamp(path: typing.Union[str, os.PathLike],
     p.rename(target)
     return target
 
+# --------------------
+# 一括リネーム（計画 -> 実行 -> 取り消し）
+# ディレクトリは os.scandir で 1 回だけ読み、新しい名前は更新日時順に
+# 基準時刻 + 1ms ずつ割り当てる。既存の名前との重複はメモリ上の集合で判定するので、
+# 実行中に exists() を呼ぶことは無い。
+# 実行前に計画（.plan.tsv）と取り消し用（.undo.tsv）をディレクトリに書き出しておき、
+# 途中で止まっても undo_plan で元の名前に戻せる。
+# --------------------
+STAT_WORKERS = 8
+
+def _scan_files(dirp: pathlib.Path, pattern: str, sort_by: str) -> list[str]:
+    """pattern に一致するファイル名を sort_by の順に返す（. で始まるファイルは除く）。"""
+    with os.scandir(dirp) as it:
+        entries = [e for e in it if not e.name.startswith(".") and fnmatch.fnmatch(e.name, pattern) and e.is_file()]
+    if sort_by == "mtime":
+        # Windows では DirEntry.stat() は scandir の結果を使うだけだが、
+        # Linux ではファイルごとに stat するので、件数が多ければスレッドで並列に行う
+        # （ThreadPoolExecutor.map は chunksize を無視するので、自分でまとめて渡す）
+        if len(entries) > 1000:
+            size = (len(entries) + STAT_WORKERS - 1) // STAT_WORKERS
+            chunks = [entries[i:i + size] for i in range(0, len(entries), size)]
+            with ThreadPoolExecutor(max_workers=STAT_WORKERS) as pool:
+                mtimes = [m for part in pool.map(lambda c: [e.stat().st_mtime for e in c], chunks) for m in part]
+        else:
+            mtimes = [e.stat().st_mtime for e in entries]
+        entries = [e for _, _, e in sorted(zip(mtimes, range(len(entries)), entries))]
+    elif sort_by == "name":
+        entries.sort(key=lambda e: e.name)
+    return [e.name for e in entries]
+
+def plan_renames(dirpath: typing.Union[str, os.PathLike],
+                 pattern: str = "*",
+                 keep_ext: bool = True,
+                 sort_by: str = "mtime",
+                 start: typing.Optional[datetime] = None) -> list[tuple[str, str]]:
+    """
+    (元の名前, 新しい名前) のリストを返す。ファイルには触らない。
+    新しい名前は start（省略時=now）から 1ms ずつずらした日時の base36 で、
+    ディレクトリ内の既存の名前・割り当て済みの名前と重ならないものを選ぶ。
+    """
+    dirp = pathlib.Path(dirpath)
+    if not dirp.is_dir():
+        raise NotADirectoryError(dirp)
+    with os.scandir(dirp) as it:
+        taken = {e.name for e in it}
+
+    t = start or datetime.now()
+    step = timedelta(milliseconds=1)
+    plan = []
+    for name in _scan_files(dirp, pattern, sort_by):
+        ext = os.path.splitext(name)[1] if keep_ext else ""
+        while True:
+            new_name = make_timestamp_name(t) + ext
+            t += step
+            if new_name not in taken:
+                break
+        taken.add(new_name)
+        plan.append((name, new_name))
+    return plan
+
+def write_plan(dirpath: typing.Union[str, os.PathLike], plan: list[tuple[str, str]]) -> tuple[pathlib.Path, pathlib.Path]:
+    """計画と取り消し用のファイルを書き、(plan_path, undo_path) を返す。"""
+    dirp = pathlib.Path(dirpath)
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    plan_path = dirp / f".base36_rename_{stamp}.plan.tsv"
+    undo_path = dirp / f".base36_rename_{stamp}.undo.tsv"
+    for path, rows in ((plan_path, plan), (undo_path, [(new, old) for old, new in reversed(plan)])):
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.writelines(f"{a}\t{b}\n" for a, b in rows)
+            f.flush()
+            os.fsync(f.fileno())
+    return plan_path, undo_path
+
+def read_plan(plan_path: typing.Union[str, os.PathLike]) -> list[tuple[str, str]]:
+    with open(plan_path, encoding="utf-8") as f:
+        return [tuple(line.rstrip("\n").split("\t")) for line in f if line.strip()]
+
+def execute_plan(dirpath: typing.Union[str, os.PathLike], plan: list[tuple[str, str]]) -> list[pathlib.Path]:
+    """
+    計画どおりにリネームする。既に新しい名前になっているもの（再実行時）は飛ばす。
+    戻り値: 新しい Path のリスト
+    """
+    dirp = pathlib.Path(dirpath)
+    results = []
+    for old, new in plan:
+        try:
+            os.rename(dirp / old, dirp / new)
+        except FileNotFoundError:
+            if not (dirp / new).exists():
+                raise
+        results.append(dirp / new)
+    return results
+
+def undo_plan(dirpath: typing.Union[str, os.PathLike], undo_path: typing.Union[str, os.PathLike]) -> int:
+    """
+    取り消し用ファイルに従って元の名前に戻す。途中までしか実行されていない計画にも使える
+    （リネーム済みのものだけを戻す）。戻した件数を返す。
+    """
+    dirp = pathlib.Path(dirpath)
+    count = 0
+    for new, old in read_plan(undo_path):
+        try:
+            os.rename(dirp / new, dirp / old)
+            count += 1
+        except FileNotFoundError:
+            pass
+    return count
+
 def rename_files_in_dir(dirpath: typing.Union[str, os.PathLike],
                         pattern: str = "*",
                         keep_ext: bool = True,
@@ -90,23 +176,20 @@ def rename_files_in_dir(dirpath: typing.Union[str, os.PathLike],
     ディレクトリ内の複数ファイルを順にリネームする。
     - pattern: glob パターン（例: '*.png'）
     - sort_by: 'mtime' (更新時刻) or 'name' (名前) or 'none'
+    - allow_collision_suffix: 互換のために残している（計画時に重複しない名前を選ぶので使わない）
+    計画と取り消し用のファイルを書いてから実行し、成功したら両方を消す。
     戻り値: 新しい Path のリスト（処理順）
     """
-    dirp = pathlib.Path(dirpath)
-    if not dirp.is_dir():
-        raise NotADirectoryError(dirp)
-    files = [pathlib.Path(p) for p in glob.glob(str(dirp / pattern))]
-    if sort_by == "mtime":
-        files.sort(key=lambda p: p.stat().st_mtime)
-    elif sort_by == "name":
-        files.sort(key=lambda p: p.name)
-    # else leave unsorted
-
-    results = []
-    for f in files:
-        if f.is_file():
-            newp = rename_file_to_timestamp(f, dt=None, keep_ext=keep_ext, allow_collision_suffix=allow_collision_suffix)
-            results.append(newp)
+    plan = plan_renames(dirpath, pattern=pattern, keep_ext=keep_ext, sort_by=sort_by)
+    if not plan:
+        return []
+    plan_path, undo_path = write_plan(dirpath, plan)
+    try:
+        results = execute_plan(dirpath, plan)
+    except OSError as e:
+        raise OSError(f"リネームが途中で失敗しました。--undo {undo_path} で元に戻せます。({e})") from e
+    plan_path.unlink()
+    undo_path.unlink()
     return results
 
 # --- 簡単なコマンドラインテスト用 ---
@@ -118,14 +201,30 @@ if __name__ == "__main__":
     parser.add_argument("--pattern", default="*", help="when --dir: glob pattern (default '*')")
     parser.add_argument("--no-ext", action="store_true", help="do not keep original extension")
     parser.add_argument("--no-suffix", action="store_true", help="do not add _1/_2 when collision")
+    parser.add_argument("--dry-run", action="store_true", help="when --dir: only write the plan/undo files")
+    parser.add_argument("--plan", help="when --dir: execute an existing .plan.tsv")
+    parser.add_argument("--undo", help="when --dir: revert using an .undo.tsv")
     args = parser.parse_args()
 
     for p in args.paths:
         if args.dir:
             try:
-                res = rename_files_in_dir(p, pattern=args.pattern, keep_ext=not args.no_ext, allow_collision_suffix=(not args.no_suffix))
-                for r in res:
-                    print("RENAMED:", r)
+                if args.undo:
+                    print("RESTORED:", undo_plan(p, args.undo))
+                elif args.plan:
+                    for r in execute_plan(p, read_plan(args.plan)):
+                        print("RENAMED:", r)
+                elif args.dry_run:
+                    plan = plan_renames(p, pattern=args.pattern, keep_ext=not args.no_ext)
+                    plan_path, undo_path = write_plan(p, plan)
+                    for old, new in plan:
+                        print("PLAN:", old, "->", new)
+                    print("PLAN FILE:", plan_path)
+                    print("UNDO FILE:", undo_path)
+                else:
+                    res = rename_files_in_dir(p, pattern=args.pattern, keep_ext=not args.no_ext, allow_collision_suffix=(not args.no_suffix))
+                    for r in res:
+                        print("RENAMED:", r)
             except Exception as e:
                 print("ERROR:", p, e)
         else:
@@ -0,0 +1,207 @@
+"""iso_import.py
+
+BD のバックアップのディスクイメージ（.iso）を、マウントせずに media.db へまとめて登録する。
+イメージの ISO9660 / UDF のディレクトリを直接読み（lib/disc_image.py）、
+ボリュームを Volume に、動画ファイルを File に登録する（root 権限も入力も要らない）。
+
+  - ボリュームの登録は volume_register.py と同じ（同じ UUID・ラベルなら登録済みのものを使う）
+  - 登録済みのファイル（volume_id, path, file_name が同じ）はチェックサムを計算しない
+  - チェックサムはイメージを mmap して、ファイルの範囲をそのまま読む。同じディスクにある
+    イメージは 1 つずつ、イメージの中は先頭から順に読む（IO_LIMITS）
+
+File の列:
+  path         イメージ内のフォルダ（"/チャンネル名/..."）
+  channel_name イメージ内の最初のフォルダ名（直下のファイルは空）
+  upload_date  ファイルの更新日
+
+使い方（例）:
+  python Script/iso_import.py /archive/iso/BD001.iso /archive/iso/BD002.iso
+  python Script/iso_import.py --iso-dir /archive/iso [--human-number "{name}"] [--dry-run]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from typing import List, Optional, Tuple
+
+#------------------------------
+# 初期変数の読み込み
+#------------------------------
+from config.settings import MEDIA_DB_PATH, IO_LIMITS
+# ファイル名のみ（例: my_script.py）
+script_name = os.path.basename(__file__)
+
+
+#------------------------------
+# ログ出力
+#------------------------------
+import lib.log as log
+
+import lib.device as device
+import lib.filename_parser as filename_parser
+import lib.sha256 as sha256
+import lib.stats as stats
+import lib.volume as volume
+from lib.disc_image import DiscImage, DiscImageError, DiscEntry
+from lib.file_operation import VIDEO_EXTS
+from BD_Volume_and_File_Insert import ensure_source_id
+from volume_register import human_number_for
+
+WRITE_COUNT = 1
+
+
+# --------------------
+# イメージの読み取り
+# --------------------
+def is_video_entry(entry: DiscEntry) -> bool:
+    return os.path.splitext(entry.name)[1].lower().lstrip(".") in VIDEO_EXTS
+
+
+def read_image(path: str) -> Tuple[volume.VolumeInfo, List[DiscEntry]]:
+    """ボリューム情報と、動画ファイルの一覧（イメージ内の位置順）を返す。"""
+    with DiscImage(path) as img:
+        info = volume.VolumeInfo(img.label, img.uuid, img.fs_type,
+                                 image=os.path.abspath(path), source="descriptor")
+        entries = sorted((e for e in img.walk() if is_video_entry(e)), key=lambda e: e.offset)
+    return info, entries
+
+
+def hash_image(path: str, entries: List[DiscEntry]) -> List[Tuple[DiscEntry, str]]:
+    with DiscImage(path) as img:
+        return [(entry, img.checksum(entry)) for entry in entries]
+
+
+def file_row(volume_id: int, entry: DiscEntry, checksum: str) -> tuple:
+    parts = entry.path.split("/")
+    channel_name = parts[0] if len(parts) > 1 else None
+    upload_date = entry.mtime.astimezone().strftime("%Y-%m-%d") if entry.mtime else None
+    source_id = filename_parser.parse_filename(entry.name).video_id
+    return (volume_id, channel_name, entry.name, upload_date, "/" + entry.directory,
+            checksum, None, 1, 0, None, source_id, entry.size)
+
+
+def insert_files(conn: sqlite3.Connection, rows: List[tuple]) -> int:
+    # 件数は rowcount で数える（total_changes はトリガが書いた集計表・変更記録の行も数えてしまう）
+    cur = conn.cursor()
+    cur.executemany("""
+        INSERT OR IGNORE INTO File (
+            volume_id, channel_name, file_name, upload_date, path, checksum,
+            owner, readonly_flag, encrypted_flag, notes, source_id, file_size
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    return cur.rowcount
+
+
+def registered_files(conn: sqlite3.Connection, volume_id: int) -> set:
+    return set(conn.execute("SELECT path, file_name FROM File WHERE volume_id = ?", (volume_id,)))
+
+
+# --------------------
+# まとめて登録
+# --------------------
+def collect_images(targets: List[str], iso_dirs: List[str]) -> List[str]:
+    images = list(targets)
+    for directory in iso_dirs:
+        images += [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                   if name.lower().endswith(".iso")]
+    return images
+
+
+def import_images(conn: Optional[sqlite3.Connection], images: List[str], human_number: str = "{name}",
+                  notes: str = "", limits=IO_LIMITS) -> Tuple[int, int, int]:
+    """(新規に登録したファイル数, 登録済みで飛ばしたファイル数, 読めなかったイメージ数)。conn が None なら一覧を表示するだけ。"""
+    inserted = skipped = errors = 0
+    pending = {}    # イメージ -> (volume_id, 登録するエントリ)
+    if conn is not None:
+        stats.ensure_media_stats(conn)      # File.file_size 列と、ボリュームごとの集計
+
+    # 1) ディレクトリを読み、ボリュームを登録して、未登録のファイルを集める（メタデータだけなので速い）
+    for image in images:
+        try:
+            info, entries = read_image(image)
+        except Exception as e:
+            # 壊れたイメージ 1 つで全体を止めない
+            log.logprint(script_name, f"NG  {image}: {e}")
+            errors += 1
+            continue
+        number = human_number_for(human_number, info)
+        if conn is None:
+            print(f"--  {image}: label={info.label} uuid={info.uuid} fs={info.fs_type} human_number={number}")
+            for entry in entries:
+                print(f"      /{entry.path}  {entry.size:,} bytes  {entry.mtime}")
+            continue
+        try:
+            volume_id, created = volume.register_volume(conn, info, number, notes, WRITE_COUNT)
+        except volume.VolumeConflict as e:
+            log.logprint(script_name, f"NG  {image}: {e}")
+            errors += 1
+            continue
+        done = registered_files(conn, volume_id)
+        todo = [e for e in entries if ("/" + e.directory, e.name) not in done]
+        skipped += len(entries) - len(todo)
+        log.logprint(script_name, f"{'新規' if created else '既存'} {image}: label={info.label} volume_id={volume_id} "
+                                  f"動画 {len(entries)} 件（未登録 {len(todo)} 件）")
+        if todo:
+            pending[image] = (volume_id, todo)
+
+    if not pending:
+        return inserted, skipped, errors
+
+    # 2) チェックサムを計算し、イメージごとに登録する。同じディスクのイメージは limits の数ずつ読む
+    with ExitStack() as stack:
+        futures = {}
+        for name, group in sha256.group_by_device(pending).items():
+            workers = min(device.concurrency_for(name, limits), len(group))
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"iso-{name}")
+            stack.callback(pool.shutdown, wait=True, cancel_futures=True)
+            for image in group:
+                futures[pool.submit(hash_image, image, pending[image][1])] = image
+        for future in as_completed(futures):
+            image = futures[future]
+            volume_id = pending[image][0]
+            try:
+                hashed = future.result()
+            except Exception as e:
+                log.logprint(script_name, f"NG  {image}: {e}")
+                errors += 1
+                continue
+            n = insert_files(conn, [file_row(volume_id, entry, checksum) for entry, checksum in hashed])
+            inserted += n
+            skipped += len(hashed) - n
+            log.logprint(script_name, f"登録 {image}: {n} 件")
+    return inserted, skipped, errors
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="ディスクイメージ（.iso）をマウントせずに media.db の Volume / File に登録する")
+    parser.add_argument("images", nargs="*", help=".iso ファイル")
+    parser.add_argument("--iso-dir", action="append", default=[], help="このフォルダの .iso をすべて対象にする")
+    parser.add_argument("--human-number", default="{name}", help="human_number の書式（{label} {uuid} {name}）")
+    parser.add_argument("--notes", default="", help="Volume.notes に書く文字列")
+    parser.add_argument("--db", default=str(MEDIA_DB_PATH), help="media.db のパス")
+    parser.add_argument("--dry-run", action="store_true", help="イメージ内の動画を表示するだけで登録しない")
+    args = parser.parse_args(argv)
+
+    images = collect_images(args.images, args.iso_dir)
+    if not images:
+        parser.error("対象がありません。.iso を指定するか、--iso-dir を使ってください。")
+
+    conn = None
+    if not args.dry_run:
+        conn = sqlite3.connect(args.db)
+        ensure_source_id(conn)
+    try:
+        inserted, skipped, errors = import_images(conn, images, args.human_number, args.notes)
+    finally:
+        if conn is not None:
+            conn.close()
+
+    print(f"新規追加: {inserted}, 登録済み: {skipped}, 読めなかったイメージ: {errors}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
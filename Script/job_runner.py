@@ -0,0 +1,404 @@
+"""job_runner.py
+
+バックグラウンド作業（サムネイル作成・プレビュー作成・チェックサム検証・OCR など）を
+Jobs テーブル（lib/jobs.py）に積み、資源ごとの同時実行数を守りながら実行する。
+
+  - 「物理ディスク 1 台につき 1 ジョブ」「ffmpeg は同時に 2 個」などの上限は
+    config/settings.py の JOB_LIMITS で決める。複数のランナーを同時に動かしても上限は共有される
+  - priority の大きいジョブから実行し、失敗したジョブは間隔を空けて再試行する
+
+使い方（例。MOVIE_MNG 直下で）:
+  python Script\\job_runner.py run [--workers 4] [--once]
+  python Script\\job_runner.py add create_thumbnail --payload "{\\"video_id\\": 12}" --priority 10
+  python Script\\job_runner.py enqueue verify [--priority -10]
+  python Script\\job_runner.py enqueue preview
+  python Script\\job_runner.py add iso_import --payload "{\\"image\\": \\"D:/iso/BD001.iso\\"}"
+  python Script\\job_runner.py status
+  python Script\\job_runner.py retry [--type verify]
+  python Script\\job_runner.py purge --days 7
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+#------------------------------
+# 初期変数の読み込み
+#------------------------------
+from config.settings import VIDEO_DB_PATH, JOB_LIMITS, JOB_WORKERS, PREVIEW_FRAMES
+# ファイル名のみ（例: my_script.py）
+script_name = os.path.basename(__file__)
+
+
+#------------------------------
+# ログ出力
+#------------------------------
+import lib.log as log
+
+
+# --------------------
+# DB Writer (SQLite)
+# --------------------
+from lib.db import videosDBWriter
+import lib.jobs as jobs
+
+# 状態の表示は Web サーバの /api/jobs と同じ問い合わせ（video_app/queries.py）を使う
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "video_app"))
+import queries
+
+POLL_SECONDS = 5        # 取り出せるジョブが無いときの待ち時間
+MOVIE_MNG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "movie_mng.py")
+
+
+class JobError(Exception):
+    """再試行しても結果が変わらない失敗（ファイルが無い・チェックサム不一致など）。"""
+
+
+# --------------------
+# ジョブの種類
+# 各ハンドラは (db, payload) を受け取り、結果（JSON にできる値）を返す。
+# 失敗は例外で知らせる。JobError は再試行せずにすぐ failed にする。
+# resources は積むときに呼び、ジョブが使う資源名のリストを返す。
+# --------------------
+def _video_source(db, video_id):
+    row = db.select_video_source(video_id)
+    if row is None:
+        raise JobError(f"Videos / HDD にレコードがありません。(video_id={video_id})")
+    return row
+
+
+def _video_disk(db, payload):
+    row = db.select_video_source(payload["video_id"])
+    return [jobs.disk_resource(row[3])] if row else []
+
+
+def run_create_thumbnail(db, payload):
+    # PlaylistQueue（playlist_register）と同じ動画を同時に処理しないよう、キューの行をリースしてから作り、
+    # Playlist への追加とキューからの削除を 1 つのトランザクションで行う
+    import playlist_register
+    video_id = payload["video_id"]
+    _, title, checkin_time, folder_path, file_name, _ = _video_source(db, video_id)
+    owner = f"job_runner:{owner_name()}"
+    if not db.lease_playlist_video(video_id, owner):
+        return {"skipped": "playlist_register が処理中です"}
+    try:
+        thumbnail = playlist_register.create_thumbnail(folder_path, checkin_time, file_name)
+        if not os.path.exists(thumbnail):
+            raise RuntimeError(f"サムネイルを作成できませんでした。({thumbnail})")
+    except Exception as e:
+        db.fail_playlist_job(video_id, str(e), owner)
+        raise
+    if db.complete_playlist_job(video_id, title, thumbnail, owner):
+        return {"thumbnail": thumbnail}
+    # キューに無い動画（プレイリスト登録済みのサムネイルの作り直しなど）
+    if db.select_playlist_thumbnail(video_id) is None:
+        db.playlist_insert(video_id, title, thumbnail)
+    else:
+        db.update_thumbnail(video_id, thumbnail)
+    return {"thumbnail": thumbnail}
+
+
+def run_preview(db, payload):
+    import playlist_register
+    video_id = payload["video_id"]
+    _, _, _, folder_path, file_name, _ = _video_source(db, video_id)
+    thumbnail = db.select_playlist_thumbnail(video_id)
+    if thumbnail is None:
+        raise RuntimeError(f"Playlist に未登録です。(video_id={video_id})")
+    db.ensure_preview()
+    _, sprite_path, vtt_path, made = playlist_register._make_preview(
+        video_id, thumbnail, folder_path, file_name, payload.get("frames", PREVIEW_FRAMES))
+    if not made:
+        raise RuntimeError(f"プレビューを作成できませんでした。(video_id={video_id})")
+    db.save_preview(video_id, sprite_path, vtt_path, made)
+    return {"frames": made}
+
+
+def run_verify(db, payload):
+    """HDD 上のファイルのチェックサムを計算し直し、Videos.checksum と比べる。"""
+    import lib.sha256 as sha256
+    video_id = payload["video_id"]
+    _, _, _, folder_path, file_name, expected = _video_source(db, video_id)
+    path = os.path.join(folder_path, file_name)
+    if not os.path.isfile(path):
+        raise JobError(f"ファイルがありません。({path})")
+    actual = sha256.calc_checksum(path)
+    if not actual:
+        raise RuntimeError(f"ファイルを読み込めませんでした。({path})")
+    if actual != expected:
+        raise JobError(f"チェックサムが一致しません。({path}) expected={expected} actual={actual}")
+    return {"checksum": actual}
+
+
+def run_command(db, payload):
+    """movie_mng のサブコマンドを別プロセスで実行する（例: {"argv": ["ocr", "--file-id", "..."]}）。"""
+    argv = payload["argv"]
+    proc = subprocess.run(
+        [sys.executable, MOVIE_MNG] + argv,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"movie_mng {' '.join(argv)} が終了コード {proc.returncode} で終了しました。"
+                           f" {proc.stderr.strip()[-500:]}")
+    return {"returncode": proc.returncode}
+
+
+def run_ocr(db, payload):
+    file_id = _video_source(db, payload["video_id"])[0]
+    return run_command(db, {"argv": ["ocr", "--file-id", file_id] + payload.get("args", [])})
+
+
+def run_iso_import(db, payload):
+    """ディスクイメージ 1 つを media.db に登録する（例: {"image": "/archive/iso/BD001.iso"}）。"""
+    import sqlite3
+    import iso_import
+    from config.settings import MEDIA_DB_PATH
+    image = payload["image"]
+    if not os.path.isfile(image):
+        raise JobError(f"ファイルがありません。({image})")
+    conn = sqlite3.connect(MEDIA_DB_PATH)
+    try:
+        iso_import.ensure_source_id(conn)
+        inserted, skipped, errors = iso_import.import_images(
+            conn, [image], payload.get("human_number", "{name}"), payload.get("notes", ""))
+    finally:
+        conn.close()
+    if errors:
+        raise JobError(f"ディスクイメージを読み込めませんでした。({image})")
+    return {"inserted": inserted, "skipped": skipped}
+
+
+def _image_disk(db, payload):
+    return [jobs.disk_resource(payload["image"])]
+
+
+HANDLERS = {
+    # 種類: (ハンドラ, 資源（ディスク以外）, ディスク資源を決める関数)
+    "create_thumbnail": (run_create_thumbnail, ["ffmpeg"], _video_disk),
+    "preview": (run_preview, ["ffmpeg"], _video_disk),
+    "verify": (run_verify, [], _video_disk),
+    "ocr": (run_ocr, ["ocr", "ffmpeg"], _video_disk),
+    "iso_import": (run_iso_import, [], _image_disk),
+    "command": (run_command, [], None),
+}
+
+
+def resources_for(db, job_type, payload, extra=()):
+    _, fixed, disk = HANDLERS[job_type]
+    resources = list(fixed) + list(extra)
+    if disk is not None:
+        resources += disk(db, payload)
+    return resources
+
+
+def add_job(db, job_type, payload, priority=0, max_attempts=jobs.MAX_ATTEMPTS, extra_resources=(), commit=True):
+    if job_type not in HANDLERS:
+        raise ValueError(f"不明なジョブの種類です。({job_type})")
+    dedup_key = f"{job_type}:{json.dumps(payload, sort_keys=True, ensure_ascii=False)}"
+    return jobs.enqueue(
+        db.conn, job_type, payload, resources_for(db, job_type, payload, extra_resources),
+        priority, max_attempts, dedup_key, commit,
+    )
+
+
+# --------------------
+# ランナー
+# --------------------
+def owner_name():
+    """リースの持ち主（ホスト名:PID）。"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Runner:
+    """
+    workers 本のスレッドで Jobs を取り出して実行する。スレッドごとに DB 接続を持つ。
+    ハンドラの中身はほぼ ffmpeg / ファイル読み込み（GIL を離す）なのでスレッドで十分。
+    """
+
+    def __init__(self, workers=JOB_WORKERS, limits=None, types=None, once=False):
+        self.workers = workers
+        self.limits = dict(JOB_LIMITS if limits is None else limits)
+        self.types = types
+        self.once = once
+        self.owner = owner_name()
+        self.stop = threading.Event()
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+        self.done = 0
+        self.failed = 0
+
+    def _heartbeat(self):
+        db = videosDBWriter(VIDEO_DB_PATH)
+        try:
+            while not self.stop.wait(jobs.LEASE_SECONDS / 3):
+                jobs.renew(db.conn, self.owner)
+        finally:
+            db.close()
+
+    def _idle(self, db):
+        """--once のとき、このランナーが終わってよいか（実行中も取り出せるジョブも無い）。"""
+        with self._busy_lock:
+            if self._busy:
+                return False
+        return jobs.pending_ready(db.conn, self.types) == 0
+
+    def _worker(self):
+        db = videosDBWriter(VIDEO_DB_PATH)
+        try:
+            while not self.stop.is_set():
+                # claim は BEGIN IMMEDIATE で busy_timeout まで待つことがあるので、ロックの外で呼ぶ。
+                # _busy を増やす前に他のワーカーが _idle を見ても、取り出せるジョブが無いときに
+                # そのワーカーが先に終わるだけで、このジョブは実行される
+                job = jobs.claim(db.conn, self.owner, self.limits, types=self.types)
+                if job is not None:
+                    with self._busy_lock:
+                        self._busy += 1
+                if job is None:
+                    if self.once and self._idle(db):
+                        break
+                    # 資源待ちのときは他のジョブが終わるのを待つ
+                    self.stop.wait(0.5 if self.once else POLL_SECONDS)
+                    continue
+                try:
+                    self._run(db, *job)
+                finally:
+                    with self._busy_lock:
+                        self._busy -= 1
+        finally:
+            db.close()
+
+    def _run(self, db, job_id, job_type, payload, attempts):
+        log.logprint(script_name, f"ジョブ開始: #{job_id} {job_type} {payload} ({attempts} 回目)")
+        started = time.perf_counter()
+        handler = HANDLERS.get(job_type)
+        try:
+            if handler is None:
+                raise JobError(f"不明なジョブの種類です。({job_type})")
+            result = handler[0](db, payload)
+        except Exception as e:
+            # JobError は再試行しても変わらないので、すぐ failed にする
+            jobs.fail(db.conn, job_id, str(e), self.owner, permanent=isinstance(e, JobError))
+            log.logprint(script_name, f"ジョブ失敗: #{job_id} {job_type} {e}", level="Error")
+            with self._busy_lock:
+                self.failed += 1
+            return
+        if jobs.complete(db.conn, job_id, self.owner, result):
+            log.logprint(script_name, f"ジョブ完了: #{job_id} {job_type} ({time.perf_counter() - started:.1f} 秒)")
+            with self._busy_lock:
+                self.done += 1
+        else:
+            log.logprint(script_name, f"リースが他のランナーに移ったため結果を破棄しました。(#{job_id})", level="Error")
+
+    def run(self):
+        log.logprint(script_name, f"ジョブランナー開始: {self.owner} workers={self.workers} limits={self.limits}")
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        threads = [threading.Thread(target=self._worker, name=f"job-{i}") for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(1)
+        except KeyboardInterrupt:
+            # 実行中のジョブは最後まで実行してから止まる
+            log.logprint(script_name, "停止要求を受け付けました。実行中のジョブの終了を待ちます。")
+            self.stop.set()
+            for t in threads:
+                t.join()
+        self.stop.set()
+        log.logprint(script_name, f"ジョブランナー終了: 完了 {self.done} 件, 失敗 {self.failed} 件")
+
+
+# --------------------
+# まとめて積む
+# --------------------
+def enqueue_all(db, job_type, priority):
+    """全動画（verify / ocr）またはプレビュー未作成の動画（preview）のジョブを積む。"""
+    if job_type == "preview":
+        db.ensure_preview()
+        video_ids = [row[0] for row in db.videos_without_preview()]
+    elif job_type == "create_thumbnail":
+        video_ids = [row[0] for row in db.p_diff_v_table()]
+    else:
+        video_ids = db.select_video_ids_on_hdd()
+    added = sum(1 for video_id in video_ids
+                if add_job(db, job_type, {"video_id": video_id}, priority, commit=False) is not None)
+    db.conn.commit()
+    return added
+
+
+def print_status(db):
+    status = queries.job_status(db.conn)
+    status["resources"] = {
+        name: {"running": n, "limit": jobs.limit_for(name, JOB_LIMITS)} for name, n in status["resources"].items()
+    }
+    print(json.dumps(status, ensure_ascii=False, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="バックグラウンド作業のジョブキューを操作・実行する")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="ジョブを実行する")
+    p.add_argument("--workers", type=int, default=JOB_WORKERS, help="同時に実行するジョブ数の上限")
+    p.add_argument("--once", action="store_true", help="取り出せるジョブが無くなったら終了する")
+    p.add_argument("--type", action="append", dest="types", choices=sorted(HANDLERS), help="実行する種類を限定する")
+    p.add_argument("--limit", action="append", default=[], metavar="RESOURCE=N",
+                   help="資源の上限を上書きする（例: ffmpeg=4, disk:sdb=2）")
+
+    p = sub.add_parser("add", help="ジョブを 1 件積む")
+    p.add_argument("type", choices=sorted(HANDLERS))
+    p.add_argument("--payload", default="{}", help="JSON（例: {\"video_id\": 12}）")
+    p.add_argument("--priority", type=int, default=0)
+    p.add_argument("--max-attempts", type=int, default=jobs.MAX_ATTEMPTS)
+    p.add_argument("--resource", action="append", default=[], help="追加で使う資源（例: disk:sr0）")
+
+    p = sub.add_parser("enqueue", help="全動画分のジョブをまとめて積む")
+    p.add_argument("type", choices=["create_thumbnail", "preview", "verify", "ocr"])
+    p.add_argument("--priority", type=int, default=0)
+
+    sub.add_parser("status", help="ジョブの状態を表示する")
+
+    p = sub.add_parser("retry", help="failed のジョブを待機に戻す")
+    p.add_argument("--type", action="append", dest="types")
+
+    p = sub.add_parser("purge", help="完了したジョブの記録を削除する")
+    p.add_argument("--days", type=float, default=7)
+
+    args = parser.parse_args(argv)
+
+    db = videosDBWriter(VIDEO_DB_PATH)
+    jobs.ensure_jobs(db.conn)
+    db.ensure_playlist_queue()
+    try:
+        if args.command == "run":
+            limits = dict(JOB_LIMITS)
+            for item in args.limit:
+                name, _, n = item.partition("=")
+                limits[name] = int(n)
+            runner = Runner(args.workers, limits, args.types, args.once)
+            runner.run()
+            return 1 if runner.failed else 0
+        if args.command == "add":
+            job_id = add_job(db, args.type, json.loads(args.payload), args.priority, args.max_attempts, args.resource)
+            print(job_id if job_id is not None else "同じジョブが待機中・実行中のため積みませんでした。")
+        elif args.command == "enqueue":
+            log.logprint(script_name, f"{args.type} のジョブを {enqueue_all(db, args.type, args.priority)} 件積みました。")
+        elif args.command == "status":
+            print_status(db)
+        elif args.command == "retry":
+            log.logprint(script_name, f"failed のジョブを {jobs.retry_failed(db.conn, args.types)} 件待機に戻しました。")
+        elif args.command == "purge":
+            log.logprint(script_name, f"完了したジョブを {jobs.purge(db.conn, args.days)} 件削除しました。")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,475 @@
+import array
+import json
+import os
+import sqlite3
+import struct
+import sys
+import zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# --------------------
+# カタログの書き出し・取り込み（別の PC との同期）
+# videos.db の Videos / HDD / Playlist と media.db の Volume / File を、表ごとに
+# 列指向・圧縮・型付きのファイルへ書き出し、相手側で主キーによる一括 upsert で取り込む。
+#
+#   形式: pyarrow があれば Parquet（zstd）、無ければ MMCB（下記の独自形式、zlib）
+#   差分: 各表のトリガーが SyncLog に「変更・削除された主キー」と通し番号（seq）を記録する。
+#         前回の書き出し以降（seq > ウォーターマーク）の行と削除だけを書き出す。
+#         ウォーターマークは書き出し先（target）ごとに SyncWatermark に保存する
+#
+# 書き出したフォルダ:
+#   manifest.json    表・列の型・行数・削除した主キー・ウォーターマーク
+#   Videos.mmcb ...  表ごとのデータ（Parquet なら Videos.parquet）
+#
+# 取り込みは同じ主キーの行を上書きする（片方向の複製。双方で同じ行を別々に作ると、
+# file_id などの一意制約に当たって取り込みが止まり、その DB の分はロールバックする）。
+# --------------------
+TABLES = {
+    # DB: [(表, 主キー), ...]（取り込みはこの順、削除は逆順）
+    "videos": [("Videos", "id"), ("HDD", "id"), ("Playlist", "video_id")],
+    "media": [("Volume", "volume_id"), ("File", "file_id")],
+}
+BATCH_ROWS = 50000
+COMPRESS_LEVEL = 1      # zlib。チェックサムなどの乱数列は縮まないので、高い圧縮率は時間の無駄になる
+FORMAT_VERSION = 1
+MAGIC = b"MMCB1\n"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS SyncLog (
+    seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+    tbl      TEXT    NOT NULL,
+    row_key  INTEGER NOT NULL,
+    deleted  INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_synclog_row ON SyncLog(tbl, row_key);
+CREATE TABLE IF NOT EXISTS SyncWatermark (
+    target       TEXT PRIMARY KEY,
+    seq          INTEGER NOT NULL,
+    exported_at  TEXT    NOT NULL
+);
+"""
+
+# 1 行につき SyncLog は 1 件（古い記録は消してから入れ直すので、seq は最後の変更の番号になる）。
+# INSERT OR REPLACE を使わないのは、INSERT OR IGNORE で発火したときに外側の衝突処理が優先され、
+# 記録が更新されなくなるため
+_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_sync_{t}_insert AFTER INSERT ON {t} BEGIN
+    DELETE FROM SyncLog WHERE tbl = '{t}' AND row_key = NEW.{pk};
+    INSERT INTO SyncLog (tbl, row_key, deleted) VALUES ('{t}', NEW.{pk}, 0);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_sync_{t}_update AFTER UPDATE ON {t} BEGIN
+    DELETE FROM SyncLog WHERE tbl = '{t}' AND row_key IN (OLD.{pk}, NEW.{pk});
+    INSERT INTO SyncLog (tbl, row_key, deleted) SELECT '{t}', OLD.{pk}, 1 WHERE OLD.{pk} IS NOT NEW.{pk};
+    INSERT INTO SyncLog (tbl, row_key, deleted) VALUES ('{t}', NEW.{pk}, 0);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_sync_{t}_delete AFTER DELETE ON {t} BEGIN
+    DELETE FROM SyncLog WHERE tbl = '{t}' AND row_key = OLD.{pk};
+    INSERT INTO SyncLog (tbl, row_key, deleted) VALUES ('{t}', OLD.{pk}, 1);
+END;
+"""
+
+
+def _has_table(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def ensure_sync(conn: sqlite3.Connection, db: str) -> None:
+    """SyncLog と、その DB にある表の変更記録トリガーを作る。"""
+    conn.executescript(_SCHEMA)
+    for table, pk in TABLES[db]:
+        if _has_table(conn, table):
+            conn.executescript(_TRIGGERS.format(t=table, pk=pk))
+    conn.commit()
+
+
+def current_seq(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM SyncLog").fetchone()[0]
+
+
+def get_watermark(conn: sqlite3.Connection, target: str) -> Optional[int]:
+    """まだ書き出したことのない target は None（全件を書き出す）。"""
+    row = conn.execute("SELECT seq FROM SyncWatermark WHERE target = ?", (target,)).fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(conn: sqlite3.Connection, target: str, seq: int) -> None:
+    conn.execute("""
+        INSERT INTO SyncWatermark (target, seq, exported_at) VALUES (?, ?, ?)
+        ON CONFLICT(target) DO UPDATE SET seq = excluded.seq, exported_at = excluded.exported_at
+    """, (target, seq, datetime.now().isoformat(timespec="seconds")))
+    conn.commit()
+
+
+# --------------------
+# 列の型
+# SQLite は列ごとに型が決まっていないので、書き出す値の型から決める。
+# 整数と実数が混ざった列などは "json"（値を JSON 文字列にする）で型を崩さずに運ぶ。
+# MMCB はバッチごとに値から決め、Parquet（ファイル全体で 1 つのスキーマ）は先に typeof() で調べる。
+# --------------------
+_SQL_TYPES = {"integer": "int", "real": "real", "text": "text", "blob": "blob"}
+_PY_TYPES = {int: "int", float: "real", str: "text", bytes: "blob"}
+
+
+def _merge_types(kinds: set) -> str:
+    kinds.discard("null")
+    if not kinds:
+        return "null"
+    if len(kinds) == 1:
+        return kinds.pop()
+    if "blob" in kinds:
+        raise ValueError(f"BLOB と他の型が混在する列は書き出せません。({kinds})")
+    return "json"
+
+
+def _value_type(values) -> str:
+    return _merge_types({_PY_TYPES.get(t, "null") for t in set(map(type, values))})
+
+
+def _column_types(conn: sqlite3.Connection, query: str, params: tuple, columns: List[str]) -> List[str]:
+    select = ", ".join(f'group_concat(DISTINCT typeof("{c}"))' for c in columns)
+    row = conn.execute(f"SELECT {select} FROM ({query})", params).fetchone()
+    return [_merge_types({_SQL_TYPES.get(k, "null") for k in (found or "").split(",")}) for found in row]
+
+
+# --------------------
+# MMCB（pyarrow が無いときの形式）
+#   MAGIC, 以降はバッチの繰り返し:
+#     u32 ヘッダ長, ヘッダ（JSON: rows, columns=[{name, type, nulls, size}]）, 列データ...
+#   最後は u32 の 0。
+#   列データは zlib で圧縮する。nulls が true なら先頭に NULL のビットマップ（1 行 1 ビット）。
+#     int: int64 / real: float64（リトルエンディアン）
+#     text: 各値の文字数（uint32）の並びの後に、値をつなげた UTF-8
+#     blob / json: 各値のバイト長（uint32）の並びの後に、値をつなげたもの
+# --------------------
+def _pack_array(code: str, values) -> bytes:
+    a = array.array(code, values)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a.tobytes()
+
+
+def _unpack_array(code: str, data: bytes, count: int) -> array.array:
+    a = array.array(code)
+    a.frombytes(data[:count * a.itemsize])
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a
+
+
+def _to_bytes(kind: str, values: list) -> List[bytes]:
+    if kind == "json":
+        return [b"" if v is None else json.dumps(v).encode("utf-8") for v in values]
+    return [b"" if v is None else bytes(v) for v in values]
+
+
+def _encode_column(kind: str, values) -> Tuple[bytes, bool]:
+    nulls = None in values
+    out = bytearray()
+    if nulls:
+        bitmap = bytearray((len(values) + 7) // 8)
+        for i, v in enumerate(values):
+            if v is None:
+                bitmap[i >> 3] |= 1 << (i & 7)
+        out += bitmap
+    if kind == "int":
+        out += _pack_array("q", [0 if v is None else v for v in values])
+    elif kind == "real":
+        out += _pack_array("d", [0.0 if v is None else v for v in values])
+    elif kind == "text":
+        # 1 値ずつ encode せず、まとめて 1 回で変換する（長さは文字数で持つ）
+        if nulls:
+            values = ["" if v is None else v for v in values]
+        out += _pack_array("I", map(len, values))
+        out += "".join(values).encode("utf-8", "surrogatepass")
+    elif kind != "null":
+        raw = _to_bytes(kind, values)
+        out += _pack_array("I", [len(b) for b in raw])
+        out += b"".join(raw)
+    return zlib.compress(out, COMPRESS_LEVEL), nulls
+
+
+def _decode_column(kind: str, blob: bytes, count: int, nulls: bool) -> list:
+    data = zlib.decompress(blob)
+    pos = 0
+    is_null = None
+    if nulls:
+        size = (count + 7) // 8
+        bitmap = data[:size]
+        is_null = [bool(bitmap[i >> 3] & (1 << (i & 7))) for i in range(count)]
+        pos = size
+    if kind == "null":
+        return [None] * count
+    if kind in ("int", "real"):
+        values = _unpack_array("q" if kind == "int" else "d", data[pos:], count).tolist()
+    elif kind == "text":
+        lengths = _unpack_array("I", data[pos:], count)
+        text = data[pos + count * 4:].decode("utf-8", "surrogatepass")
+        values = []
+        start = 0
+        for n in lengths:
+            values.append(text[start:start + n])
+            start += n
+    else:
+        lengths = _unpack_array("I", data[pos:], count)
+        pos += count * 4
+        values = []
+        for n in lengths:
+            raw = data[pos:pos + n]
+            pos += n
+            if kind == "json":
+                values.append(json.loads(raw) if raw else None)
+            else:
+                values.append(bytes(raw))
+    if is_null:
+        values = [None if null else v for v, null in zip(values, is_null)]
+    return values
+
+
+def _write_mmcb(path: str, columns: List[str], batches: Iterator[list]) -> Tuple[int, List[str]]:
+    """(行数, 列の型) を返す。列の型はバッチごとに決めるので、表全体の型はそれをまとめたもの。"""
+    total = 0
+    seen = [set() for _ in columns]
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for rows in batches:
+            blobs, meta = [], []
+            for name, values, kinds in zip(columns, zip(*rows), seen):
+                kind = _value_type(values)
+                kinds.add(kind)
+                blob, nulls = _encode_column(kind, values)
+                blobs.append(blob)
+                meta.append({"name": name, "type": kind, "nulls": nulls, "size": len(blob)})
+            header = json.dumps({"rows": len(rows), "columns": meta}).encode("utf-8")
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for blob in blobs:
+                f.write(blob)
+            total += len(rows)
+        f.write(struct.pack("<I", 0))
+    return total, [_merge_types(kinds) for kinds in seen]
+
+
+def _read_mmcb(path: str) -> Iterator[Tuple[List[str], List[tuple]]]:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"MMCB 形式のファイルではありません。({path})")
+        while True:
+            (size,) = struct.unpack("<I", f.read(4))
+            if size == 0:
+                return
+            header = json.loads(f.read(size))
+            count = header["rows"]
+            columns = [_decode_column(c["type"], f.read(c["size"]), count, c["nulls"]) for c in header["columns"]]
+            yield [c["name"] for c in header["columns"]], list(zip(*columns)) if columns else []
+
+
+# --------------------
+# Parquet（pyarrow がある場合）
+# --------------------
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def _write_parquet(path: str, columns: List[str], types: List[str], batches: Iterator[list]) -> Tuple[int, List[str]]:
+    pa = _arrow()
+    arrow_types = {"int": pa.int64(), "real": pa.float64(), "text": pa.string(),
+                   "blob": pa.binary(), "json": pa.string(), "null": pa.null()}
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in zip(columns, types)])
+    total = 0
+    with pa.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in batches:
+            data = {}
+            for name, kind, values in zip(columns, types, zip(*rows)):
+                values = list(values)
+                if kind == "json":
+                    values = [None if v is None else json.dumps(v) for v in values]
+                data[name] = values
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            total += len(rows)
+    return total, types
+
+
+def _read_parquet(path: str, types: List[str]) -> Iterator[Tuple[List[str], List[tuple]]]:
+    pa = _arrow()
+    if pa is None:
+        raise RuntimeError("Parquet の取り込みには pyarrow が必要です。")
+    for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=BATCH_ROWS):
+        data = batch.to_pydict()
+        columns = list(data)
+        values = []
+        for name, kind in zip(columns, types):
+            col = data[name]
+            if kind == "json":
+                col = [None if v is None else json.loads(v) for v in col]
+            values.append(col)
+        yield columns, list(zip(*values))
+
+
+# --------------------
+# 書き出し
+# --------------------
+def _batches(cur: sqlite3.Cursor) -> Iterator[list]:
+    while True:
+        rows = cur.fetchmany(BATCH_ROWS)
+        if not rows:
+            return
+        yield rows
+
+
+def resolve_format(fmt: str) -> str:
+    if fmt == "auto":
+        return "parquet" if _arrow() is not None else "mmcb"
+    if fmt == "parquet" and _arrow() is None:
+        raise RuntimeError("Parquet で書き出すには pyarrow が必要です。（--format mmcb を使ってください）")
+    return fmt
+
+
+def export_db(conn: sqlite3.Connection, db: str, out_dir: str, since: Optional[int] = None, fmt: str = "auto") -> dict:
+    """
+    1 つの DB の表を書き出し、manifest の {"since", "watermark", "tables"} を返す。
+    since が None なら全件、数値ならその seq より後に変更・削除した行だけを書き出す。
+    """
+    fmt = resolve_format(fmt)
+    ensure_sync(conn, db)
+    tables = []
+    # 行とウォーターマークを同じ時点で読む（読んでいる間の書き込みは次回の差分に入る）
+    conn.execute("BEGIN")
+    try:
+        watermark = current_seq(conn)
+        for table, pk in TABLES[db]:
+            if not _has_table(conn, table):
+                continue
+            if since is not None:
+                query = (f'SELECT t.* FROM "{table}" t JOIN SyncLog s ON s.row_key = t."{pk}" '
+                         f'WHERE s.tbl = ? AND s.deleted = 0 AND s.seq > ? AND s.seq <= ? ORDER BY t."{pk}"')
+                params = (table, since, watermark)
+            else:
+                query = f'SELECT * FROM "{table}" ORDER BY "{pk}"'
+                params = ()
+            cur = conn.execute(query, params)
+            columns = [d[0] for d in cur.description]
+            name = f"{table}.{fmt}"
+            path = os.path.join(out_dir, name)
+            if fmt == "parquet":
+                types = _column_types(conn, query, params, columns)
+                rows, types = _write_parquet(path, columns, types, _batches(cur))
+            else:
+                rows, types = _write_mmcb(path, columns, _batches(cur))
+            deleted = [r[0] for r in conn.execute(
+                "SELECT row_key FROM SyncLog WHERE tbl = ? AND deleted = 1 AND seq > ? AND seq <= ? ORDER BY row_key",
+                (table, since or 0, watermark))]
+            tables.append({
+                "name": table, "db": db, "key": pk, "file": name, "format": fmt, "rows": rows,
+                "bytes": os.path.getsize(path),
+                "columns": [{"name": c, "type": t} for c, t in zip(columns, types)],
+                "deleted": deleted,
+            })
+    finally:
+        conn.commit()
+    return {"since": since, "watermark": watermark, "tables": tables}
+
+
+def export_catalog(conns: Dict[str, sqlite3.Connection], out_dir: str,
+                   since: Optional[Dict[str, Optional[int]]] = None, fmt: str = "auto") -> dict:
+    """conns は {"videos": conn, "media": conn}（片方だけでもよい）。since に無い DB は全件。manifest を返す。"""
+    os.makedirs(out_dir, exist_ok=True)
+    since = since or {}
+    manifest = {"format_version": FORMAT_VERSION, "created": datetime.now().isoformat(timespec="seconds"),
+                "databases": {}, "tables": []}
+    for db, conn in conns.items():
+        result = export_db(conn, db, out_dir, since.get(db), fmt)
+        manifest["databases"][db] = {"since": result["since"], "watermark": result["watermark"]}
+        manifest["tables"] += result["tables"]
+    # manifest は最後に書く（途中で失敗したフォルダを取り込まないように）
+    tmp = os.path.join(out_dir, "manifest.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(out_dir, "manifest.json"))
+    return manifest
+
+
+# --------------------
+# 取り込み
+# --------------------
+def read_manifest(in_dir: str) -> dict:
+    with open(os.path.join(in_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"対応していない形式です。(format_version={manifest.get('format_version')})")
+    return manifest
+
+
+def _read_table(in_dir: str, entry: dict) -> Iterator[Tuple[List[str], List[tuple]]]:
+    path = os.path.join(in_dir, entry["file"])
+    if entry["format"] == "parquet":
+        return _read_parquet(path, [c["type"] for c in entry["columns"]])
+    return _read_mmcb(path)
+
+
+def import_db(conn: sqlite3.Connection, db: str, in_dir: str, manifest: dict) -> Dict[str, Tuple[int, int]]:
+    """1 つの DB の分を 1 トランザクションで取り込み、{表: (upsert した行数, 削除した行数)} を返す。"""
+    entries = [t for t in manifest["tables"] if t["db"] == db]
+    counts = {}
+    video_ids = []      # 取り込んだ Videos の id（プレイリスト登録キューに積む候補）
+    cur = conn.cursor()
+    try:
+        for entry in entries:
+            table, pk = entry["name"], entry["key"]
+            if not _has_table(conn, table):
+                raise ValueError(f"取り込み先に {table} テーブルがありません。")
+            target = {r[1] for r in cur.execute(f'PRAGMA table_info("{table}")')}
+            upserted = 0
+            for columns, rows in _read_table(in_dir, entry):
+                keep = [i for i, c in enumerate(columns) if c in target]
+                names = [columns[i] for i in keep]
+                if pk not in names:
+                    raise ValueError(f"{table} に主キー {pk} の列がありません。")
+                updates = ", ".join(f'"{c}" = excluded."{c}"' for c in names if c != pk)
+                quoted = ", ".join(f'"{c}"' for c in names)
+                sql = (f'INSERT INTO "{table}" ({quoted}) '
+                       f'VALUES ({", ".join("?" * len(names))}) '
+                       f'ON CONFLICT("{pk}") DO ' + (f"UPDATE SET {updates}" if updates else "NOTHING"))
+                if len(keep) == len(columns):
+                    cur.executemany(sql, rows)
+                else:
+                    cur.executemany(sql, ([r[i] for i in keep] for r in rows))
+                upserted += len(rows)
+                if table == "Videos":
+                    video_ids.extend(r[columns.index(pk)] for r in rows)
+            counts[table] = [upserted, 0]
+        for entry in reversed(entries):
+            if entry["deleted"]:
+                cur.executemany(f'DELETE FROM "{entry["name"]}" WHERE "{entry["key"]}" = ?',
+                                [(k,) for k in entry["deleted"]])
+                counts[entry["name"]][1] = len(entry["deleted"])
+        if video_ids and _has_table(conn, "PlaylistQueue"):
+            # サムネイルを作る前に同期された動画は Playlist に無いので、playlist_register のキューに積む
+            now = datetime.now().isoformat(timespec="seconds")
+            before = conn.total_changes
+            cur.executemany("""
+                INSERT OR IGNORE INTO PlaylistQueue(video_id, enqueued_at)
+                SELECT id, ? FROM Videos
+                WHERE id = ? AND NOT EXISTS (SELECT 1 FROM Playlist WHERE video_id = Videos.id)
+            """, [(now, video_id) for video_id in video_ids])
+            counts["PlaylistQueue"] = [conn.total_changes - before, 0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {table: tuple(c) for table, c in counts.items()}
+
+
+def import_catalog(conns: Dict[str, sqlite3.Connection], in_dir: str) -> Dict[str, Tuple[int, int]]:
+    manifest = read_manifest(in_dir)
+    counts = {}
+    for db, conn in conns.items():
+        if db in manifest["databases"]:
+            counts.update(import_db(conn, db, in_dir, manifest))
+    return counts
@@ -0,0 +1,282 @@
+import csv
+import io
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# --------------------
+# CSV の読み込み（文字コードの判定つき）
+# Windows で作った CSV は UTF-8（BOM あり・なし）と cp932 が混ざっていることがある。
+# ファイルを大きな塊（CHUNK_SIZE）ずつ読み、塊ごとにまとめて decode する。
+#
+#   1. 先頭の BOM（UTF-8 / UTF-16）があればそれに従う
+#   2. 塊を UTF-8 として decode。失敗した塊だけ 1 行ずつ UTF-8 -> cp932 の順に試す
+#      （cp932 の 2 バイト目に改行 0x0A は現れないので、行で区切ってから decode してよい。
+#      cp932 の日本語が UTF-8 として正しく読めてしまうことはまず無いので、UTF-8 を先に試す）
+#   3. どちらでも読めない行は U+FFFD に置き換えて読み、問題の行として報告する。
+#      Python の cp932 は 0x80 / 0xA0 / 0xFD-0xFF や外字を私用領域の文字にして読めてしまうので、
+#      それらを含む場合は cp932 として読めなかったものとする
+#
+# 各フィールドは、UTF-8 を cp932 として読んでしまった文字化け（「縺」「繧」「繝」など）を
+# cp932 -> UTF-8 に戻せるときは戻し、報告する（戻した行も取り込む）。戻せないものも、そのまま取り込んで報告する。
+# 列数の違う行・必須の列が空の行・U+FFFD を含む行は取り込まずに報告し、読み込みは続ける。
+# --------------------
+CHUNK_SIZE = 4 * 1024 * 1024
+
+_BOMS = [
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+]
+
+_CP932_SUSPECT = re.compile("[\x80\ue000-\uf8ff]")
+_UTF8_INVALID = re.compile("[\udc80-\udcff]")
+
+# UTF-8 の日本語を cp932 として読んだときによく出る文字（ひらがな・カタカナ・よく使う漢字の先頭バイト E3 / E5-E9 が化けたもの）
+_MOJIBAKE_HINTS = re.compile("[縺繧繝蜀譁螟驕髮荳莉謇]")
+
+
+@dataclass
+class Issue:
+    line_no: int
+    reason: str
+    text: str
+    skipped: bool = True
+
+
+def repair_mojibake(value: str) -> Optional[str]:
+    """UTF-8 を cp932 として読んだ文字列なら元に戻したものを、そうでなければ None を返す。"""
+    if value.isascii() or not _MOJIBAKE_HINTS.search(value):
+        return None
+    try:
+        fixed = value.encode("cp932").decode("utf-8")
+    except UnicodeError:
+        return None
+    return fixed if fixed != value else None
+
+
+class CsvReader:
+    """
+    reader = CsvReader("BD001.csv", required=["path", "file_name"])
+    for line_no, row in reader:      # row はヘッダをキーにした dict
+        ...
+    reader.encoding, reader.issues, reader.write_report("BD001.errors.csv")
+    """
+
+    def __init__(self, path: str, required: Sequence[str] = (), chunk_size: int = CHUNK_SIZE):
+        self.path = path
+        self.required = list(required)
+        self.chunk_size = chunk_size
+        self.encoding: Optional[str] = None
+        self.header: List[str] = []
+        self.issues: List[Issue] = []
+        self.rows = 0
+        self._utf8_lines = False        # UTF-8 の非 ASCII 行があったか
+        self._cp932_lines = 0
+        self._line_problems: Dict[int, str] = {}
+        self._line = 0                  # これまでに読んだ物理行の数
+
+    # --------------------
+    # 読み込み
+    # --------------------
+    def _decode_block(self, block: bytes) -> Iterator[str]:
+        try:
+            text = block.decode("utf-8")
+        except UnicodeDecodeError:
+            yield from self._decode_lines(block)
+            return
+        if not block.isascii():
+            self._utf8_lines = True
+        parts = text.split("\n")
+        for part in parts[:-1]:
+            self._line += 1
+            yield part + "\n"
+        if parts[-1]:
+            self._line += 1
+            yield parts[-1]
+
+    def _decode_lines(self, block: bytes) -> Iterator[str]:
+        # UTF-8 として読めない行（surrogateescape で U+DC80-U+DCFF が現れる行）だけを、
+        # 続いている行ごとにまとめて cp932 で読む。まとめて読めなければ 1 行ずつ
+        lines = block.decode("utf-8", "surrogateescape").split("\n")
+        tail = lines.pop()
+        lines = [line + "\n" for line in lines] + ([tail] if tail else [])
+        run: List[str] = []
+        for line in lines:
+            if _UTF8_INVALID.search(line):
+                run.append(line)
+                continue
+            if run:
+                yield from self._decode_cp932(run)
+                run = []
+            self._line += 1
+            if not line.isascii():
+                self._utf8_lines = True
+            yield line
+        if run:
+            yield from self._decode_cp932(run)
+
+    def _decode_cp932(self, run: List[str]) -> Iterator[str]:
+        raw = "".join(run).encode("utf-8", "surrogateescape")
+        try:
+            text = raw.decode("cp932")
+            if not _CP932_SUSPECT.search(text):
+                self._cp932_lines += len(run)
+                parts = text.split("\n")
+                for i, part in enumerate(parts[:len(run)]):
+                    self._line += 1
+                    yield part + "\n" if i < len(parts) - 1 else part
+                return
+        except UnicodeDecodeError:
+            pass
+        if len(run) == 1:
+            self._line += 1
+            self._line_problems[self._line] = "文字コードを判定できない行です（UTF-8 / cp932 のどちらでも読めません）"
+            yield raw.decode("utf-8", errors="replace")
+            return
+        for line in run:
+            yield from self._decode_cp932([line])
+
+    def _text_lines(self, f) -> Iterator[str]:
+        head = f.read(self.chunk_size)
+        for bom, encoding in _BOMS:
+            if head.startswith(bom):
+                self.encoding = encoding
+                break
+        if self.encoding == "utf-16":
+            # UTF-16 は行単位の判定ができないので、そのまま decode する
+            text = io.TextIOWrapper(io.BufferedReader(_Prepend(head, f)), encoding="utf-16", newline="")
+            for line in text:
+                self._line += 1
+                yield line
+            return
+        if self.encoding == "utf-8-sig":
+            head = head[3:]
+
+        pending = b""
+        chunk = head
+        while chunk:
+            data = pending + chunk
+            cut = data.rfind(b"\n") + 1
+            pending = data[cut:]
+            if cut:
+                yield from self._decode_block(data[:cut])
+            chunk = f.read(self.chunk_size)
+        if pending:
+            yield from self._decode_block(pending)
+
+        if self._cp932_lines and self._utf8_lines:
+            self.encoding = "mixed (utf-8 + cp932)"
+        elif self._cp932_lines:
+            self.encoding = "cp932"
+        elif self.encoding is None:
+            self.encoding = "utf-8"
+
+    def __iter__(self) -> Iterator[Tuple[int, Dict[str, str]]]:
+        with open(self.path, "rb") as f:
+            reader = csv.reader(self._text_lines(f))
+            try:
+                self.header = [h.strip() for h in next(reader)]
+            except StopIteration:
+                return
+            missing = [c for c in self.required if c not in self.header]
+            if missing:
+                raise ValueError(f"CSV に必要な列がありません: {', '.join(missing)} ({self.path})")
+            width = len(self.header)
+            start = reader.line_num + 1
+            for values in reader:
+                line_no, start = start, reader.line_num + 1
+                if not values:
+                    continue
+                row = self._check(line_no, reader.line_num, values, width)
+                if row is not None:
+                    self.rows += 1
+                    yield line_no, row
+
+    def _check(self, line_no: int, last_line: int, values: List[str], width: int) -> Optional[Dict[str, str]]:
+        # 1 行ごとに呼ばれるので、問題の無い行（ほとんど全部）は行全体に対する数回の検査だけで通す
+        if self._line_problems:
+            for n in range(line_no, last_line + 1):
+                if n in self._line_problems:
+                    self.issues.append(Issue(line_no, self._line_problems.pop(n), ",".join(values)))
+                    return None
+        if len(values) != width:
+            self.issues.append(Issue(line_no, f"列数が違います（{len(values)} 列 / ヘッダは {width} 列）", ",".join(values)))
+            return None
+        joined = "\x00".join(values)
+        repaired = []
+        suspect = []
+        if not joined.isascii():
+            if _MOJIBAKE_HINTS.search(joined):
+                for i, value in enumerate(values):
+                    if not _MOJIBAKE_HINTS.search(value):
+                        continue
+                    fixed = repair_mojibake(value)
+                    if fixed is not None:
+                        values[i] = fixed
+                        repaired.append(self.header[i])
+                    else:
+                        # 途中のバイトが欠けて cp932 -> UTF-8 に戻せない文字化け（そのまま取り込む）
+                        suspect.append(self.header[i])
+            if "\ufffd" in joined:
+                self.issues.append(Issue(line_no, "文字化けした文字（U+FFFD）を含む行です", ",".join(values)))
+                return None
+        row = dict(zip(self.header, values))
+        empty = [c for c in self.required if not row[c].strip()]
+        if empty:
+            self.issues.append(Issue(line_no, f"必須の列が空です: {', '.join(empty)}", ",".join(values)))
+            return None
+        if repaired:
+            self.issues.append(Issue(line_no, f"文字化けを修復しました: {', '.join(repaired)}", ",".join(values), skipped=False))
+        if suspect:
+            self.issues.append(Issue(line_no, f"文字化けの可能性があります（修復できません）: {', '.join(suspect)}",
+                                     ",".join(values), skipped=False))
+        return row
+
+    # --------------------
+    # 報告
+    # --------------------
+    @property
+    def skipped(self) -> int:
+        return sum(1 for i in self.issues if i.skipped)
+
+    def summary(self) -> str:
+        return (f"{os.path.basename(self.path)}: 文字コード {self.encoding}, 読み込み {self.rows} 行, "
+                f"スキップ {self.skipped} 行, 修復 {len(self.issues) - self.skipped} 行")
+
+    def write_report(self, path: str) -> None:
+        """問題のあった行を CSV に書く（Excel で開けるように BOM つき UTF-8）。"""
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(["line", "skipped", "reason", "text"])
+            for issue in self.issues:
+                writer.writerow([issue.line_no, "TRUE" if issue.skipped else "FALSE", issue.reason, issue.text])
+
+
+class _Prepend(io.RawIOBase):
+    """先に読んだ先頭部分を戻して、続きをファイルから読む。"""
+
+    def __init__(self, head: bytes, f):
+        self._head = head
+        self._f = f
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        if self._head:
+            n = min(len(buf), len(self._head))
+            buf[:n] = self._head[:n]
+            self._head = self._head[n:]
+            return n
+        data = self._f.read(len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+
+def read_rows(path: str, required: Sequence[str] = ()) -> Tuple[List[Tuple[int, Dict[str, str]]], CsvReader]:
+    """小さい CSV（マニフェストなど）をまとめて読む。"""
+    reader = CsvReader(path, required)
+    return list(reader), reader
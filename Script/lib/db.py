@@ -1,6 +1,9 @@
 import os
+import json
 import sqlite3
 import pathlib
+import time
+from datetime import datetime
 from typing import Optional, Tuple, List, Dict
 
 # ファイル名のみ（例: my_script.py）
@@ -11,6 +14,9 @@ script_name = os.path.basename(__file__)
 # log出力
 # --------------------
 import lib.log as log
+import lib.filename_parser as filename_parser
+import lib.listing as listing
+import lib.stats as stats
 
 # --------------------
 # DB Writer (SQLite)
@@ -34,17 +40,17 @@ class videosDBWriter:
         log.logprint(script_name, f"DBのtable確認結果 {cursor.fetchone()}")
         return cursor.fetchone()
 
-    def insert_video(self, file_id: str, title: Optional[str], author: Optional[str], publish_date: Optional[str], folder_path: str, checkin_time: str, original_filename: str, checksum: str, file_name: str) -> None:
+    def insert_video(self, file_id: str, title: Optional[str], author: Optional[str], publish_date: Optional[str], folder_path: str, checkin_time: str, original_filename: str, checksum: str, file_name: str, source_id: Optional[str] = None) -> bool:
         c = self.conn.cursor()
         try:
             HDD_flag = 1
             RMB_flag = 0
             c.execute(
                 """
-                INSERT INTO Videos(file_id, title, author, publish_date, HDD_flag, RMB_flag, checkin_time, original_filename, checksum, file_name)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO Videos(file_id, title, author, publish_date, HDD_flag, RMB_flag, checkin_time, original_filename, checksum, file_name, source_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
-                (file_id, title, author, publish_date, HDD_flag, RMB_flag, checkin_time, original_filename, checksum, file_name),
+                (file_id, title, author, publish_date, HDD_flag, RMB_flag, checkin_time, original_filename, checksum, file_name, source_id),
             )
             
             # HDD テーブルにデータを追加
@@ -56,10 +62,31 @@ class videosDBWriter:
                 """,
                 (file_id, folder_path),
             )
+
+            # プレイリスト登録（サムネイル作成など）の作業キューにも同じトランザクションで積む
+            c.execute(
+                "INSERT OR IGNORE INTO PlaylistQueue(video_id, enqueued_at) VALUES ((SELECT id FROM Videos WHERE file_id = ?), ?)",
+                (file_id, datetime.now().isoformat(timespec="seconds")),
+            )
             self.conn.commit()
             log.logprint(script_name, "Videos.db にデータを追記(commit)しました。")
+            return True
         except sqlite3.IntegrityError as e:
-            log.logprint(script_name, "DB insert failed (maybe duplicate file_id): %s", level="Error")
+            self.conn.rollback()
+            log.logprint(script_name, f"DB insert failed (maybe duplicate file_id): {e}", level="Error")
+            return False
+
+    def select_file_id(self, file_id: str):
+        c = self.conn.cursor()
+        return c.execute(
+            """
+            SELECT id
+            FROM Videos
+            WHERE file_id = ?
+            LIMIT 1;
+            """,
+            (file_id,)
+        ).fetchone()
 
     def select_checksum(self, str_checksum):
         c = self.conn.cursor()
@@ -74,6 +101,245 @@ class videosDBWriter:
         )
         return str_ret.fetchone()
 
+    def ensure_source_id(self) -> None:
+        """
+        Videos.source_id（yt-dlp の動画ID）列と索引が無ければ追加し、
+        既存レコードは original_filename から値を埋める。
+        """
+        c = self.conn.cursor()
+        cols = {r[1] for r in c.execute("PRAGMA table_info(Videos)")}
+        if "source_id" in cols:
+            return
+        log.logprint(script_name, "Videos テーブルに source_id 列を追加します。")
+        c.execute("ALTER TABLE Videos ADD COLUMN source_id TEXT")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_videos_source_id ON Videos(source_id)")
+
+        rows = c.execute("SELECT id, original_filename FROM Videos WHERE original_filename IS NOT NULL").fetchall()
+        ids = filename_parser.parse_columns([r[1] for r in rows])["video_id"]
+        c.executemany(
+            "UPDATE Videos SET source_id = ? WHERE id = ?",
+            [(vid, r[0]) for r, vid in zip(rows, ids) if vid],
+        )
+        self.conn.commit()
+        log.logprint(script_name, f"source_id の設定完了 ({sum(1 for v in ids if v)} 件)")
+
+    def select_source_id(self, source_id: str):
+        c = self.conn.cursor()
+        return c.execute(
+            """
+            SELECT id, file_id, original_filename
+            FROM Videos
+            WHERE source_id = ?
+            LIMIT 1;
+            """,
+            (source_id,)
+        ).fetchone()
+
+    # --------------------
+    # 知覚ハッシュ（近似重複検出）
+    # --------------------
+    def ensure_phash(self) -> None:
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS VideoPHash (
+                video_id  INTEGER PRIMARY KEY,
+                frames    INTEGER NOT NULL,
+                hashes    BLOB NOT NULL,
+                FOREIGN KEY (video_id) REFERENCES Videos(id) ON DELETE CASCADE
+            )
+            """
+        )
+        self.conn.commit()
+
+    def save_phash(self, video_id: int, frames: int, hashes: bytes) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO VideoPHash(video_id, frames, hashes) VALUES (?, ?, ?)",
+            (video_id, frames, hashes),
+        )
+        self.conn.commit()
+
+    def load_phash(self) -> List[Tuple[int, bytes]]:
+        c = self.conn.cursor()
+        return c.execute("SELECT video_id, hashes FROM VideoPHash").fetchall()
+
+    def videos_without_phash(self) -> List[Tuple]:
+        c = self.conn.cursor()
+        return c.execute(
+            """
+            SELECT v.id, h.folder_path, v.file_name
+            FROM Videos v JOIN HDD h ON h.file_id = v.file_id
+            WHERE NOT EXISTS (SELECT 1 FROM VideoPHash p WHERE p.video_id = v.id)
+            """
+        ).fetchall()
+
+    def select_titles(self, ids: List[int]) -> Dict[int, Tuple]:
+        c = self.conn.cursor()
+        marks = ",".join("?" * len(ids))
+        rows = c.execute(
+            f"SELECT id, file_id, title, author FROM Videos WHERE id IN ({marks})", ids
+        ).fetchall()
+        return {r[0]: r[1:] for r in rows}
+
+    # --------------------
+    # プレビュー（スプライト + WebVTT ストーリーボード）
+    # --------------------
+    def ensure_preview(self) -> None:
+        c = self.conn.cursor()
+        cols = {r[1] for r in c.execute("PRAGMA table_info(Playlist)")}
+        if "sprite" in cols:
+            return
+        log.logprint(script_name, "Playlist テーブルにプレビュー用の列を追加します。")
+        c.execute("ALTER TABLE Playlist ADD COLUMN sprite TEXT")
+        c.execute("ALTER TABLE Playlist ADD COLUMN storyboard TEXT")
+        c.execute("ALTER TABLE Playlist ADD COLUMN preview_frames INTEGER")
+        self.conn.commit()
+
+    def videos_without_preview(self) -> List[Tuple]:
+        c = self.conn.cursor()
+        return c.execute(
+            """
+            SELECT p.video_id, p.thumbnail, h.folder_path, v.file_name
+            FROM Playlist p
+                JOIN Videos v ON v.id = p.video_id
+                JOIN HDD h ON h.file_id = v.file_id
+            WHERE p.sprite IS NULL
+            ORDER BY p.video_id DESC
+            """
+        ).fetchall()
+
+    def save_preview(self, video_id: int, sprite: str, storyboard: str, frames: int) -> None:
+        self.conn.execute(
+            "UPDATE Playlist SET sprite = ?, storyboard = ?, preview_frames = ? WHERE video_id = ?",
+            (sprite, storyboard, frames, video_id),
+        )
+        self.conn.commit()
+
+    def select_video_path(self, file_id: str) -> Optional[Tuple[str, str]]:
+        c = self.conn.cursor()
+        return c.execute(
+            """
+            SELECT h.folder_path, v.file_name
+            FROM Videos v JOIN HDD h ON h.file_id = v.file_id
+            WHERE v.file_id = ?
+            """,
+            (file_id,)
+        ).fetchone()
+
+    def select_video_source(self, video_id: int) -> Optional[Tuple]:
+        """(file_id, title, checkin_time, folder_path, file_name, checksum) を返す。"""
+        c = self.conn.cursor()
+        return c.execute(
+            """
+            SELECT v.file_id, v.title, v.checkin_time, h.folder_path, v.file_name, v.checksum
+            FROM Videos v JOIN HDD h ON h.file_id = v.file_id
+            WHERE v.id = ?
+            """,
+            (video_id,)
+        ).fetchone()
+
+    def select_video_ids_on_hdd(self) -> List[int]:
+        c = self.conn.cursor()
+        return [r[0] for r in c.execute(
+            "SELECT v.id FROM Videos v JOIN HDD h ON h.file_id = v.file_id ORDER BY v.id"
+        )]
+
+    def select_playlist_thumbnail(self, video_id: int) -> Optional[str]:
+        row = self.conn.execute("SELECT thumbnail FROM Playlist WHERE video_id = ?", (video_id,)).fetchone()
+        return row[0] if row else None
+
+    # --------------------
+    # 字幕（OCR 結果）の全文検索
+    # 日本語は単語区切りが無いため FTS5 の trigram トークナイザを使う。
+    # --------------------
+    def ensure_subtitles(self) -> None:
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS Subtitle (
+                id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                video_id  INTEGER NOT NULL,
+                start_ms  INTEGER NOT NULL,
+                end_ms    INTEGER NOT NULL,
+                text      TEXT NOT NULL,
+                FOREIGN KEY (video_id) REFERENCES Videos(id) ON DELETE CASCADE
+            );
+            CREATE INDEX IF NOT EXISTS idx_subtitle_video ON Subtitle(video_id, start_ms);
+            CREATE VIRTUAL TABLE IF NOT EXISTS SubtitleFTS USING fts5(
+                text, content='Subtitle', content_rowid='id', tokenize='trigram'
+            );
+            CREATE TRIGGER IF NOT EXISTS subtitle_ai AFTER INSERT ON Subtitle BEGIN
+                INSERT INTO SubtitleFTS(rowid, text) VALUES (new.id, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS subtitle_ad AFTER DELETE ON Subtitle BEGIN
+                INSERT INTO SubtitleFTS(SubtitleFTS, rowid, text) VALUES ('delete', old.id, old.text);
+            END;
+            """
+        )
+        self.conn.commit()
+
+    def replace_subtitles(self, video_id: int, cues: List[Tuple[int, int, str]], commit: bool = True) -> None:
+        """video_id の字幕を cues [(開始ms, 終了ms, テキスト)] で置き換える。"""
+        c = self.conn.cursor()
+        c.execute("DELETE FROM Subtitle WHERE video_id = ?", (video_id,))
+        c.executemany(
+            "INSERT INTO Subtitle(video_id, start_ms, end_ms, text) VALUES (?, ?, ?, ?)",
+            [(video_id, start, end, text) for start, end, text in cues],
+        )
+        if commit:
+            self.conn.commit()
+
+    def search_subtitles(self, query: str, limit: int = 50) -> List[Tuple]:
+        """
+        字幕を検索し (video_id, file_id, title, start_ms, end_ms, text) を返す。
+        trigram は 3 文字未満を検索できないため、短い語は LIKE で探す。
+        """
+        c = self.conn.cursor()
+        if len(query) >= 3:
+            phrase = '"' + query.replace('"', '""') + '"'
+            return c.execute(
+                """
+                SELECT s.video_id, v.file_id, v.title, s.start_ms, s.end_ms, s.text
+                FROM SubtitleFTS f
+                    JOIN Subtitle s ON s.id = f.rowid
+                    JOIN Videos v ON v.id = s.video_id
+                WHERE SubtitleFTS MATCH ?
+                ORDER BY f.rank
+                LIMIT ?
+                """,
+                (phrase, limit),
+            ).fetchall()
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return c.execute(
+            """
+            SELECT s.video_id, v.file_id, v.title, s.start_ms, s.end_ms, s.text
+            FROM Subtitle s JOIN Videos v ON v.id = s.video_id
+            WHERE s.text LIKE ? ESCAPE '\\'
+            ORDER BY s.video_id, s.start_ms
+            LIMIT ?
+            """,
+            (pattern, limit),
+        ).fetchall()
+
+    def select_video_id(self, file_id: str) -> Optional[int]:
+        row = self.select_file_id(file_id)
+        return row[0] if row else None
+
+    # --------------------
+    # 動画一覧（マテリアライズ）
+    # --------------------
+    def refresh_listing(self) -> int:
+        listing.ensure_listing(self.conn)
+        return listing.refresh_listing(self.conn)
+
+    # --------------------
+    # 統計（集計表は lib/stats.py のトリガが更新する）
+    # --------------------
+    def fill_stats_sizes(self, file_ids: List[str]) -> int:
+        """集計表があれば、今回チェックインした動画（file_ids）のサイズを記録する。"""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'LibraryStats'"
+        ).fetchone()
+        return stats.fill_sizes(self.conn, file_ids) if exists and file_ids else 0
+
     def p_diff_v_table(self):
         c = self.conn.cursor()
         print(self)
@@ -81,7 +347,7 @@ class videosDBWriter:
         rows = c.execute(
         """
             SELECT v.id, v.file_id, v.title, v.checkin_time, h.folder_path, v.file_name
-            FROM (Videos v JOIN HDD h ON v.id = h.id)
+            FROM (Videos v JOIN HDD h ON h.file_id = v.file_id)
             WHERE NOT EXISTS (
                 SELECT 1
                 FROM Playlist p
@@ -102,6 +368,276 @@ class videosDBWriter:
         self.conn.commit()
         log.logprint(script_name, "Playlistテーブルの追加完了。")
 
+    # --------------------
+    # プレイリスト登録の作業キュー
+    # insert_video が Videos と同じトランザクションで積み、playlist_register が
+    # リース（lease_until）付きで 1 件ずつ取り出す。リースが切れたもの（処理中に
+    # 落ちたプロセスの分）は他のワーカーが取り直す。失敗したものは間隔を空けて
+    # 再試行し、max_attempts 回失敗したら state = 'failed' にして止める。
+    # --------------------
+    def ensure_playlist_queue(self) -> None:
+        c = self.conn.cursor()
+        exists = c.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'PlaylistQueue'"
+        ).fetchone()
+        c.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS PlaylistQueue (
+                video_id     INTEGER PRIMARY KEY,
+                state        TEXT    NOT NULL DEFAULT 'pending',   -- pending / running / failed
+                attempts     INTEGER NOT NULL DEFAULT 0,
+                next_try     REAL    NOT NULL DEFAULT 0,           -- この時刻（epoch 秒）以降に取り出せる
+                lease_owner  TEXT,
+                lease_until  REAL,
+                last_error   TEXT,
+                enqueued_at  TEXT    NOT NULL,
+                FOREIGN KEY (video_id) REFERENCES Videos(id) ON DELETE CASCADE
+            );
+            CREATE INDEX IF NOT EXISTS idx_playlist_queue_state ON PlaylistQueue(state, next_try);
+            """
+        )
+        if not exists:
+            # キュー導入前に登録され、まだプレイリストに無い動画を 1 回だけ積む
+            rows = self.p_diff_v_table()
+            now = datetime.now().isoformat(timespec="seconds")
+            c.executemany(
+                "INSERT OR IGNORE INTO PlaylistQueue(video_id, enqueued_at) VALUES (?, ?)",
+                [(r[0], now) for r in rows],
+            )
+            log.logprint(script_name, f"プレイリスト登録キューを作成しました。({len(rows)} 件)")
+        self.conn.commit()
+
+    def claim_playlist_job(self, owner: str, lease_seconds: float = 600.0) -> Optional[Tuple]:
+        """
+        取り出せる作業を 1 件リースし、(video_id, file_id, title, checkin_time, folder_path, file_name)
+        を返す。無ければ None。
+        BEGIN IMMEDIATE で書き込みロックを取ってから選ぶので、複数のプロセスが
+        同時に呼んでも同じ動画を 2 回取り出すことはない。
+        """
+        now = time.time()
+        self.conn.commit()
+        c = self.conn.cursor()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            row = c.execute(
+                """
+                SELECT video_id FROM PlaylistQueue
+                WHERE (state = 'pending' AND next_try <= ?)
+                   OR (state = 'running' AND lease_until < ?)
+                ORDER BY video_id
+                LIMIT 1
+                """,
+                (now, now),
+            ).fetchone()
+            if row is None:
+                self.conn.commit()
+                return None
+            c.execute(
+                """
+                UPDATE PlaylistQueue
+                SET state = 'running', attempts = attempts + 1, lease_owner = ?, lease_until = ?
+                WHERE video_id = ?
+                """,
+                (owner, now + lease_seconds, row[0]),
+            )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return c.execute(
+            """
+            SELECT v.id, v.file_id, v.title, v.checkin_time, h.folder_path, v.file_name
+            FROM Videos v JOIN HDD h ON h.file_id = v.file_id
+            WHERE v.id = ?
+            """,
+            (row[0],),
+        ).fetchone() or (row[0], None, None, None, None, None)
+
+    def lease_playlist_video(self, video_id: int, owner: str, lease_seconds: float = 600.0) -> bool:
+        """
+        video_id の作業を指定してリースする（job_runner の create_thumbnail 用）。
+        他のワーカーがリース中なら False。キューに無い動画（サムネイルの作り直しなど）は True。
+        """
+        now = time.time()
+        self.conn.commit()
+        c = self.conn.cursor()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            row = c.execute(
+                "SELECT state, lease_owner, lease_until FROM PlaylistQueue WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if row is not None and row[0] == "running" and row[1] != owner and row[2] >= now:
+                self.conn.commit()
+                return False
+            if row is not None:
+                c.execute(
+                    """
+                    UPDATE PlaylistQueue
+                    SET state = 'running', attempts = attempts + 1, lease_owner = ?, lease_until = ?
+                    WHERE video_id = ?
+                    """,
+                    (owner, now + lease_seconds, video_id),
+                )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return True
+
+    def complete_playlist_job(self, video_id: int, title: str, thumbnail: str, owner: str) -> bool:
+        """
+        Playlist への追加とキューからの削除を 1 つのトランザクションで行う。
+        リースが他のワーカーに移っていた場合は何もせず False を返す。
+        """
+        c = self.conn.cursor()
+        c.execute(
+            "DELETE FROM PlaylistQueue WHERE video_id = ? AND lease_owner = ?",
+            (video_id, owner),
+        )
+        if c.rowcount == 0:
+            self.conn.rollback()
+            return False
+        c.execute(
+            """
+            INSERT OR IGNORE INTO Playlist (
+                video_id, title, thumbnail,
+                played_time, play_count, favorite
+            ) VALUES (?, ?, ?, '00:00:00', 0, 0)
+            """,
+            (video_id, title, thumbnail),
+        )
+        self.conn.commit()
+        return True
+
+    def fail_playlist_job(self, video_id: int, error: str, owner: str, max_attempts: int = 5, backoff: float = 60.0) -> None:
+        """失敗を記録し、backoff * 2^(attempts-1) 秒後に再試行する。上限に達したら failed にする。"""
+        self.conn.execute(
+            """
+            UPDATE PlaylistQueue
+            SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                next_try = ? + ? * (1 << (attempts - 1)),
+                lease_owner = NULL,
+                lease_until = NULL,
+                last_error = ?
+            WHERE video_id = ? AND lease_owner = ?
+            """,
+            (max_attempts, time.time(), backoff, error, video_id, owner),
+        )
+        self.conn.commit()
+
+    def retry_failed_playlist_jobs(self) -> int:
+        c = self.conn.cursor()
+        c.execute("UPDATE PlaylistQueue SET state = 'pending', attempts = 0, next_try = 0 WHERE state = 'failed'")
+        self.conn.commit()
+        return c.rowcount
+
+    def playlist_queue_counts(self) -> Dict[str, int]:
+        c = self.conn.cursor()
+        return dict(c.execute("SELECT state, COUNT(*) FROM PlaylistQueue GROUP BY state").fetchall())
+
+    # --------------------
+    # チェックイン・ジャーナル（write-ahead）
+    # step: 'hash' -> 'move' -> 'insert' の順に更新し、commit 後に削除する。
+    # --------------------
+    def ensure_journal(self):
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS CheckinJournal (
+                file_id     TEXT PRIMARY KEY,
+                step        TEXT NOT NULL,
+                src_path    TEXT NOT NULL,
+                dst_path    TEXT NOT NULL,
+                payload     TEXT,
+                updated_at  TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def journal_write(self, file_id: str, step: str, src_path: str, dst_path: str, payload: Optional[List] = None) -> None:
+        self.conn.execute(
+            """
+            INSERT INTO CheckinJournal(file_id, step, src_path, dst_path, payload, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(file_id) DO UPDATE SET
+                step = excluded.step,
+                payload = COALESCE(excluded.payload, CheckinJournal.payload),
+                updated_at = excluded.updated_at
+            """,
+            (
+                file_id, step, str(src_path), str(dst_path),
+                json.dumps(payload, ensure_ascii=False) if payload is not None else None,
+                datetime.now().isoformat(),
+            ),
+        )
+        self.conn.commit()
+        log.logprint(script_name, f"ジャーナル記録 ({file_id}: {step})")
+
+    def journal_clear(self, file_id: str) -> None:
+        self.conn.execute("DELETE FROM CheckinJournal WHERE file_id = ?", (file_id,))
+        self.conn.commit()
+
+    def journal_pending(self) -> List[Dict]:
+        rows = self.conn.execute(
+            """
+            SELECT file_id, step, src_path, dst_path, payload
+            FROM CheckinJournal
+            ORDER BY updated_at
+            """
+        ).fetchall()
+        return [
+            {
+                "file_id": r[0],
+                "step": r[1],
+                "src_path": pathlib.Path(r[2]),
+                "dst_path": pathlib.Path(r[3]),
+                "payload": json.loads(r[4]) if r[4] else None,
+            }
+            for r in rows
+        ]
+
+    # --------------------
+    # 整合性チェック用（テーブルごとに 1 クエリで全件取得）
+    # --------------------
+    def load_hdd_entries(self) -> List[Tuple]:
+        c = self.conn.cursor()
+        return c.execute(
+            """
+            SELECT v.file_id, v.file_name, h.folder_path
+            FROM Videos v LEFT JOIN HDD h ON h.file_id = v.file_id
+            WHERE v.HDD_flag = 1
+            """
+        ).fetchall()
+
+    def load_playlist_thumbnails(self) -> List[Tuple]:
+        c = self.conn.cursor()
+        return c.execute(
+            """
+            SELECT p.video_id, p.thumbnail, h.folder_path, v.checkin_time, v.file_name
+            FROM Playlist p
+                JOIN Videos v ON v.id = p.video_id
+                LEFT JOIN HDD h ON h.file_id = v.file_id
+            """
+        ).fetchall()
+
+    def load_journal_targets(self) -> List[str]:
+        c = self.conn.cursor()
+        try:
+            return [r[0] for r in c.execute("SELECT dst_path FROM CheckinJournal")]
+        except sqlite3.OperationalError:
+            return []
+
+    def mark_hdd_missing(self, file_ids: List[str]) -> None:
+        c = self.conn.cursor()
+        params = [(f,) for f in file_ids]
+        c.executemany("DELETE FROM HDD WHERE file_id = ?", params)
+        c.executemany("UPDATE Videos SET HDD_flag = 0 WHERE file_id = ?", params)
+        self.conn.commit()
+        log.logprint(script_name, f"HDD 上に存在しない {len(file_ids)} 件を HDD_flag=0 に更新しました。")
+
+    def update_thumbnail(self, video_id: int, thumbnail: str) -> None:
+        self.conn.execute("UPDATE Playlist SET thumbnail = ? WHERE video_id = ?", (thumbnail, video_id))
+        self.conn.commit()
 
     def close(self):
         self.conn.close()
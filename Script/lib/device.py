@@ -0,0 +1,62 @@
+import os
+from typing import Dict, Optional
+
+
+# --------------------
+# ファイルが置かれている物理デバイスの判定
+# 同じ HDD / BD ドライブを複数のスレッドで同時に読むとシークが増えて遅くなるので、
+# 読み込みの並列数はデバイスごとに決める（lib/sha256.py の hash_files、lib/jobs.py の資源）。
+#
+#   device_name: Linux は /sys/dev/block から親のディスク名（sda1 -> sda, sr0, nvme0n1）
+#                Windows はドライブレター（C, D ...）
+#   device_kind: optical / hdd / ssd / unknown
+#                Linux は /sys/block/<名前>/queue/rotational で判定する。Windows は unknown
+# --------------------
+KINDS = ("optical", "hdd", "ssd", "unknown")
+
+
+def _existing(path: str) -> str:
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+def device_name(path: str) -> str:
+    path = _existing(path)
+    if os.name == "nt":
+        drive = os.path.splitdrive(path)[0].rstrip(":").upper()
+        return drive or "unknown"
+
+    dev = os.stat(path).st_dev
+    try:
+        real = os.path.realpath(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}")
+        if os.path.exists(os.path.join(real, "partition")):
+            real = os.path.dirname(real)
+        if os.path.isdir(real):
+            return os.path.basename(real)
+    except OSError:
+        pass
+    # tmpfs / NFS など、ブロックデバイスを持たないもの
+    return f"{os.major(dev)}:{os.minor(dev)}"
+
+
+def device_kind(name: str) -> str:
+    if name.startswith("sr"):
+        return "optical"
+    try:
+        with open(f"/sys/block/{name}/queue/rotational") as f:
+            return "hdd" if f.read().strip() == "1" else "ssd"
+    except OSError:
+        return "unknown"
+
+
+def concurrency_for(name: str, limits: Dict[str, int]) -> int:
+    """
+    デバイスの同時読み込み数。limits はデバイス名（"sdb"）か種類（"hdd"）をキーにする。
+    どちらにも無ければ 1（シークで遅くなるより、並列にしない方が安全）。
+    """
+    limit: Optional[int] = limits.get(name)
+    if limit is None:
+        limit = limits.get(device_kind(name), 1)
+    return max(1, limit)
@@ -0,0 +1,529 @@
+import hashlib
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+
+
+# --------------------
+# ISO9660 / UDF のボリューム記述子
+# ディスクイメージ（.iso）やデバイス（/dev/sr0）の先頭から、マウントせずに
+# ボリュームラベルと UUID を読む。BD は UDF（2.50 など）、CD / DVD は ISO9660 か
+# UDF ブリッジ（両方ある）なので、UDF があれば UDF を優先する（Windows / blkid と同じ）。
+#
+#   ISO9660: 16 セクタ目から記述子が並ぶ。Joliet の補助記述子（UCS-2）があれば、
+#            日本語のラベルはそちらから読む。UUID は作成日時（blkid と同じ形式）
+#   UDF    : 256 セクタ目の Anchor から主記述子列を辿り、論理ボリューム記述子の
+#            識別子をラベルに、ボリュームセット識別子の先頭 16 文字を UUID にする
+# --------------------
+SECTOR = 2048
+
+
+def _read_sector(f, n: int) -> bytes:
+    f.seek(n * SECTOR)
+    return f.read(SECTOR)
+
+
+def decode_dstring(field: bytes) -> str:
+    """UDF の dstring（先頭 1 バイトが圧縮 ID、末尾 1 バイトが長さ）。"""
+    length = field[-1]
+    if length == 0:
+        return ""
+    data = field[:length]
+    if data[0] == 8:
+        text = data[1:].decode("latin-1")
+    elif data[0] == 16:
+        text = data[1:].decode("utf-16-be", errors="replace")
+    else:
+        return ""
+    return text.rstrip("\x00 ")
+
+
+def _iso_uuid(date: bytes) -> Optional[str]:
+    """作成日時 YYYYMMDDHHMMSScc を blkid と同じ YYYY-MM-DD-HH-MM-SS-cc にする。"""
+    text = date[:16].decode("ascii", errors="replace")
+    if not text.isdigit() or text.strip("0") == "":
+        return None
+    parts = [text[0:4], text[4:6], text[6:8], text[8:10], text[10:12], text[12:14], text[14:16]]
+    return "-".join(parts)
+
+
+def read_iso9660(f) -> Optional[Tuple[str, Optional[str]]]:
+    label = joliet = uuid = None
+    for n in range(16, 64):
+        d = _read_sector(f, n)
+        if len(d) < SECTOR or d[1:6] != b"CD001":
+            break
+        kind = d[0]
+        if kind == 1 and label is None:
+            label = d[40:72].decode("ascii", errors="replace").rstrip()
+            uuid = _iso_uuid(d[813:830])
+        elif kind == 2 and d[88:90] == b"%/" and d[90:91] in (b"@", b"C", b"E"):
+            joliet = d[40:72].decode("utf-16-be", errors="replace").rstrip("\x00 ")
+        elif kind == 255:
+            break
+    if label is None:
+        return None
+    return joliet or label, uuid
+
+
+def _has_udf_vrs(f) -> bool:
+    for n in range(16, 32):
+        d = _read_sector(f, n)
+        if len(d) < 6:
+            return False
+        if d[1:6] in (b"NSR02", b"NSR03"):
+            return True
+        if d[1:6] not in (b"CD001", b"BEA01", b"BOOT2", b"CDW02", b"TEA01"):
+            return False
+    return False
+
+
+def read_udf(f) -> Optional[Tuple[str, Optional[str]]]:
+    if not _has_udf_vrs(f):
+        return None
+    anchor = _read_sector(f, 256)
+    if len(anchor) < 24 or struct.unpack_from("<H", anchor, 0)[0] != 2:
+        return None
+    length, location = struct.unpack_from("<II", anchor, 16)
+
+    volume_id = logical_id = volume_set = None
+    for n in range(location, location + max(1, length // SECTOR)):
+        d = _read_sector(f, n)
+        if len(d) < SECTOR:
+            break
+        tag = struct.unpack_from("<H", d, 0)[0]
+        if tag == 1 and volume_id is None:          # Primary Volume Descriptor
+            volume_id = decode_dstring(d[24:56])
+            volume_set = d[72:200]
+        elif tag == 6 and logical_id is None:       # Logical Volume Descriptor
+            logical_id = decode_dstring(d[84:212])
+        elif tag == 8:                              # Terminating Descriptor
+            break
+    label = logical_id or volume_id
+    if label is None:
+        return None
+    return label, _udf_uuid(volume_set)
+
+
+def _udf_uuid(field: Optional[bytes]) -> Optional[str]:
+    """ボリュームセット識別子の先頭 16 文字（16 進でなければ先頭 8 バイトを 16 進にする）。blkid に合わせる。"""
+    if not field or field[-1] == 0:
+        return None
+    text = decode_dstring(field)
+    head = text[:16]
+    if len(head) == 16 and all(c in "0123456789abcdefABCDEF" for c in head):
+        return head.lower()
+    raw = field[1:field[-1]]
+    return raw[:8].hex() if raw else None
+
+
+def read_volume_descriptor(path: str) -> Optional[Tuple[str, Optional[str], str]]:
+    """(ラベル, UUID, "udf" / "iso9660") を返す。どちらでもなければ None。"""
+    with open(path, "rb") as f:
+        found = read_udf(f)
+        if found is not None:
+            return found[0], found[1], "udf"
+        found = read_iso9660(f)
+        if found is not None:
+            return found[0], found[1], "iso9660"
+    return None
+
+
+# --------------------
+# ディレクトリ構造の読み取り（マウント不要・root 不要）
+# イメージファイルを mmap し、ISO9660（Joliet）/ UDF のディレクトリを辿ってファイルの一覧
+# （パス・サイズ・更新日時・イメージ内の位置）を作る。ファイルの中身は mmap の範囲を
+# memoryview で切り出してそのままハッシュに渡すので、コピーもマウントも要らない。
+#
+# UDF は BD でよく使われるメタデータパーティション（UDF 2.50 以降）に対応する。
+# ディレクトリと File Entry はメタデータファイルの中（メタデータパーティション）にあり、
+# ファイルの中身は long_ad で物理パーティションを参照する。
+# 追記型の VAT（仮想パーティション）は未対応（DiscImageError）。
+# --------------------
+class DiscImageError(Exception):
+    pass
+
+
+@dataclass
+class DiscEntry:
+    path: str                                   # イメージ内のパス（"/" 区切り、先頭の "/" なし）
+    size: int
+    mtime: Optional[datetime]
+    extents: List[Tuple[Optional[int], int]]    # (イメージ内のバイト位置, 長さ)。位置が None の範囲はゼロ
+    data: Optional[bytes] = None                # File Entry に埋め込まれた小さいファイル
+
+    @property
+    def name(self) -> str:
+        return self.path.rpartition("/")[2]
+
+    @property
+    def directory(self) -> str:
+        return self.path.rpartition("/")[0]
+
+    @property
+    def offset(self) -> int:
+        """先頭の位置（イメージ内を前から順に読むための並べ替えに使う）。"""
+        return next((o for o, _ in self.extents if o is not None), 0)
+
+
+def _iso_datetime(b) -> Optional[datetime]:
+    """ディレクトリレコードの日時（1900 年からの年, 月, 日, 時, 分, 秒, 15 分単位の時差）。"""
+    if b[1] == 0:
+        return None
+    tz = timezone(timedelta(minutes=15 * struct.unpack("b", bytes(b[6:7]))[0]))
+    try:
+        return datetime(1900 + b[0], b[1], b[2], b[3], b[4], b[5], tzinfo=tz)
+    except ValueError:
+        return None
+
+
+def _udf_datetime(b) -> Optional[datetime]:
+    type_tz, year = struct.unpack_from("<Hh", b, 0)
+    month, day, hour, minute, second, centi, hundreds, micro = bytes(b[4:12])
+    offset = type_tz & 0x0FFF
+    if offset & 0x800:
+        offset -= 0x1000
+    tz = None if offset == -2047 else timezone(timedelta(minutes=offset))
+    try:
+        return datetime(year, month, day, hour, minute, second,
+                        centi * 10000 + hundreds * 100 + micro, tzinfo=tz)
+    except ValueError:
+        return None
+
+
+def _udf_name(raw) -> str:
+    raw = bytes(raw)
+    if not raw:
+        return ""
+    if raw[0] == 8:
+        return raw[1:].decode("latin-1")
+    if raw[0] == 16:
+        return raw[1:].decode("utf-16-be", errors="replace")
+    raise DiscImageError(f"UDF のファイル名の圧縮 ID が不正です。({raw[0]})")
+
+
+class DiscImage:
+    """
+    with DiscImage("BD001.iso") as img:
+        for entry in img.walk():
+            print(entry.path, entry.size, img.checksum(entry))
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            if self.size < 17 * SECTOR:
+                raise DiscImageError(f"ディスクイメージとして小さすぎます。({path})")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self._mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                self._mm.madvise(mmap.MADV_SEQUENTIAL)
+            self._view = memoryview(self._mm)
+
+            udf = read_udf(self._file)
+            iso = None if udf else read_iso9660(self._file)
+            if udf:
+                self.label, self.uuid, self.fs_type = udf[0], udf[1], "udf"
+            elif iso:
+                self.label, self.uuid, self.fs_type = iso[0], iso[1], "iso9660"
+            else:
+                raise DiscImageError(f"ISO9660 / UDF のイメージではありません。({path})")
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        # read_chunks の memoryview がまだ残っていると（例外のトレースバックが持っている場合など）
+        # BufferError になるが、元の例外を隠さないよう閉じるのは GC に任せる
+        try:
+            if getattr(self, "_view", None) is not None:
+                self._view.release()
+                self._view = None
+            if getattr(self, "_mm", None) is not None:
+                self._mm.close()
+                self._mm = None
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _slice(self, offset: int, length: int) -> memoryview:
+        if offset < 0 or offset + length > self.size:
+            raise DiscImageError(f"イメージの範囲外を参照しています。(offset={offset}, length={length}, size={self.size})")
+        return self._view[offset:offset + length]
+
+    def _bytes(self, offset: int, length: int) -> bytes:
+        # 記述子・ディレクトリはコピーして返す（memoryview を持ち回ると close できなくなる）
+        return bytes(self._slice(offset, length))
+
+    # --------------------
+    # ファイルの一覧
+    # --------------------
+    def walk(self) -> Iterator[DiscEntry]:
+        """ファイル（ディレクトリ以外）を辿った順に返す。"""
+        if self.fs_type == "udf":
+            return self._udf_walk()
+        return self._iso_walk()
+
+    # ISO9660
+    def _iso_walk(self) -> Iterator[DiscEntry]:
+        root = joliet = None
+        for n in range(16, 64):
+            d = self._bytes(n * SECTOR, SECTOR)
+            if d[1:6] != b"CD001" or d[0] == 255:
+                break
+            if d[0] == 1 and root is None:
+                root = d[156:190]
+            elif d[0] == 2 and d[88:90] == b"%/" and d[90:91] in (b"@", b"C", b"E"):
+                joliet = d[156:190]
+        record = joliet if joliet is not None else root
+        is_joliet = joliet is not None
+        location, length = struct.unpack_from("<I", record, 2)[0], struct.unpack_from("<I", record, 10)[0]
+
+        stack = [(location, length, "")]
+        visited = set()
+        while stack:
+            location, length, prefix = stack.pop()
+            if location in visited:
+                continue
+            visited.add(location)
+            pending = None
+            for entry in self._iso_records(location, length, prefix, is_joliet, stack):
+                # 4 GiB を超えるファイルは同じ名前のレコードが続く（マルチエクステント）
+                if pending is not None and pending.path == entry.path:
+                    pending.extents += entry.extents
+                    pending.size += entry.size
+                else:
+                    if pending is not None:
+                        yield pending
+                    pending = entry
+            if pending is not None:
+                yield pending
+
+    def _iso_records(self, location, length, prefix, is_joliet, stack):
+        data = self._bytes(location * SECTOR, length)
+        pos = 0
+        while pos < length:
+            rec_len = data[pos]
+            if rec_len == 0:
+                # レコードはセクタをまたがないので、残りは次のセクタから
+                pos = (pos // SECTOR + 1) * SECTOR
+                continue
+            rec = data[pos:pos + rec_len]
+            pos += rec_len
+            name_len = rec[32]
+            raw = bytes(rec[33:33 + name_len])
+            if raw in (b"\x00", b"\x01"):
+                continue
+            if is_joliet:
+                name = raw.decode("utf-16-be", errors="replace").split(";")[0]
+            else:
+                name = raw.decode("ascii", errors="replace").split(";")[0].rstrip(".")
+            extent, size = struct.unpack_from("<I", rec, 2)[0], struct.unpack_from("<I", rec, 10)[0]
+            if rec[25] & 0x02:
+                stack.append((extent, size, prefix + name + "/"))
+                continue
+            yield DiscEntry(prefix + name, size, _iso_datetime(rec[18:25]), [(extent * SECTOR, size)] if size else [])
+
+    # UDF
+    def _udf_setup(self) -> None:
+        anchor = self._bytes(256 * SECTOR, SECTOR)
+        length, location = struct.unpack_from("<II", anchor, 16)
+        partitions = {}
+        lvd = None
+        for n in range(location, location + max(1, length // SECTOR)):
+            d = self._bytes(n * SECTOR, SECTOR)
+            tag = struct.unpack_from("<H", d, 0)[0]
+            if tag == 5:                    # Partition Descriptor
+                number = struct.unpack_from("<H", d, 22)[0]
+                partitions[number] = struct.unpack_from("<I", d, 188)[0]
+            elif tag == 6 and lvd is None:  # Logical Volume Descriptor
+                lvd = d
+            elif tag == 8:
+                break
+        if lvd is None:
+            raise DiscImageError("UDF の論理ボリューム記述子がありません。")
+
+        self._block_size = struct.unpack_from("<I", lvd, 212)[0]
+        if self._block_size != SECTOR:
+            raise DiscImageError(f"論理ブロックサイズ {self._block_size} には対応していません。")
+        self._fsd = struct.unpack_from("<IH", lvd, 252)     # (lbn, partref)
+        map_count = struct.unpack_from("<I", lvd, 268)[0]
+
+        # 各パーティションマップ -> (種類, 物理パーティションの開始セクタ)
+        self._maps = []
+        pos = 440
+        for _ in range(map_count):
+            map_type, map_len = lvd[pos], lvd[pos + 1]
+            if map_type == 1:
+                number = struct.unpack_from("<H", lvd, pos + 4)[0]
+                self._maps.append(["physical", partitions[number], None])
+            elif map_type == 2:
+                ident = lvd[pos + 5:pos + 28]
+                number = struct.unpack_from("<H", lvd, pos + 38)[0]
+                if ident.startswith(b"*UDF Metadata Partition"):
+                    meta_file = struct.unpack_from("<I", lvd, pos + 40)[0]
+                    self._maps.append(["metadata", partitions[number], meta_file])
+                elif ident.startswith(b"*UDF Sparable Partition"):
+                    # 欠陥管理で置き換えたブロックは読まない（通常のイメージでは使われない）
+                    self._maps.append(["physical", partitions[number], None])
+                else:
+                    self._maps.append(["unsupported", partitions.get(number, 0), ident.rstrip(b"\x00 ").decode("ascii", "replace")])
+            else:
+                raise DiscImageError(f"パーティションマップの種類 {map_type} には対応していません。")
+            pos += map_len
+
+        # メタデータパーティションは、物理パーティション上のメタデータファイルの中身として読む
+        for m in self._maps:
+            if m[0] == "metadata":
+                m[2] = self._read_fe(("direct", m[1]), m[2]).extents
+
+    def _partition_offset(self, partref, lbn) -> int:
+        if isinstance(partref, tuple):      # ("direct", 開始セクタ)
+            return (partref[1] + lbn) * SECTOR
+        if partref >= len(self._maps):
+            raise DiscImageError(f"パーティション参照 {partref} がありません。")
+        kind, start, extra = self._maps[partref]
+        if kind == "physical":
+            return (start + lbn) * SECTOR
+        if kind == "metadata":
+            pos = lbn * SECTOR
+            for offset, length in extra:
+                if pos < length:
+                    if offset is None:
+                        break
+                    return offset + pos
+                pos -= length
+            raise DiscImageError(f"メタデータパーティションの範囲外です。(lbn={lbn})")
+        raise DiscImageError(f"{extra} には対応していません。")
+
+    def _read_ads(self, area, ad_type, partref, extents) -> None:
+        pos = 0
+        while pos < len(area):
+            if ad_type == 0:                # short_ad
+                if pos + 8 > len(area):
+                    break
+                raw, lbn = struct.unpack_from("<II", area, pos)
+                ref = partref
+                pos += 8
+            elif ad_type == 1:              # long_ad
+                if pos + 16 > len(area):
+                    break
+                raw, lbn, ref = struct.unpack_from("<IIH", area, pos)
+                pos += 16
+            else:
+                raise DiscImageError(f"割り当て記述子の種類 {ad_type} には対応していません。")
+            length, kind = raw & 0x3FFFFFFF, raw >> 30
+            if length == 0:
+                break
+            if kind == 3:
+                # 続きの割り当て記述子（Allocation Extent Descriptor）
+                aed = self._bytes(self._partition_offset(ref, lbn), SECTOR)
+                l_ad = struct.unpack_from("<I", aed, 20)[0]
+                self._read_ads(aed[24:24 + l_ad], ad_type, ref, extents)
+                return
+            if kind == 0:
+                extents.append((self._partition_offset(ref, lbn), length))
+            else:
+                extents.append((None, length))     # 未記録の範囲はゼロとして読む
+
+    def _read_fe(self, partref, lbn) -> DiscEntry:
+        """File Entry / Extended File Entry を読む（path は空）。"""
+        d = self._bytes(self._partition_offset(partref, lbn), SECTOR)
+        tag = struct.unpack_from("<H", d, 0)[0]
+        if tag == 261:
+            mtime_pos, l_ea_pos, base = 84, 168, 176
+        elif tag == 266:
+            mtime_pos, l_ea_pos, base = 92, 208, 216
+        else:
+            raise DiscImageError(f"File Entry ではありません。(tag={tag}, lbn={lbn})")
+        ad_type = struct.unpack_from("<H", d, 34)[0] & 0x07
+        size = struct.unpack_from("<Q", d, 56)[0]
+        l_ea, l_ad = struct.unpack_from("<II", d, l_ea_pos)
+        area = d[base + l_ea:base + l_ea + l_ad]
+        entry = DiscEntry("", size, _udf_datetime(d[mtime_pos:mtime_pos + 12]), [])
+        if ad_type == 3:
+            entry.data = bytes(area[:size])
+        else:
+            self._read_ads(area, ad_type, partref, entry.extents)
+            # 最後のエクステントはブロック単位で確保されていることがあるので、ファイルサイズで切る
+            trimmed, remaining = [], size
+            for offset, length in entry.extents:
+                if remaining <= 0:
+                    break
+                trimmed.append((offset, min(length, remaining)))
+                remaining -= length
+            entry.extents = trimmed
+        return entry
+
+    def _udf_walk(self) -> Iterator[DiscEntry]:
+        self._udf_setup()
+        fsd_lbn, fsd_ref = self._fsd
+        fsd = self._bytes(self._partition_offset(fsd_ref, fsd_lbn), SECTOR)
+        if struct.unpack_from("<H", fsd, 0)[0] != 256:
+            raise DiscImageError("UDF の File Set Descriptor がありません。")
+        root_lbn, root_ref = struct.unpack_from("<IH", fsd, 404)
+
+        stack = [(root_ref, root_lbn, "")]
+        visited = set()
+        while stack:
+            ref, lbn, prefix = stack.pop()
+            if (ref, lbn) in visited:
+                continue
+            visited.add((ref, lbn))
+            directory = self._read_fe(ref, lbn)
+            data = directory.data if directory.data is not None else b"".join(
+                self._bytes(o, n) if o is not None else bytes(n) for o, n in directory.extents)
+
+            pos = 0
+            while pos + 38 <= len(data):
+                if struct.unpack_from("<H", data, pos)[0] != 257:   # File Identifier Descriptor
+                    break
+                chars, l_fi = data[pos + 18], data[pos + 19]
+                icb_lbn, icb_ref = struct.unpack_from("<IH", data, pos + 24)
+                l_iu = struct.unpack_from("<H", data, pos + 36)[0]
+                name_pos = pos + 38 + l_iu
+                raw = data[name_pos:name_pos + l_fi]
+                pos += (38 + l_iu + l_fi + 3) & ~3
+                if chars & 0x0C:            # 親ディレクトリ / 削除済み
+                    continue
+                name = _udf_name(raw)
+                if chars & 0x02:
+                    stack.append((icb_ref, icb_lbn, prefix + name + "/"))
+                    continue
+                entry = self._read_fe(icb_ref, icb_lbn)
+                entry.path = prefix + name
+                yield entry
+
+    # --------------------
+    # ファイルの中身
+    # --------------------
+    def read_chunks(self, entry: DiscEntry, chunk: int = 1024 * 1024) -> Iterator:
+        """ファイルの中身を mmap の memoryview（コピーなし）で少しずつ返す。"""
+        if entry.data is not None:
+            yield entry.data
+            return
+        for offset, length in entry.extents:
+            for pos in range(0, length, chunk):
+                n = min(chunk, length - pos)
+                yield bytes(n) if offset is None else self._slice(offset + pos, n)
+
+    def checksum(self, entry: DiscEntry, drop_cache: bool = True) -> str:
+        import lib.sha256 as sha256
+        h = hashlib.sha256()
+        for chunk in self.read_chunks(entry):
+            h.update(chunk)
+        if drop_cache:
+            for offset, length in entry.extents:
+                if offset is not None:
+                    sha256.release_cache(self._file.fileno(), offset, length)
+        return h.hexdigest()
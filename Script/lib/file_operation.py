@@ -7,6 +7,7 @@ import shutil
 from typing import Optional, Tuple, List, Dict
 from datetime import datetime
 
+from lib.make_base36 import new_file_id
 
 # ファイル名のみ（例: my_script.py）
 script_name = os.path.basename(__file__)
@@ -50,10 +51,14 @@ def _unique_target_path(target_path: pathlib.Path, allow_suffix: bool = True) ->
 
 
 def rename_to_base36(p: pathlib.Path, dt: Optional[datetime] = None, keep_ext: bool = True, allow_collision_suffix: bool = True) -> pathlib.Path:
-    base = make_timestamp_name(dt)
-    new_name = base + (p.suffix if keep_ext else "")
-    target = p.with_name(new_name)
-    target = _unique_target_path(target, allow_suffix=allow_collision_suffix)
+    # new_file_id は同じミリ秒でも重複しないので、_unique_target_path で何度も stat する必要はない。
+    # 手で置いたファイルなどと名前が重なった場合だけ採番し直す。
+    suffix = p.suffix if keep_ext else ""
+    target = p.with_name(new_file_id(dt) + suffix)
+    if target.exists():
+        if not allow_collision_suffix:
+            raise FileExistsError(f"Target exists: {target}")
+        target = p.with_name(new_file_id(dt) + suffix)
     p.rename(target)
     return target
 
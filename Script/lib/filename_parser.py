@@ -1,6 +1,6 @@
 import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Iterable, List, Dict
 import pathlib
 import re
 
@@ -16,56 +16,90 @@ script_name = os.path.basename(__file__)
 
 @dataclass
 class ParsedMeta:
+    __slots__ = ("title", "author", "publish_date", "video_id")
+
     title: Optional[str]
     author: Optional[str]
     publish_date: Optional[str]  # YYYYMMDD or None
-
-
-TITLE_DELIM = "("  # 最初の ( より前をタイトルとする
+    video_id: Optional[str]      # YouTube の動画ID（11文字）or None
+
+
+# yt-dlp の出力名:
+#   <title> [<video_id>](<displayname>@<handle>,YYYYMMDD[,00h00m00s]).<ext>
+# [video_id] や (...) が無いもの、長さ制限で途中が切れたものにも対応する。
+# [video_id] が無い場合、タイトル中の (...) は @ を含まない限り作者とはみなさない。
+_NAME_RE = re.compile(
+    r"""
+    ^(?P<title>(?:[^[(.]+|.)*?)\s*
+    (?:\[(?P<video_id>[0-9A-Za-z_-]{11})\])?
+    (?:\(
+        (?P<author>(?(video_id)|[^()@]*@)[^)]*?)
+        (?:,(?P<date>\d{8}))?
+        (?:,\d\dh\d\dm\d\ds|,\d{0,7})?\)?
+    )?
+    (?:\.[0-9A-Za-z]{1,5})?$
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+def _to_meta(m) -> ParsedMeta:
+    title, video_id, author, date = m.group("title", "video_id", "author", "date")
+    return ParsedMeta(
+        title=title.strip() or None,
+        author=(author.strip() or None) if author else None,
+        publish_date=date,
+        video_id=video_id,
+    )
 
 
 def parse_filename(fname: str) -> ParsedMeta:
     """
-    ファイル名から title, author, publish_date を抜き出す。
+    ファイル名から title, author, publish_date, video_id を抜き出す。
 
     想定フォーマット:
-      ...(<displayname>@<handle>,YYYYMMDD)
+      <title> [<video_id>](<displayname>@<handle>,YYYYMMDD)
 
     例:
       ...[vhX7bJ37ukA](ゆっくりオカルトQ@occultQ,20240521).mp4
     """
-    name = pathlib.Path(fname).name
-
-    # 拡張子除去
-    stem = name.rsplit(".", 1)[0] if "." in name else name
-
-    title = None
-    author = None
-    publish = None
-
-    if TITLE_DELIM in stem:
-        idx = stem.find(TITLE_DELIM)
-        title = stem[:idx].strip()
-        tail = stem[idx + 1 :].strip()
-
-        if tail.endswith(")"):
-            tail = tail[:-1]
+    return _to_meta(_NAME_RE.match(pathlib.Path(fname).name))
 
-        if "," in tail:
-            left, right = tail.rsplit(",", 1)
-            right = right.strip()
 
-            if re.fullmatch(r"\d{8}", right):
-                publish = right
+def parse_filenames(names: Iterable[str]) -> List[ParsedMeta]:
+    """
+    ファイル名（パスを含まない名前）の一覧をまとめて解析する。
+    ディレクトリ一覧や CSV の file_name 列をそのまま渡せる。
+    """
+    match = _NAME_RE.match
+    return [_to_meta(match(n)) for n in names]
 
-            author = left.strip() if left.strip() else None
-        else:
-            author = tail.strip() if "@" in tail else None
-    else:
-        title = stem
 
-    return ParsedMeta(
-        title=title or None,
-        author=author or None,
-        publish_date=publish or None,
-    )
+def parse_columns(names: Iterable[str]) -> Dict[str, List[Optional[str]]]:
+    """
+    parse_filenames と同じ解析結果を、列ごとのリストで返す。
+    executemany や CSV 出力にそのまま渡す用途向け。
+    """
+    match = _NAME_RE.match
+    titles, authors, dates, video_ids = [], [], [], []
+    for n in names:
+        title, video_id, author, date = match(n).group("title", "video_id", "author", "date")
+        titles.append(title.strip() or None)
+        authors.append((author.strip() or None) if author else None)
+        dates.append(date)
+        video_ids.append(video_id)
+    return {"title": titles, "author": authors, "publish_date": dates, "video_id": video_ids}
+
+
+def parse_directory(dirpath, exts: Optional[Iterable[str]] = None) -> Dict[str, ParsedMeta]:
+    """
+    ディレクトリ直下のファイルを os.scandir で 1 回だけ列挙し、
+    {ファイル名: ParsedMeta} を返す。exts 指定時は拡張子で絞り込む。
+    """
+    allowed = {e.lower().lstrip(".") for e in exts} if exts else None
+    with os.scandir(dirpath) as it:
+        names = [
+            e.name for e in it
+            if e.is_file() and (allowed is None or e.name.rsplit(".", 1)[-1].lower() in allowed)
+        ]
+    return dict(zip(names, parse_filenames(names)))
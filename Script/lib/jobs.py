@@ -0,0 +1,256 @@
+import json
+import sqlite3
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import lib.device as device
+
+
+# --------------------
+# バックグラウンド作業のジョブキュー
+# サムネイル作成・チェックサム検証・OCR などを Jobs テーブルに積み、job_runner.py が
+# 優先度（priority の大きい順）で取り出して実行する。
+#
+# 各ジョブは使う資源（resources）を持つ。例: "disk:sda" "ffmpeg"。
+# 取り出すときは BEGIN IMMEDIATE の中で実行中ジョブの資源の使用数を数え、
+# 上限（limits）を超えないジョブだけを選ぶ。上限は資源名そのもの（"disk:sda"）か、
+# ":" より前の種類（"disk"）で決める。上限の無い資源は無制限。
+# これで「物理ディスク 1 台につき 1 ジョブ」「ffmpeg は同時に N 個」を、
+# 複数のランナー（プロセス）をまたいで守れる。
+#
+# リース（lease_until）が切れた実行中ジョブは、落ちたランナーの分とみなして取り直す。
+# 失敗したジョブは backoff * 2^(attempts-1) 秒後に再試行し、max_attempts 回で failed にする。
+# 同じ dedup_key のジョブは pending / running の間は 1 件しか積めない。
+# --------------------
+LEASE_SECONDS = 600
+BACKOFF_SECONDS = 60
+MAX_ATTEMPTS = 5
+CLAIM_SCAN = 200      # 1 回の取り出しで資源の空きを調べる候補数
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Jobs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    type          TEXT    NOT NULL,
+    payload       TEXT    NOT NULL DEFAULT '{}',   -- JSON
+    resources     TEXT    NOT NULL DEFAULT '',     -- 空白区切り（例: "disk:sda ffmpeg"）
+    priority      INTEGER NOT NULL DEFAULT 0,      -- 大きいほど先に実行する
+    state         TEXT    NOT NULL DEFAULT 'pending',  -- pending / running / done / failed
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    max_attempts  INTEGER NOT NULL DEFAULT 5,
+    next_try      REAL    NOT NULL DEFAULT 0,      -- この時刻（epoch 秒）以降に取り出せる
+    lease_owner   TEXT,
+    lease_until   REAL,
+    dedup_key     TEXT,
+    last_error    TEXT,
+    result        TEXT,
+    enqueued_at   TEXT    NOT NULL,
+    started_at    TEXT,
+    finished_at   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON Jobs(state, priority DESC, id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedup ON Jobs(dedup_key)
+    WHERE dedup_key IS NOT NULL AND state IN ('pending', 'running');
+"""
+
+
+def ensure_jobs(conn: sqlite3.Connection) -> None:
+    conn.executescript(_SCHEMA)
+    conn.commit()
+
+
+def _now_text() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+# --------------------
+# 資源
+# --------------------
+def disk_resource(path: str) -> str:
+    """
+    path が置かれている物理ディスクの資源名（"disk:<名前>"）。
+    Linux ではパーティション（sda1）を親のディスク（sda）にまとめる。
+    Windows ではドライブレターで区別する。
+    """
+    return f"disk:{device.device_name(path)}"
+
+
+def limit_for(resource: str, limits: Dict[str, int]) -> Optional[int]:
+    if resource in limits:
+        return limits[resource]
+    return limits.get(resource.split(":", 1)[0])
+
+
+def fits(resources: Iterable[str], usage: Counter, limits: Dict[str, int]) -> bool:
+    for r in resources:
+        limit = limit_for(r, limits)
+        if limit is not None and usage[r] >= limit:
+            return False
+    return True
+
+
+# --------------------
+# 登録・取り出し・完了
+# --------------------
+def enqueue(conn: sqlite3.Connection, job_type: str, payload: Optional[dict] = None,
+            resources: Iterable[str] = (), priority: int = 0,
+            max_attempts: int = MAX_ATTEMPTS, dedup_key: Optional[str] = None,
+            commit: bool = True) -> Optional[int]:
+    """ジョブを積み、id を返す。同じ dedup_key のジョブが待機・実行中なら積まずに None を返す。"""
+    c = conn.execute(
+        """
+        INSERT OR IGNORE INTO Jobs(type, payload, resources, priority, max_attempts, dedup_key, enqueued_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (job_type, json.dumps(payload or {}, ensure_ascii=False), " ".join(resources),
+         priority, max_attempts, dedup_key, _now_text()),
+    )
+    if commit:
+        conn.commit()
+    return c.lastrowid if c.rowcount else None
+
+
+def claim(conn: sqlite3.Connection, owner: str, limits: Dict[str, int],
+          lease_seconds: float = LEASE_SECONDS,
+          types: Optional[Iterable[str]] = None) -> Optional[Tuple[int, str, dict, int]]:
+    """
+    資源の上限に収まるジョブを優先度順に 1 件リースし、(id, type, payload, attempts) を返す。
+    取り出せるジョブが無い（または全部が資源待ち）なら None。
+    """
+    now = time.time()
+    conn.commit()
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        usage = Counter()
+        for (resources,) in c.execute(
+            "SELECT resources FROM Jobs WHERE state = 'running' AND lease_until >= ?", (now,)
+        ):
+            usage.update(resources.split())
+
+        type_filter = ""
+        params = [now, now]
+        if types:
+            types = list(types)
+            type_filter = f"AND type IN ({','.join('?' * len(types))})"
+            params += types
+        candidates = c.execute(
+            f"""
+            SELECT id, resources FROM Jobs
+            WHERE ((state = 'pending' AND next_try <= ?)
+                OR (state = 'running' AND lease_until < ?))
+              {type_filter}
+            ORDER BY priority DESC, id
+            LIMIT {CLAIM_SCAN}
+            """,
+            params,
+        ).fetchall()
+
+        picked = next((job_id for job_id, resources in candidates
+                       if fits(resources.split(), usage, limits)), None)
+        if picked is None:
+            conn.commit()
+            return None
+        c.execute(
+            """
+            UPDATE Jobs
+            SET state = 'running', attempts = attempts + 1,
+                lease_owner = ?, lease_until = ?, started_at = ?
+            WHERE id = ?
+            """,
+            (owner, now + lease_seconds, _now_text(), picked),
+        )
+        row = c.execute("SELECT id, type, payload, attempts FROM Jobs WHERE id = ?", (picked,)).fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return row[0], row[1], json.loads(row[2]), row[3]
+
+
+def renew(conn: sqlite3.Connection, owner: str, lease_seconds: float = LEASE_SECONDS) -> int:
+    """owner が実行中のジョブのリースを延長する（長い OCR などが取り直されないように）。"""
+    c = conn.execute(
+        "UPDATE Jobs SET lease_until = ? WHERE state = 'running' AND lease_owner = ?",
+        (time.time() + lease_seconds, owner),
+    )
+    conn.commit()
+    return c.rowcount
+
+
+def complete(conn: sqlite3.Connection, job_id: int, owner: str, result=None) -> bool:
+    """リースが他のランナーに移っていた場合は何もせず False を返す。"""
+    c = conn.execute(
+        """
+        UPDATE Jobs
+        SET state = 'done', result = ?, last_error = NULL,
+            lease_owner = NULL, lease_until = NULL, finished_at = ?
+        WHERE id = ? AND state = 'running' AND lease_owner = ?
+        """,
+        (None if result is None else json.dumps(result, ensure_ascii=False), _now_text(), job_id, owner),
+    )
+    conn.commit()
+    return c.rowcount == 1
+
+
+def fail(conn: sqlite3.Connection, job_id: int, error: str, owner: str,
+         backoff: float = BACKOFF_SECONDS, permanent: bool = False) -> None:
+    """
+    試行回数が残っていれば backoff 後に再試行する。
+    permanent=True（再試行しても結果が変わらない失敗）はすぐ failed にする。attempts は実際の回数のまま。
+    """
+    conn.execute(
+        """
+        UPDATE Jobs
+        SET state = CASE WHEN :permanent OR attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+            next_try = :now + :backoff * (1 << (attempts - 1)),
+            finished_at = CASE WHEN :permanent OR attempts >= max_attempts THEN :finished END,
+            lease_owner = NULL,
+            lease_until = NULL,
+            last_error = :error
+        WHERE id = :id AND state = 'running' AND lease_owner = :owner
+        """,
+        {"permanent": permanent, "now": time.time(), "backoff": backoff, "finished": _now_text(),
+         "error": error, "id": job_id, "owner": owner},
+    )
+    conn.commit()
+
+
+def retry_failed(conn: sqlite3.Connection, types: Optional[Iterable[str]] = None) -> int:
+    """failed のジョブを待機に戻す。同じ dedup_key のジョブが積まれ直していたものは戻さない。"""
+    sql = """
+        UPDATE OR IGNORE Jobs SET state = 'pending', attempts = 0, next_try = 0, finished_at = NULL
+        WHERE state = 'failed'
+    """
+    params: List = []
+    if types:
+        types = list(types)
+        sql += f" AND type IN ({','.join('?' * len(types))})"
+        params = types
+    c = conn.execute(sql, params)
+    conn.commit()
+    return c.rowcount
+
+
+def purge(conn: sqlite3.Connection, days: float) -> int:
+    """終了（done）から days 日以上経ったジョブを削除する。"""
+    cutoff = datetime.fromtimestamp(time.time() - days * 86400).isoformat(timespec="seconds")
+    c = conn.execute("DELETE FROM Jobs WHERE state = 'done' AND finished_at < ?", (cutoff,))
+    conn.commit()
+    return c.rowcount
+
+
+def pending_ready(conn: sqlite3.Connection, types: Optional[Iterable[str]] = None) -> int:
+    """今すぐ取り出せる（資源が空けば実行できる）ジョブの数。"""
+    now = time.time()
+    sql = """
+        SELECT COUNT(*) FROM Jobs
+        WHERE ((state = 'pending' AND next_try <= ?) OR (state = 'running' AND lease_until < ?))
+    """
+    params: List = [now, now]
+    if types:
+        types = list(types)
+        sql += f" AND type IN ({','.join('?' * len(types))})"
+        params += types
+    return conn.execute(sql, params).fetchone()[0]
@@ -0,0 +1,117 @@
+import gzip
+import json
+import os
+import sqlite3
+
+# ファイル名のみ（例: my_script.py）
+script_name = os.path.basename(__file__)
+
+# --------------------
+# log出力
+# --------------------
+import lib.log as log
+
+
+# --------------------
+# 動画一覧のマテリアライズ
+# Playlist を video_id の昇順に PAGE_SIZE 件ずつ区切り、JSON を gzip した状態で
+# ListingPage に保存しておく。サーバはこのバイト列をそのまま返すだけでよい。
+#
+# 昇順で区切るので、新しい動画の追加で変わるのは最後のページだけになる。
+# Playlist / Videos の変更はトリガで ListingState.dirty_from（変更された最小の
+# video_id）に記録し、refresh_listing はそのページ以降だけを作り直す。
+# --------------------
+PAGE_SIZE = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ListingPage (
+    page     INTEGER PRIMARY KEY,
+    version  INTEGER NOT NULL,
+    count    INTEGER NOT NULL,
+    body     BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ListingState (
+    id          INTEGER PRIMARY KEY CHECK (id = 1),
+    version     INTEGER NOT NULL,
+    total       INTEGER NOT NULL,
+    page_size   INTEGER NOT NULL,
+    dirty_from  INTEGER
+);
+INSERT OR IGNORE INTO ListingState(id, version, total, page_size, dirty_from) VALUES (1, 0, 0, {page_size}, 0);
+
+CREATE TRIGGER IF NOT EXISTS listing_playlist_ai AFTER INSERT ON Playlist BEGIN
+    UPDATE ListingState SET dirty_from = MIN(COALESCE(dirty_from, new.video_id), new.video_id);
+END;
+CREATE TRIGGER IF NOT EXISTS listing_playlist_ad AFTER DELETE ON Playlist BEGIN
+    UPDATE ListingState SET dirty_from = MIN(COALESCE(dirty_from, old.video_id), old.video_id);
+END;
+CREATE TRIGGER IF NOT EXISTS listing_playlist_au AFTER UPDATE OF title, thumbnail ON Playlist BEGIN
+    UPDATE ListingState SET dirty_from = MIN(COALESCE(dirty_from, new.video_id), new.video_id);
+END;
+CREATE TRIGGER IF NOT EXISTS listing_videos_au AFTER UPDATE OF author ON Videos BEGIN
+    UPDATE ListingState SET dirty_from = MIN(COALESCE(dirty_from, new.id), new.id);
+END;
+""".format(page_size=PAGE_SIZE)
+
+
+def ensure_listing(conn: sqlite3.Connection) -> None:
+    conn.executescript(_SCHEMA)
+    conn.commit()
+
+
+def _encode_page(rows) -> bytes:
+    items = [
+        {"video_id": r[0], "title": r[1], "author": r[2], "thumbnail": f"/thumbnail/{r[0]}"}
+        for r in rows
+    ]
+    body = json.dumps(items, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def refresh_listing(conn: sqlite3.Connection) -> int:
+    """
+    変更のあったページ以降を作り直す。変更が無ければ何もしない。
+    戻り値は作り直したページ数。
+    """
+    c = conn.cursor()
+    version, page_size, dirty_from = c.execute(
+        "SELECT version, page_size, dirty_from FROM ListingState WHERE id = 1"
+    ).fetchone()
+    if dirty_from is None:
+        return 0
+
+    # dirty_from より前の件数から、作り直しを始めるページを決める
+    before = c.execute("SELECT COUNT(*) FROM Playlist WHERE video_id < ?", (dirty_from,)).fetchone()[0]
+    first_page = before // page_size
+    version += 1
+
+    rows = c.execute(
+        """
+        SELECT p.video_id, p.title, v.author
+        FROM Playlist p JOIN Videos v ON v.id = p.video_id
+        ORDER BY p.video_id
+        LIMIT -1 OFFSET ?
+        """,
+        (first_page * page_size,),
+    ).fetchall()
+
+    pages = [
+        (first_page + i // page_size, version, len(rows[i:i + page_size]), _encode_page(rows[i:i + page_size]))
+        for i in range(0, len(rows), page_size)
+    ]
+    last_page = first_page + len(pages)
+    c.execute("DELETE FROM ListingPage WHERE page >= ?", (last_page,))
+    c.executemany("INSERT OR REPLACE INTO ListingPage(page, version, count, body) VALUES (?, ?, ?, ?)", pages)
+    c.execute(
+        "UPDATE ListingState SET version = ?, total = ?, dirty_from = NULL WHERE id = 1",
+        (version, first_page * page_size + len(rows)),
+    )
+    conn.commit()
+    log.logprint(script_name, f"動画一覧を更新しました。(page {first_page}～, {len(pages)} ページ, version {version})")
+    return len(pages)
+
+
+def rebuild_listing(conn: sqlite3.Connection) -> int:
+    """全ページを作り直す。"""
+    conn.execute("UPDATE ListingState SET dirty_from = 0 WHERE id = 1")
+    return refresh_listing(conn)
@@ -2,12 +2,17 @@ from datetime import datetime
 from pathlib import Path
 
 LOG_FILE = Path("logs/app.log")
-LOG_FILE.parent.mkdir(exist_ok=True)
 
 def logprint(script: str, message: str, *, level: str = "INFO") -> None:
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     line = f"[{script}] [{timestamp}] [{level}] {message}\n"
 
     print(line, end="")
-    with LOG_FILE.open("a", encoding="utf-8") as f:
+    # logs フォルダは最初に書き込むときに作る（import しただけでは作らない）
+    try:
+        f = LOG_FILE.open("a", encoding="utf-8")
+    except FileNotFoundError:
+        LOG_FILE.parent.mkdir(exist_ok=True)
+        f = LOG_FILE.open("a", encoding="utf-8")
+    with f:
         f.write(line)
@@ -1,39 +1,192 @@
-import pathlib
-import re
-import sys
 import os
-import shutil
-from datetime import datetime
-from typing import Optional, Tuple, List, Dict
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
 
 
 # --------------------
 # 36進変換（既存モジュール相当の実装を内包）
+# 3 桁分（36^3 = 46656 通り）の文字列を表にしておき、1 回の divmod で 3 桁ずつ変換する。
 # --------------------
 _ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+_CHUNK = 36 ** 3
+_TRIPLETS = [a + b + c for a in _ALPHABET for b in _ALPHABET for c in _ALPHABET]
 
 
 def to_base36(n: int) -> str:
     if n < 0:
         raise ValueError("n must be non-negative")
-    if n == 0:
-        return "0"
-    chars = []
-    base = 36
-    while n:
-        n, r = divmod(n, base)
-        chars.append(_ALPHABET[r])
-    return "".join(reversed(chars))
+    parts = []
+    while n >= _CHUNK:
+        n, r = divmod(n, _CHUNK)
+        parts.append(_TRIPLETS[r])
+    parts.append(_TRIPLETS[n].lstrip("0") or "0")
+    return "".join(reversed(parts))
+
+
+def from_base36(s: str) -> int:
+    return int(s, 36)
 
 
 def datetime_to_int(dt: datetime) -> int:
-    ms = int(dt.microsecond / 1000)
-    s = dt.strftime("%Y%m%d%H%M%S")
-    return int(f"{s}{ms:03d}")
+    """datetime -> 整数 YYYYMMDDHHMMSSmmm（ミリ秒 3 桁）。"""
+    return (
+        ((((dt.year * 100 + dt.month) * 100 + dt.day) * 100 + dt.hour) * 100 + dt.minute) * 100 + dt.second
+    ) * 1000 + dt.microsecond // 1000
+
+
+def int_to_datetime(n: int) -> datetime:
+    """datetime_to_int の逆変換。"""
+    n, ms = divmod(n, 1000)
+    n, second = divmod(n, 100)
+    n, minute = divmod(n, 100)
+    n, hour = divmod(n, 100)
+    n, day = divmod(n, 100)
+    year, month = divmod(n, 100)
+    return datetime(year, month, day, hour, minute, second, ms * 1000)
 
 
 def make_timestamp_name(dt: Optional[datetime] = None) -> str:
+    """
+    旧形式の名前（YYYYMMDDHHMMSSmmm の 36 進、11 桁）。
+    同じミリ秒に 2 回呼ぶと同じ値になるので、file_id には new_file_id を使う。
+    """
     if dt is None:
         dt = datetime.now()
     n = datetime_to_int(dt)
-    return to_base36(n)
\ No newline at end of file
+    return to_base36(n)
+
+
+# --------------------
+# file_id の採番
+# file_id = 旧形式のタイムスタンプ（11 桁） + node（1 桁） + 連番（2 桁） の 14 桁。
+#
+#   - 先頭 11 桁は make_timestamp_name と同じなので、旧形式の ID と混ぜても
+#     文字列の並びが時刻順になり、decode_id でチェックイン時刻を取り出せる
+#   - 同じミリ秒内は連番（0～1295）で区別し、使い切ったら時刻を 1ms 進める
+#     （時計が戻った場合も前回より小さい値は出さない）
+#   - node はプロセスごとに 0～35 をロックファイルで確保するので、
+#     同じマシンで複数のプロセスが同時に採番しても衝突しない
+# --------------------
+TIMESTAMP_WIDTH = 11
+ID_WIDTH = 14
+NODE_LIMIT = 36
+SEQ_LIMIT = 36 ** 2
+_SUFFIX = NODE_LIMIT * SEQ_LIMIT
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+
+NODE_LOCK_DIR = os.path.join(tempfile.gettempdir(), "movie_mng_idnode")
+_held_locks = []
+
+
+def _try_lock(f) -> bool:
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def claim_node(lock_dir: str = NODE_LOCK_DIR) -> int:
+    """
+    空いている node 番号を確保する。ロックはプロセスが終了すると OS が解放する。
+    """
+    os.makedirs(lock_dir, exist_ok=True)
+    for node in range(NODE_LIMIT):
+        f = open(os.path.join(lock_dir, f"{node}.lock"), "a+b")
+        if _try_lock(f):
+            _held_locks.append(f)
+            return node
+        f.close()
+    raise RuntimeError(f"空いている node がありません。(同時に {NODE_LIMIT} プロセスまで)")
+
+
+class IdAllocator:
+    def __init__(self, node: Optional[int] = None, lock_dir: str = NODE_LOCK_DIR):
+        if node is not None and not 0 <= node < NODE_LIMIT:
+            raise ValueError(f"node must be 0..{NODE_LIMIT - 1}")
+        self._fixed_node = node
+        self._lock_dir = lock_dir
+        self._lock = threading.Lock()
+        self._pid = None
+        self.node = None
+        self._last_ms = -1
+        self._seq = 0
+        self._prefix_cache = (None, "")
+
+    def _ensure_node(self) -> None:
+        # fork した子プロセスは親と同じ node を持ってしまうので取り直す
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self.node = self._fixed_node if self._fixed_node is not None else claim_node(self._lock_dir)
+            self._last_ms = -1
+            self._seq = 0
+
+    def _next(self, dt: Optional[datetime]) -> Tuple[int, int]:
+        """(ミリ秒単位の時刻, node * SEQ_LIMIT + 連番) を返す。"""
+        ms = ((dt or datetime.now()) - _EPOCH) // _MS
+        with self._lock:
+            self._ensure_node()
+            if ms > self._last_ms:
+                self._last_ms = ms
+                self._seq = 0
+            else:
+                self._seq += 1
+                if self._seq >= SEQ_LIMIT:
+                    self._last_ms += 1
+                    self._seq = 0
+            return self._last_ms, self.node * SEQ_LIMIT + self._seq
+
+    def _prefix(self, ms: int) -> str:
+        # 同じミリ秒の間はタイムスタンプ部分（先頭 11 桁）を使い回す。
+        # 他のスレッドと競合しても食い違わないよう、(時刻, 文字列) を 1 つのタプルで持つ
+        cached_ms, prefix = self._prefix_cache
+        if ms != cached_ms:
+            prefix = to_base36(datetime_to_int(_EPOCH + ms * _MS)).rjust(TIMESTAMP_WIDTH, "0")
+            self._prefix_cache = (ms, prefix)
+        return prefix
+
+    def next_int(self, dt: Optional[datetime] = None) -> int:
+        ms, suffix = self._next(dt)
+        return datetime_to_int(_EPOCH + ms * _MS) * _SUFFIX + suffix
+
+    def next_id(self, dt: Optional[datetime] = None) -> str:
+        # 末尾 3 桁（node + 連番）は 36^3 未満なので、表から直接引ける
+        ms, suffix = self._next(dt)
+        return self._prefix(ms) + _TRIPLETS[suffix]
+
+
+def decode_id(file_id: str) -> Tuple[datetime, Optional[int], int]:
+    """
+    file_id から (チェックイン時刻, node, 連番) を取り出す。
+    旧形式（11 桁）の ID は node = None, 連番 = 0 として返す。
+    """
+    if len(file_id) <= TIMESTAMP_WIDTH:
+        return int_to_datetime(from_base36(file_id)), None, 0
+    if len(file_id) != ID_WIDTH:
+        raise ValueError(f"file_id の形式が不正です。({file_id})")
+    n = from_base36(file_id)
+    ts, rest = divmod(n, _SUFFIX)
+    node, seq = divmod(rest, SEQ_LIMIT)
+    return int_to_datetime(ts), node, seq
+
+
+_default_allocator = None
+_default_lock = threading.Lock()
+
+
+def new_file_id(dt: Optional[datetime] = None) -> str:
+    """プロセス共通の IdAllocator で file_id を採番する。"""
+    global _default_allocator
+    if _default_allocator is None:
+        with _default_lock:
+            if _default_allocator is None:
+                _default_allocator = IdAllocator()
+    return _default_allocator.next_id(dt)
@@ -0,0 +1,181 @@
+import os
+import subprocess
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# ファイル名のみ（例: my_script.py）
+script_name = os.path.basename(__file__)
+
+# --------------------
+# log出力
+# --------------------
+import lib.log as log
+
+
+# --------------------
+# フレーム抽出（ffmpeg）
+# --------------------
+HASH_SIZE = 8     # 8x8 = 64bit
+DCT_SIZE = 32     # 32x32 に縮小してから DCT する
+
+
+def probe_duration(video_path: str) -> Optional[float]:
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        video_path,
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        return float(proc.stdout.strip())
+    except ValueError:
+        return None
+
+
+def grab_frame(video_path: str, seconds: float, size: int = DCT_SIZE) -> Optional[np.ndarray]:
+    """
+    create_thumbnail と同じく -ss で seek して 1 フレームだけ取り出す。
+    PNG には書き出さず、size x size のグレースケール生データを pipe で受け取る。
+    """
+    cmd = [
+        "ffmpeg", "-v", "error",
+        "-ss", f"{seconds:.3f}",
+        "-i", video_path,
+        "-frames:v", "1",
+        "-vf", f"scale={size}:{size}:flags=area,format=gray",
+        "-f", "rawvideo", "-",
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if len(proc.stdout) != size * size:
+        return None
+    return np.frombuffer(proc.stdout, dtype=np.uint8).reshape(size, size)
+
+
+def sample_frames(video_path: str, count: int) -> List[np.ndarray]:
+    """動画の 5%～95% の区間から等間隔に count 枚のフレームを取り出す。"""
+    duration = probe_duration(video_path)
+    if not duration:
+        log.logprint(script_name, f"動画の長さを取得できません。({video_path})", level="Error")
+        return []
+    points = np.linspace(duration * 0.05, duration * 0.95, count)
+    frames = []
+    for t in points:
+        frame = grab_frame(video_path, float(t))
+        # 黒画面・単色画面は別の動画同士でも同じハッシュになるため除外する
+        if frame is not None and frame.std() >= 2.0:
+            frames.append(frame)
+    return frames
+
+
+# --------------------
+# 知覚ハッシュ（pHash）
+# --------------------
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+
+_DCT = _dct_matrix(DCT_SIZE)
+_BIT_WEIGHTS = (np.uint64(1) << np.arange(64, dtype=np.uint64))
+
+
+def phash_frames(frames: Iterable[np.ndarray]) -> np.ndarray:
+    """
+    32x32 グレースケールフレームの配列から 64bit pHash（uint64 配列）を計算する。
+    DCT の低周波 8x8 成分が中央値より大きいかどうかを 1bit にする。
+    """
+    stack = np.asarray(list(frames), dtype=np.float64)
+    if stack.size == 0:
+        return np.zeros(0, dtype=np.uint64)
+    coeffs = _DCT @ stack @ _DCT.T
+    low = coeffs[:, :HASH_SIZE, :HASH_SIZE].reshape(len(stack), -1)
+    med = np.median(low[:, 1:], axis=1, keepdims=True)   # DC 成分は除外
+    bits = (low > med).astype(np.uint64)
+    return (bits * _BIT_WEIGHTS).sum(axis=1, dtype=np.uint64)
+
+
+def to_blob(hashes: np.ndarray) -> bytes:
+    return hashes.astype("<u8").tobytes()
+
+
+def from_blob(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<u8").astype(np.uint64)
+
+
+# --------------------
+# マルチインデックス・ハッシュ
+# 64bit を (threshold + 1) 個のブロックに分けると、距離 threshold 以内の
+# ハッシュは少なくとも 1 ブロックが完全一致する（鳩の巣原理）。
+# ブロックごとの dict を引くだけで候補が絞れるため、全件比較が不要になる。
+# --------------------
+class MultiIndexHash:
+    def __init__(self, threshold: int = 6):
+        self.threshold = threshold
+        blocks = threshold + 1
+        widths = [64 // blocks + (1 if i < 64 % blocks else 0) for i in range(blocks)]
+        self._spans = []
+        shift = 0
+        for w in widths:
+            self._spans.append((shift, (1 << w) - 1))
+            shift += w
+        self._tables: List[Dict[int, List[int]]] = [dict() for _ in self._spans]
+        self._hashes: List[int] = []
+        self._owners: List[int] = []
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def add(self, owner: int, hashes: np.ndarray) -> None:
+        for h in hashes.tolist():
+            idx = len(self._hashes)
+            self._hashes.append(h)
+            self._owners.append(owner)
+            for table, (shift, mask) in zip(self._tables, self._spans):
+                table.setdefault((h >> shift) & mask, []).append(idx)
+
+    def query(self, h: int) -> List[Tuple[int, int]]:
+        """h から距離 threshold 以内の (owner, 距離) を返す。"""
+        candidates = set()
+        for table, (shift, mask) in zip(self._tables, self._spans):
+            candidates.update(table.get((h >> shift) & mask, ()))
+        result = []
+        for idx in candidates:
+            d = bin(self._hashes[idx] ^ h).count("1")
+            if d <= self.threshold:
+                result.append((self._owners[idx], d))
+        return result
+
+
+def find_clusters(videos: Dict[int, np.ndarray], threshold: int = 6, min_frames: int = 3) -> List[List[int]]:
+    """
+    {video_id: pHash 配列} から、min_frames 枚以上のフレームが距離 threshold 以内で
+    一致する動画同士をまとめ、重複候補のクラスタ（2 件以上）を返す。
+    """
+    index = MultiIndexHash(threshold)
+    parent = {v: v for v in videos}
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    for video_id, hashes in videos.items():
+        hits: Dict[int, int] = {}
+        for h in hashes.tolist():
+            for owner in {o for o, _ in index.query(h)}:
+                hits[owner] = hits.get(owner, 0) + 1
+        for owner, n in hits.items():
+            if n >= min(min_frames, len(hashes)):
+                parent[find(video_id)] = find(owner)
+        index.add(video_id, hashes)
+
+    groups: Dict[int, List[int]] = {}
+    for v in videos:
+        groups.setdefault(find(v), []).append(v)
+    return [sorted(g) for g in groups.values() if len(g) > 1]
@@ -0,0 +1,106 @@
+import os
+import subprocess
+from typing import Optional, Tuple
+
+# ファイル名のみ（例: my_script.py）
+script_name = os.path.basename(__file__)
+
+# --------------------
+# log出力
+# --------------------
+import lib.log as log
+
+
+# --------------------
+# プレビュー用スプライトと WebVTT ストーリーボード
+# 動画を 1 回だけデコードし、等間隔の N フレームを 1 枚の画像（スプライト）に並べる。
+# WebVTT の各キューには、その時間帯に対応するコマの位置（#xywh=）を書く。
+# 表示側はこの 2 ファイルを読むだけで、ホバープレビューやシークバーのサムネイルを出せる。
+# --------------------
+CELL_WIDTH = 160
+CELL_HEIGHT = 90
+COLUMNS = 10
+
+
+def probe_duration(video_path: str) -> Optional[float]:
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        video_path,
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        return float(proc.stdout.strip())
+    except ValueError:
+        return None
+
+
+def preview_paths(thumbnail: str) -> Tuple[str, str]:
+    """サムネイルと同じフォルダに置くスプライト（.sprite.jpg）と VTT（.vtt）のパス。"""
+    base, _ = os.path.splitext(thumbnail)
+    return base + ".sprite.jpg", base + ".vtt"
+
+
+def format_vtt_time(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def write_storyboard(vtt_path: str, sprite_url: str, duration: float, frames: int) -> None:
+    step = duration / frames
+    lines = ["WEBVTT", ""]
+    for i in range(frames):
+        x = (i % COLUMNS) * CELL_WIDTH
+        y = (i // COLUMNS) * CELL_HEIGHT
+        lines += [
+            f"{format_vtt_time(i * step)} --> {format_vtt_time((i + 1) * step)}",
+            f"{sprite_url}#xywh={x},{y},{CELL_WIDTH},{CELL_HEIGHT}",
+            "",
+        ]
+    with open(vtt_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("\n".join(lines))
+
+
+def generate_preview(video_path: str, sprite_path: str, vtt_path: str, sprite_url: str, frames: int) -> Optional[int]:
+    """
+    スプライトと VTT を作る。成功したらコマ数を返す。
+
+    fps=frames/duration で等間隔に間引き、tile で 1 枚にまとめるので ffmpeg は 1 回で済む。
+    -skip_frame nokey でキーフレームだけをデコードする（各コマは直前のキーフレームになるが、
+    プレビューには十分で、全フレームをデコードするより桁違いに速い）。
+    """
+    duration = probe_duration(video_path)
+    if not duration:
+        log.logprint(script_name, f"動画の長さを取得できません。({video_path})", level="Error")
+        return None
+
+    rows = (frames + COLUMNS - 1) // COLUMNS
+    vf = (
+        f"fps={frames}/{duration:.3f},"
+        f"scale={CELL_WIDTH}:{CELL_HEIGHT}:force_original_aspect_ratio=decrease,"
+        f"pad={CELL_WIDTH}:{CELL_HEIGHT}:(ow-iw)/2:(oh-ih)/2,"
+        f"tile={COLUMNS}x{rows}"
+    )
+    tmp = sprite_path + ".tmp.jpg"
+    cmd = [
+        "ffmpeg", "-v", "error", "-y",
+        "-skip_frame", "nokey",
+        "-i", video_path,
+        "-an", "-sn",
+        "-vf", vf,
+        "-frames:v", "1",
+        "-q:v", "4",
+        tmp,
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0 or not os.path.exists(tmp):
+        log.logprint(script_name, f"スプライトの作成に失敗しました。({video_path}) {proc.stderr.strip()}", level="Error")
+        return None
+
+    os.replace(tmp, sprite_path)
+    write_storyboard(vtt_path, sprite_url, duration, frames)
+    return frames
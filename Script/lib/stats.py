@@ -0,0 +1,382 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+# ファイル名のみ（例: my_script.py）
+script_name = os.path.basename(__file__)
+
+# --------------------
+# log出力
+# --------------------
+import lib.log as log
+
+
+# --------------------
+# ライブラリの集計（件数・合計サイズ・再生時間）
+# 集計表をトリガで増減させておき、統計の表示は集計表のグループ数だけ読めば済むようにする
+# （Videos / File を毎回全件なめない）。
+#
+#   videos.db  LibraryStats  dim = total / author / month（公開月。無ければチェックイン月）
+#              videos, bytes, duration, on_hdd（HDD にある）, in_playlist, favorites, plays
+#   media.db   MediaStats    dim = total / volume（volume_id）/ month（upload_date の月）
+#              files, bytes
+#
+# サイズ・再生時間は Videos.file_size / Videos.duration、File.file_size に持つ（無い行は 0 として数える）。
+# Videos と File は別の DB なので、BD へのバックアップ率（Videos のうち checksum か動画ID が
+# File にあるもの）はトリガでは数えられない。refresh_coverage で計算して StatsState に保存する。
+#
+# トリガで追えない変更（主キーの付け替え・トリガを作る前の変更など）でずれたときは、
+# rebuild_stats / rebuild_media_stats で作り直す。
+# --------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS LibraryStats (
+    dim          TEXT    NOT NULL,
+    key          TEXT    NOT NULL,
+    videos       INTEGER NOT NULL DEFAULT 0,
+    bytes        INTEGER NOT NULL DEFAULT 0,
+    duration     INTEGER NOT NULL DEFAULT 0,   -- 秒（動画ごとに丸めて足す。実数の足し引きの誤差をためない）
+    on_hdd       INTEGER NOT NULL DEFAULT 0,
+    in_playlist  INTEGER NOT NULL DEFAULT 0,
+    favorites    INTEGER NOT NULL DEFAULT 0,
+    plays        INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dim, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS StatsState (
+    id              INTEGER PRIMARY KEY CHECK (id = 1),
+    rebuilt_at      TEXT,
+    backup_videos   INTEGER,
+    backup_bytes    INTEGER,
+    coverage_at     TEXT
+);
+INSERT OR IGNORE INTO StatsState(id) VALUES (1);
+"""
+
+_MEDIA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS MediaStats (
+    dim    TEXT    NOT NULL,
+    key    TEXT    NOT NULL,
+    files  INTEGER NOT NULL DEFAULT 0,
+    bytes  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dim, key)
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = ["videos", "bytes", "duration", "on_hdd", "in_playlist", "favorites", "plays"]
+_MEDIA_COLUMNS = ["files", "bytes"]
+
+
+# --------------------
+# トリガ
+# 1 行の変更を (dim, key) の 3 グループ（total と、その行の author / month など）への
+# 増減として upsert する。更新は「古い行を引いて新しい行を足す」。
+# --------------------
+_GROUPS = "(SELECT 0 AS g UNION ALL SELECT 1 UNION ALL SELECT 2) AS grp"
+
+
+def _month(date_expr: str) -> str:
+    return f"COALESCE(substr({date_expr}, 1, 7), '')"
+
+
+def _seconds(duration_expr: str) -> str:
+    return f"CAST(ROUND(COALESCE({duration_expr}, 0)) AS INTEGER)"
+
+
+def _video_keys(ref: str) -> str:
+    return (f"CASE grp.g WHEN 0 THEN 'total' WHEN 1 THEN 'author' ELSE 'month' END, "
+            f"CASE grp.g WHEN 0 THEN '' WHEN 1 THEN COALESCE({ref}.author, '') "
+            f"ELSE {_month(f'COALESCE({ref}.publish_date, {ref}.checkin_time)')} END")
+
+
+def _media_keys(ref: str) -> str:
+    return (f"CASE grp.g WHEN 0 THEN 'total' WHEN 1 THEN 'volume' ELSE 'month' END, "
+            f"CASE grp.g WHEN 0 THEN '' WHEN 1 THEN COALESCE(CAST({ref}.volume_id AS TEXT), '') "
+            f"ELSE {_month(f'{ref}.upload_date')} END")
+
+
+def _upsert(table: str, columns, keys: str, values: str, source: str, where: str = "1") -> str:
+    added = ", ".join(f"{c} = {c} + excluded.{c}" for c in columns)
+    # WHERE は INSERT ... SELECT ... ON CONFLICT の構文のあいまいさを避けるために必ず書く
+    return (f"INSERT INTO {table} (dim, key, {', '.join(columns)}) "
+            f"SELECT {keys}, {values} FROM {source} WHERE {where} "
+            f"ON CONFLICT(dim, key) DO UPDATE SET {added};")
+
+
+def _video_values(sign: str, ref: str, file_ids: str, ids: str) -> str:
+    # HDD / Playlist は file_ids / ids のどれかに一致する行を見る（主キーの付け替えでも同じ行を見る）
+    return ", ".join([
+        f"{sign}1",
+        f"{sign}COALESCE({ref}.file_size, 0)",
+        f"{sign}{_seconds(f'{ref}.duration')}",
+        f"{sign}EXISTS (SELECT 1 FROM HDD WHERE file_id IN ({file_ids}))",
+        f"{sign}EXISTS (SELECT 1 FROM Playlist WHERE video_id IN ({ids}))",
+        f"{sign}COALESCE((SELECT MAX(favorite <> 0) FROM Playlist WHERE video_id IN ({ids})), 0)",
+        f"{sign}COALESCE((SELECT SUM(play_count) FROM Playlist WHERE video_id IN ({ids})), 0)",
+    ])
+
+
+def _video_delta(sign: str, ref: str, file_ids: str, ids: str) -> str:
+    return _upsert("LibraryStats", _COLUMNS, _video_keys(ref), _video_values(sign, ref, file_ids, ids), _GROUPS)
+
+
+def _hdd_delta(sign: str, file_id: str) -> str:
+    return _upsert("LibraryStats", _COLUMNS, _video_keys("v"), f"0, 0, 0, {sign}1, 0, 0, 0",
+                   f"Videos v, {_GROUPS}", f"v.file_id = {file_id}")
+
+
+def _playlist_delta(sign: str, ref: str) -> str:
+    values = f"0, 0, 0, 0, {sign}1, {sign}({ref}.favorite <> 0), {sign}{ref}.play_count"
+    return _upsert("LibraryStats", _COLUMNS, _video_keys("v"), values,
+                   f"Videos v, {_GROUPS}", f"v.id = {ref}.video_id")
+
+
+def _drop_empty(ref: str) -> str:
+    return (f"DELETE FROM LibraryStats WHERE dim <> 'total' AND videos = 0 AND key IN "
+            f"(COALESCE({ref}.author, ''), {_month(f'COALESCE({ref}.publish_date, {ref}.checkin_time)')});")
+
+
+def _media_delta(sign: str, ref: str) -> str:
+    return _upsert("MediaStats", _MEDIA_COLUMNS, _media_keys(ref),
+                   f"{sign}1, {sign}COALESCE({ref}.file_size, 0)", _GROUPS)
+
+
+# Videos の削除は BEFORE で引く（外部キーの CASCADE で HDD / Playlist が先に消えても数え漏れない。
+# 消えた後の HDD / Playlist のトリガは、Videos が無いので何もしない）。
+# HDD / Playlist の付け替えは、元の動画が残っているときだけ数え直す
+# （Videos の主キーの付け替えが CASCADE してきた場合は、Videos のトリガが数える）
+_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS stats_videos_ai AFTER INSERT ON Videos BEGIN
+    {_video_delta("+", "NEW", "NEW.file_id", "NEW.id")}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_videos_bd BEFORE DELETE ON Videos BEGIN
+    {_video_delta("-", "OLD", "OLD.file_id", "OLD.id")}
+    {_drop_empty("OLD")}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_videos_au
+AFTER UPDATE OF id, file_id, author, publish_date, checkin_time, file_size, duration ON Videos BEGIN
+    {_video_delta("-", "OLD", "OLD.file_id, NEW.file_id", "OLD.id, NEW.id")}
+    {_video_delta("+", "NEW", "OLD.file_id, NEW.file_id", "OLD.id, NEW.id")}
+    {_drop_empty("OLD")}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_hdd_ai AFTER INSERT ON HDD BEGIN
+    {_hdd_delta("+", "NEW.file_id")}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_hdd_ad AFTER DELETE ON HDD BEGIN
+    {_hdd_delta("-", "OLD.file_id")}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_hdd_au AFTER UPDATE OF file_id ON HDD
+WHEN EXISTS (SELECT 1 FROM Videos WHERE file_id = OLD.file_id) BEGIN
+    {_hdd_delta("-", "OLD.file_id")}
+    {_hdd_delta("+", "NEW.file_id")}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_playlist_ai AFTER INSERT ON Playlist BEGIN
+    {_playlist_delta("+", "NEW")}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_playlist_ad AFTER DELETE ON Playlist BEGIN
+    {_playlist_delta("-", "OLD")}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_playlist_au AFTER UPDATE OF video_id, favorite, play_count ON Playlist
+WHEN EXISTS (SELECT 1 FROM Videos WHERE id = OLD.video_id) BEGIN
+    {_playlist_delta("-", "OLD")}
+    {_playlist_delta("+", "NEW")}
+END;
+"""
+
+_MEDIA_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS stats_file_ai AFTER INSERT ON File BEGIN
+    {_media_delta("+", "NEW")}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_file_ad AFTER DELETE ON File BEGIN
+    {_media_delta("-", "OLD")}
+    DELETE FROM MediaStats WHERE dim <> 'total' AND files = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_file_au AFTER UPDATE OF volume_id, upload_date, file_size ON File BEGIN
+    {_media_delta("-", "OLD")}
+    {_media_delta("+", "NEW")}
+    DELETE FROM MediaStats WHERE dim <> 'total' AND files = 0;
+END;
+"""
+
+
+def _has_trigger(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)).fetchone() is not None
+
+
+def _add_columns(conn: sqlite3.Connection, table: str, columns) -> None:
+    have = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns:
+        if name not in have:
+            log.logprint(script_name, f"{table} テーブルに {name} 列を追加します。")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def ensure_stats(conn: sqlite3.Connection) -> bool:
+    """
+    videos.db に集計表・列・トリガを作る。トリガを新しく作ったときは（それまでの変更が
+    数えられていないので）全件から集計する。戻り値は新しく作ったかどうか。
+    """
+    created = not _has_trigger(conn, "stats_videos_ai")
+    _add_columns(conn, "Videos", [("file_size", "INTEGER"), ("duration", "REAL")])
+    conn.executescript(_SCHEMA + _TRIGGERS)
+    conn.commit()
+    if created:
+        rebuild_stats(conn)
+    return created
+
+
+def ensure_media_stats(conn: sqlite3.Connection) -> bool:
+    """media.db に集計表・File.file_size 列・トリガを作る（ensure_stats と同じ）。"""
+    created = not _has_trigger(conn, "stats_file_ai")
+    _add_columns(conn, "File", [("file_size", "INTEGER")])
+    conn.executescript(_MEDIA_SCHEMA + _MEDIA_TRIGGERS)
+    conn.commit()
+    if created:
+        rebuild_media_stats(conn)
+    return created
+
+
+# --------------------
+# 作り直し（ずれの修正）
+# --------------------
+def rebuild_stats(conn: sqlite3.Connection) -> int:
+    """LibraryStats を Videos / HDD / Playlist から作り直す。戻り値はグループ数。"""
+    sums = ", ".join(f"COALESCE(SUM({c}), 0)" for c in _COLUMNS)
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.execute("DELETE FROM LibraryStats")
+        c.execute(f"""
+            WITH per_video AS (
+                SELECT
+                    COALESCE(v.author, '') AS author,
+                    {_month("COALESCE(v.publish_date, v.checkin_time)")} AS month,
+                    1 AS videos,
+                    COALESCE(v.file_size, 0) AS bytes,
+                    {_seconds("v.duration")} AS duration,
+                    h.file_id IS NOT NULL AS on_hdd,
+                    p.video_id IS NOT NULL AS in_playlist,
+                    COALESCE(p.favorite <> 0, 0) AS favorites,
+                    COALESCE(p.play_count, 0) AS plays
+                FROM Videos v
+                    LEFT JOIN HDD h ON h.file_id = v.file_id
+                    LEFT JOIN Playlist p ON p.video_id = v.id
+            )
+            INSERT INTO LibraryStats (dim, key, {", ".join(_COLUMNS)})
+            SELECT 'total', '', {sums} FROM per_video
+            UNION ALL SELECT 'author', author, {sums} FROM per_video GROUP BY author
+            UNION ALL SELECT 'month', month, {sums} FROM per_video GROUP BY month
+        """)
+        c.execute("UPDATE StatsState SET rebuilt_at = ? WHERE id = 1", (datetime.now().isoformat(timespec="seconds"),))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    groups = conn.execute("SELECT COUNT(*) FROM LibraryStats").fetchone()[0]
+    log.logprint(script_name, f"LibraryStats を作り直しました。({groups} グループ)")
+    return groups
+
+
+def rebuild_media_stats(conn: sqlite3.Connection) -> int:
+    """MediaStats を File から作り直す。戻り値はグループ数。"""
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.execute("DELETE FROM MediaStats")
+        c.execute(f"""
+            INSERT INTO MediaStats (dim, key, files, bytes)
+            SELECT 'total', '', COUNT(*), COALESCE(SUM(file_size), 0) FROM File
+            UNION ALL
+            SELECT 'volume', COALESCE(CAST(volume_id AS TEXT), ''), COUNT(*), SUM(COALESCE(file_size, 0))
+            FROM File GROUP BY 2
+            UNION ALL
+            SELECT 'month', {_month("upload_date")}, COUNT(*), SUM(COALESCE(file_size, 0))
+            FROM File GROUP BY 2
+        """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    groups = conn.execute("SELECT COUNT(*) FROM MediaStats").fetchone()[0]
+    log.logprint(script_name, f"MediaStats を作り直しました。({groups} グループ)")
+    return groups
+
+
+# --------------------
+# BD へのバックアップ率
+# Videos の checksum か動画ID（source_id）が media.db の File にあれば、バックアップ済みとする。
+# 別の DB をまたぐのでトリガでは数えられず、呼ばれたときに 1 回だけ全件を突き合わせる。
+# --------------------
+def refresh_coverage(conn: sqlite3.Connection, media_db_path: str) -> Optional[tuple]:
+    """(バックアップ済みの動画数, その合計サイズ) を計算して StatsState に保存する。media.db が無ければ None。"""
+    if not os.path.isfile(media_db_path):
+        log.logprint(script_name, f"media.db が見つかりません。({media_db_path})", level="Error")
+        return None
+    conn.commit()   # ATTACH / DETACH はトランザクションの外で行う
+    conn.execute("ATTACH DATABASE ? AS media", (str(media_db_path),))
+    try:
+        (videos, size), = conn.execute("""
+            SELECT COUNT(*), COALESCE(SUM(file_size), 0)
+            FROM Videos v
+            WHERE (v.checksum <> '' AND v.checksum IN (SELECT checksum FROM media.File WHERE checksum IS NOT NULL))
+               OR v.source_id IN (SELECT source_id FROM media.File WHERE source_id IS NOT NULL)
+        """).fetchall()
+    finally:
+        conn.execute("DETACH DATABASE media")
+    conn.execute(
+        "UPDATE StatsState SET backup_videos = ?, backup_bytes = ?, coverage_at = ? WHERE id = 1",
+        (videos, size, datetime.now().isoformat(timespec="seconds")),
+    )
+    conn.commit()
+    log.logprint(script_name, f"バックアップ済み: {videos} 件 ({size:,} bytes)")
+    return videos, size
+
+
+# --------------------
+# サイズ・再生時間の記録
+# 更新はトリガを通るので、集計表もそのまま正しくなる。
+# --------------------
+def fill_sizes(conn: sqlite3.Connection, file_ids: Optional[Iterable[str]] = None) -> int:
+    """
+    Videos.file_size が空の動画（HDD にあるもの）のサイズを記録する。戻り値は記録した件数。
+    file_ids を渡すとその動画だけを調べる（チェックインした分だけ。ファイルの無い動画を毎回調べ直さない）。
+    """
+    sql = """
+        SELECT v.id, h.folder_path, v.file_name
+        FROM Videos v JOIN HDD h ON h.file_id = v.file_id
+        WHERE v.file_size IS NULL
+    """
+    if file_ids is None:
+        rows = conn.execute(sql).fetchall()
+    else:
+        rows = [row for file_id in file_ids for row in conn.execute(sql + " AND v.file_id = ?", (file_id,))]
+    sizes = []
+    for video_id, folder_path, file_name in rows:
+        try:
+            sizes.append((os.path.getsize(os.path.join(folder_path, file_name)), video_id))
+        except (OSError, TypeError):
+            continue
+    conn.executemany("UPDATE Videos SET file_size = ? WHERE id = ?", sizes)
+    conn.commit()
+    return len(sizes)
+
+
+def fill_durations(conn: sqlite3.Connection, probe: Callable[[str], Optional[float]],
+                   workers: int = 2, batch: int = 200) -> int:
+    """Videos.duration が空の動画の再生時間を probe（ffprobe など）で調べて記録する。"""
+    rows = conn.execute("""
+        SELECT v.id, h.folder_path, v.file_name
+        FROM Videos v JOIN HDD h ON h.file_id = v.file_id
+        WHERE v.duration IS NULL
+    """).fetchall()
+    paths = [os.path.join(r[1], r[2]) for r in rows]
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(rows), batch):
+            found = pool.map(lambda p: probe(p) if os.path.isfile(p) else None, paths[start:start + batch])
+            durations = [(d, r[0]) for r, d in zip(rows[start:start + batch], found) if d is not None]
+            conn.executemany("UPDATE Videos SET duration = ? WHERE id = ?", durations)
+            conn.commit()
+            done += len(durations)
+            log.logprint(script_name, f"再生時間を記録しました。({start + len(rows[start:start + batch])}/{len(rows)})")
+    return done
@@ -0,0 +1,291 @@
+import os
+import re
+import shutil
+import sqlite3
+import stat
+import subprocess
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import lib.disc_image as disc_image
+
+
+# --------------------
+# ボリューム（BD / DVD / ディスクイメージ）の識別
+# Windows と Linux のどちらでも、ドライブ・マウントポイント・デバイス・.iso から
+# ラベルと UUID を取り出す。
+#
+#   Windows: ドライブレター（D: / D:\）を GetVolumeInformationW で読む
+#            UUID はボリュームシリアル番号（vol コマンドと同じ XXXX-XXXX）
+#   Linux  : マウントポイントは /proc/self/mountinfo からデバイスを求め、
+#            /dev/disk/by-label・by-uuid（root 不要）-> 記述子を直接読む -> blkid の順に試す。
+#            ループデバイス（マウントしたイメージ）は元の .iso の記述子を読む
+#   .iso   : ISO9660 / UDF の記述子を直接読む（lib/disc_image.py）
+# --------------------
+@dataclass
+class VolumeInfo:
+    label: Optional[str]
+    uuid: Optional[str] = None
+    fs_type: Optional[str] = None
+    device: Optional[str] = None        # /dev/sr0, D:
+    mount_point: Optional[str] = None
+    image: Optional[str] = None         # ディスクイメージのパス
+    source: str = ""                    # 取得方法（win32 / by-label / descriptor / blkid）
+
+
+def identify(target: str) -> Optional[VolumeInfo]:
+    """ラベルを取得できなければ None（メディアが入っていない・読めないなど）。"""
+    if os.name == "nt":
+        if os.path.isfile(target):
+            return _identify_image(target)
+        return _identify_windows(target)
+
+    try:
+        st = os.stat(target)
+    except OSError:
+        return None
+    if stat.S_ISBLK(st.st_mode):
+        return _identify_block(target)
+    if stat.S_ISREG(st.st_mode):
+        return _identify_image(target)
+
+    mount = _mount_of_path(target)
+    if mount is None:
+        return None
+    mount_point, fs_type, source = mount
+    info = _identify_block(source) if source.startswith("/dev/") else None
+    if info is None:
+        return None
+    info.mount_point = mount_point
+    info.fs_type = info.fs_type or fs_type
+    return info
+
+
+def volume_label(target: str) -> Optional[str]:
+    info = identify(target)
+    return info.label if info else None
+
+
+def _identify_image(path: str) -> Optional[VolumeInfo]:
+    try:
+        found = disc_image.read_volume_descriptor(path)
+    except OSError:
+        return None
+    if found is None:
+        return None
+    label, uuid, fs_type = found
+    return VolumeInfo(label, uuid, fs_type, image=os.path.abspath(path), source="descriptor")
+
+
+# --------------------
+# Windows
+# --------------------
+def _drive_root(target: str) -> str:
+    drive = os.path.splitdrive(os.path.abspath(target))[0] or target.rstrip("\\/")
+    return drive.rstrip("\\") + "\\"
+
+
+def _identify_windows(target: str) -> Optional[VolumeInfo]:
+    import ctypes
+    root = _drive_root(target)
+    label = ctypes.create_unicode_buffer(261)
+    fs_name = ctypes.create_unicode_buffer(261)
+    serial = ctypes.c_uint32()
+    ok = ctypes.windll.kernel32.GetVolumeInformationW(
+        ctypes.c_wchar_p(root), label, len(label), ctypes.byref(serial), None, None, fs_name, len(fs_name)
+    )
+    if not ok:
+        return None
+    uuid = f"{serial.value >> 16:04X}-{serial.value & 0xFFFF:04X}"
+    return VolumeInfo(label.value or None, uuid, fs_name.value.lower() or None,
+                      device=root.rstrip("\\"), mount_point=root, source="win32")
+
+
+# --------------------
+# Linux
+# --------------------
+def _unescape_mount(text: str) -> str:
+    """mountinfo の 8 進エスケープ（\\040 など）を戻す。"""
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), text)
+
+
+def _unescape_udev(name: str) -> str:
+    """/dev/disk/by-label のエスケープ（\\x20 など）を戻す。"""
+    raw = re.sub(rb"\\x([0-9a-fA-F]{2})", lambda m: bytes([int(m.group(1), 16)]), os.fsencode(name))
+    return raw.decode("utf-8", errors="replace")
+
+
+def _mountinfo() -> List[Tuple[str, str, str, str]]:
+    """(maj:min, マウントポイント, ファイルシステム, デバイス) の一覧。"""
+    entries = []
+    try:
+        with open("/proc/self/mountinfo", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                left, _, right = line.partition(" - ")
+                fields = left.split()
+                rest = right.split()
+                if len(fields) >= 5 and len(rest) >= 2:
+                    entries.append((fields[2], _unescape_mount(fields[4]), rest[0], _unescape_mount(rest[1])))
+    except OSError:
+        pass
+    return entries
+
+
+def _mount_of_path(path: str) -> Optional[Tuple[str, str, str]]:
+    dev = os.stat(path).st_dev
+    key = f"{os.major(dev)}:{os.minor(dev)}"
+    path = os.path.realpath(path)
+    best = None
+    for majmin, mount_point, fs_type, source in _mountinfo():
+        if majmin != key:
+            continue
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and (best is None or len(mount_point) > len(best[0])):
+            best = (mount_point, fs_type, source)
+    return best
+
+
+def mount_point_of(device: str) -> Optional[str]:
+    device = os.path.realpath(device)
+    for _, mount_point, _, source in _mountinfo():
+        if source.startswith("/dev/") and os.path.realpath(source) == device:
+            return mount_point
+    return None
+
+
+def _by_link(kind: str, device: str) -> Optional[str]:
+    directory = f"/dev/disk/{kind}"
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return None
+    for name in names:
+        if os.path.realpath(os.path.join(directory, name)) == device:
+            return _unescape_udev(name)
+    return None
+
+
+def _blkid(device: str) -> Dict[str, str]:
+    if shutil.which("blkid") is None:
+        return {}
+    proc = subprocess.run(["blkid", "-o", "export", device],
+                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    values = {}
+    for line in proc.stdout.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            values[key] = value
+    return values
+
+
+def _identify_block(device: str) -> Optional[VolumeInfo]:
+    device = os.path.realpath(device)
+    name = os.path.basename(device)
+
+    # マウントしたイメージ（ループデバイス）は元のファイルを読む（root 不要）
+    try:
+        with open(f"/sys/block/{name}/loop/backing_file", encoding="utf-8") as f:
+            backing = f.read().strip()
+        info = _identify_image(backing)
+        if info is not None:
+            info.device = device
+            return info
+    except OSError:
+        pass
+
+    label = _by_link("by-label", device)
+    if label is not None:
+        return VolumeInfo(label, _by_link("by-uuid", device), device=device, source="by-label")
+
+    try:
+        info = disc_image.read_volume_descriptor(device)
+    except OSError:
+        info = None
+    if info is not None:
+        return VolumeInfo(info[0], info[1], info[2], device=device, source="descriptor")
+
+    values = _blkid(device)
+    if values.get("LABEL"):
+        return VolumeInfo(values["LABEL"], values.get("UUID"), values.get("TYPE"), device=device, source="blkid")
+    return None
+
+
+# --------------------
+# 光学ドライブの一覧
+# --------------------
+def list_optical_drives() -> List[str]:
+    """Windows は "D:\\" のようなドライブ、Linux は /dev/sr0 のようなデバイスを返す。"""
+    if os.name == "nt":
+        import ctypes
+        import string
+        drives = []
+        bitmask = ctypes.windll.kernel32.GetLogicalDrives()
+        for i, letter in enumerate(string.ascii_uppercase):
+            if bitmask & (1 << i):
+                drive = f"{letter}:\\"
+                if ctypes.windll.kernel32.GetDriveTypeW(ctypes.c_wchar_p(drive)) == 5:  # DRIVE_CDROM
+                    drives.append(drive)
+        return drives
+    try:
+        names = sorted(n for n in os.listdir("/sys/block") if n.startswith("sr"))
+    except OSError:
+        return []
+    return [f"/dev/{n}" for n in names]
+
+
+# --------------------
+# media.db の Volume への登録
+# 同じ UUID とラベルのボリュームが登録済みなら、それを使う（同じディスクを 2 回登録しない）。
+# ラベルと human_number が同じでも UUID が違えば別のディスクなので、VolumeConflict にする。
+# --------------------
+class VolumeConflict(Exception):
+    """ラベルと human_number が同じで UUID の違うボリュームが登録済み。"""
+
+
+def ensure_volume_uuid(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+    cols = {r[1] for r in cur.execute("PRAGMA table_info(Volume)")}
+    if "volume_uuid" in cols:
+        return
+    print("Volume テーブルに volume_uuid 列を追加します")
+    cur.execute("ALTER TABLE Volume ADD COLUMN volume_uuid TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_volume_uuid ON Volume(volume_uuid)")
+    conn.commit()
+
+
+def register_volume(conn: sqlite3.Connection, info: VolumeInfo, human_number: str,
+                    notes: str = "", write_count: int = 1) -> Tuple[int, bool]:
+    """(volume_id, 新規に登録したか) を返す。"""
+    ensure_volume_uuid(conn)
+    cur = conn.cursor()
+    if info.uuid:
+        row = cur.execute(
+            "SELECT volume_id FROM Volume WHERE volume_uuid = ? AND volume_label = ?",
+            (info.uuid, info.label),
+        ).fetchone()
+        if row is not None:
+            return row[0], False
+    try:
+        cur.execute("""
+            INSERT INTO Volume (volume_label, human_number, notes, write_count, volume_uuid)
+            VALUES (?, ?, ?, ?, ?)
+        """, (info.label, human_number, notes, write_count, info.uuid))
+        conn.commit()
+        return cur.lastrowid, True
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        row = cur.execute("""
+            SELECT volume_id, volume_uuid FROM Volume
+            WHERE volume_label = ? AND human_number = ?
+        """, (info.label, human_number)).fetchone()
+        if info.uuid and row[1] is not None and row[1] != info.uuid:
+            raise VolumeConflict(
+                f"同じラベル・human_number で UUID の違うボリュームが登録済みです。"
+                f"(volume_id={row[0]}, label={info.label}, human_number={human_number}, "
+                f"登録済み UUID={row[1]}, UUID={info.uuid})"
+            )
+        if info.uuid:
+            cur.execute("UPDATE Volume SET volume_uuid = ? WHERE volume_id = ? AND volume_uuid IS NULL",
+                        (info.uuid, row[0]))
+            conn.commit()
+        return row[0], False
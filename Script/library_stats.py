@@ -0,0 +1,181 @@
+"""library_stats.py
+
+動画ライブラリの統計（作者ごと・月ごと・BD のボリュームごとの件数・合計サイズ・再生時間と、
+BD へのバックアップ率）を表示する。
+集計は videos.db の LibraryStats / media.db の MediaStats にトリガで増減させてあるので、
+表示はグループ数だけ読めば済む（lib/stats.py）。
+
+  show     集計を表示する（Web サーバの /api/stats と同じ内容）
+  rebuild  集計表を全件から作り直す（初回・ずれたとき）。バックアップ率も計算し直す
+  refresh  バックアップ率（Videos と media.db の File の突き合わせ）だけを計算し直す
+  fill     サイズ（と --duration で再生時間）の空いている動画を調べて記録する
+
+使い方（例。MOVIE_MNG 直下で）:
+  python Script\\library_stats.py rebuild
+  python Script\\library_stats.py fill --duration
+  python Script\\library_stats.py show [--top 20] [--json]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+#------------------------------
+# 初期変数の読み込み
+#------------------------------
+from config.settings import VIDEO_DB_PATH, MEDIA_DB_PATH, JOB_LIMITS
+# ファイル名のみ（例: my_script.py）
+script_name = os.path.basename(__file__)
+
+
+#------------------------------
+# ログ出力
+#------------------------------
+import lib.log as log
+import lib.stats as stats
+
+# 表示は Web サーバと同じ問い合わせ（video_app/queries.py）を使う
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "video_app"))
+import queries
+
+
+def format_bytes(n: int) -> str:
+    size = float(n)
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+
+
+def format_duration(seconds: int) -> str:
+    h, rem = divmod(int(seconds), 3600)
+    return f"{h:,}:{rem // 60:02d}:{rem % 60:02d}"
+
+
+def print_stats(result: dict) -> None:
+    total = result["total"]
+    print(f"動画: {total['videos']:,} 件, {format_bytes(total['bytes'])}, 再生時間 {format_duration(total['duration'])}")
+    print(f"  HDD にある: {total['on_hdd']:,} 件, プレイリスト: {total['in_playlist']:,} 件, "
+          f"お気に入り: {total['favorites']:,} 件, 再生回数: {total['plays']:,}")
+    backup = result["backup"]
+    if backup is None:
+        print("  BD へのバックアップ: 未計算（refresh を実行してください）")
+    else:
+        ratio = f"{backup['ratio']:.1%}" if backup["ratio"] is not None else "-"
+        print(f"  BD へのバックアップ: {backup['videos']:,} 件 ({ratio}), {format_bytes(backup['bytes'])}（{backup['checked_at']} 時点）")
+
+    print(f"\n作者（{result['author_count']:,} 人中、動画数の多い順に {len(result['authors'])} 人）")
+    for r in result["authors"]:
+        print(f"  {r['author'] or '(不明)'}: {r['videos']:,} 件, {format_bytes(r['bytes'])}, {format_duration(r['duration'])}")
+
+    print("\n月（公開月。不明ならチェックイン月）")
+    for r in result["months"]:
+        print(f"  {r['month'] or '(不明)'}: {r['videos']:,} 件, {format_bytes(r['bytes'])}, {format_duration(r['duration'])}")
+
+    media = result["media"]
+    if media is None:
+        return
+    print(f"\nBD: {media['volume_count']:,} 枚, {media['total']['files']:,} ファイル, {format_bytes(media['total']['bytes'])}")
+    for r in media["volumes"]:
+        print(f"  {r['human_number'] or '-'} {r['volume_label'] or '(volume_id=' + str(r['volume_id']) + ')'}: "
+              f"{r['files']:,} ファイル, {format_bytes(r['bytes'])}")
+
+
+def cmd_show(args) -> int:
+    conn = queries.connect(args.videos_db)
+    try:
+        result = queries.library_stats(conn, args.top)
+    finally:
+        conn.close()
+    if result is None:
+        log.logprint(script_name, "集計表がありません。先に rebuild を実行してください。")
+        return 1
+    result["media"] = None
+    if os.path.isfile(args.media_db):
+        media = queries.connect(args.media_db)
+        try:
+            result["media"] = queries.media_stats(media)
+        finally:
+            media.close()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_stats(result)
+    return 0
+
+
+def cmd_rebuild(args) -> int:
+    if args.db in ("all", "videos"):
+        conn = sqlite3.connect(args.videos_db)
+        try:
+            if not stats.ensure_stats(conn):
+                stats.rebuild_stats(conn)
+            stats.refresh_coverage(conn, args.media_db)
+        finally:
+            conn.close()
+    if args.db in ("all", "media") and os.path.isfile(args.media_db):
+        conn = sqlite3.connect(args.media_db)
+        try:
+            if not stats.ensure_media_stats(conn):
+                stats.rebuild_media_stats(conn)
+        finally:
+            conn.close()
+    return 0
+
+
+def cmd_refresh(args) -> int:
+    conn = sqlite3.connect(args.videos_db)
+    try:
+        stats.ensure_stats(conn)
+        return 0 if stats.refresh_coverage(conn, args.media_db) is not None else 1
+    finally:
+        conn.close()
+
+
+def cmd_fill(args) -> int:
+    conn = sqlite3.connect(args.videos_db)
+    try:
+        stats.ensure_stats(conn)
+        log.logprint(script_name, f"サイズを記録しました。({stats.fill_sizes(conn)} 件)")
+        if args.duration:
+            from lib.preview import probe_duration
+            done = stats.fill_durations(conn, probe_duration, workers=args.workers)
+            log.logprint(script_name, f"再生時間を記録しました。({done} 件)")
+    finally:
+        conn.close()
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="動画ライブラリの統計を表示する・集計表を作り直す")
+    parser.add_argument("--videos-db", default=str(VIDEO_DB_PATH))
+    parser.add_argument("--media-db", default=str(MEDIA_DB_PATH))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("show", help="集計を表示する")
+    p.add_argument("--top", type=int, default=30, help="表示する作者の数")
+    p.add_argument("--json", action="store_true", help="/api/stats と同じ JSON で出力する")
+
+    p = sub.add_parser("rebuild", help="集計表を全件から作り直す（バックアップ率も計算し直す）")
+    p.add_argument("--db", choices=["all", "videos", "media"], default="all", help="対象の DB")
+
+    sub.add_parser("refresh", help="BD へのバックアップ率を計算し直す")
+
+    p = sub.add_parser("fill", help="サイズの空いている動画のサイズを記録する")
+    p.add_argument("--duration", action="store_true", help="再生時間も ffprobe で調べて記録する")
+    p.add_argument("--workers", type=int, default=JOB_LIMITS.get("ffmpeg", 2), help="同時に動かす ffprobe の数")
+
+    args = parser.parse_args(argv)
+    if args.command == "show":
+        return cmd_show(args)
+    if args.command == "rebuild":
+        return cmd_rebuild(args)
+    if args.command == "refresh":
+        return cmd_refresh(args)
+    return cmd_fill(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""media_scan.py
+
+media/ 配下のファイルと Videos.db の整合性をチェックする。
+
+検出する項目:
+ - orphan    : media/YYYY/MM/DD にあるが Videos/HDD に登録されていないファイル
+ - missing   : Videos/HDD に登録されているがファイルが存在しないレコード
+ - thumbnail : Playlist.thumbnail のファイルが THUMBNAIL_DIR に存在しないもの
+
+ファイルツリーは os.scandir で 1 回だけ走査し、DB はテーブルごとに 1 クエリで
+集合に読み込んで差分を取るため、10 万ファイル規模でも数秒で終わる。
+
+使い方（例）:
+  python Script\\media_scan.py              # レポートのみ
+  python Script\\media_scan.py --fix        # missing を HDD_flag=0 に、thumbnail を再作成
+  python Script\\media_scan.py --requeue-orphans   # orphan を Checkin フォルダへ戻す
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+# ファイル名のみ（例: my_script.py）
+script_name = os.path.basename(__file__)
+
+#------------------------------
+# 初期変数の読み込み
+#------------------------------
+from config.settings import VIDEO_DB_PATH, MEDIA_DIR, THUMBNAIL_DIR, CHECKIN_DIR
+
+#------------------------------
+# ログ出力
+#------------------------------
+import lib.log as log
+
+# --------------------
+# DB Writer (SQLite)
+# --------------------
+from lib.db import videosDBWriter
+
+
+_SEP = re.compile(r"[\\/]")
+
+
+def _tail_key(path: str, depth: int) -> str:
+    """
+    Windows/Linux どちらで保存されたパスでも比較できるよう、
+    末尾 depth 個の要素を '/' でつないだキーにする。
+    """
+    parts = [p for p in _SEP.split(path) if p]
+    return "/".join(parts[-depth:])
+
+
+def scan_tree(root, depth: int) -> Set[str]:
+    """
+    root 配下を depth 階層（media なら YYYY/MM/DD の 3）まで os.scandir で走査し、
+    "YYYY/MM/DD/file_name" 形式のキー集合を返す。
+    """
+    keys = set()
+    stack = [(str(root), "", 0)]
+    while stack:
+        path, prefix, level = stack.pop()
+        try:
+            it = os.scandir(path)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if level < depth:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, prefix + entry.name + "/", level + 1))
+                elif entry.is_file(follow_symlinks=False):
+                    keys.add(prefix + entry.name)
+    return keys
+
+
+def find_inconsistencies(db: videosDBWriter) -> Dict[str, List]:
+    media_keys = scan_tree(MEDIA_DIR, 3)
+    thumb_keys = scan_tree(THUMBNAIL_DIR, 2)
+    log.logprint(script_name, f"media ファイル数: {len(media_keys)} / thumbnail ファイル数: {len(thumb_keys)}")
+
+    registered = {}
+    missing = []
+    for file_id, file_name, folder_path in db.load_hdd_entries():
+        if folder_path is None or file_name is None:
+            missing.append(file_id)
+            continue
+        key = _tail_key(folder_path, 3) + "/" + file_name
+        registered[key] = file_id
+        if key not in media_keys:
+            missing.append(file_id)
+
+    # チェックイン中（ジャーナルに残っている）のファイルは orphan としない
+    in_flight = {_tail_key(p, 4) for p in db.load_journal_targets()}
+    orphans = sorted(k for k in media_keys if k not in registered and k not in in_flight)
+
+    thumbnails = []
+    for video_id, thumbnail, folder_path, checkin_time, file_name in db.load_playlist_thumbnails():
+        if _tail_key(thumbnail, 3) not in thumb_keys:
+            thumbnails.append((video_id, thumbnail, folder_path, checkin_time, file_name))
+
+    return {"orphan": orphans, "missing": missing, "thumbnail": thumbnails}
+
+
+def fix_missing(db: videosDBWriter, file_ids: List[str]) -> None:
+    if file_ids:
+        db.mark_hdd_missing(file_ids)
+
+
+def fix_thumbnails(db: videosDBWriter, rows: List[Tuple]) -> None:
+    # ffmpeg を使うため、必要なときだけ読み込む
+    from playlist_register import create_thumbnail
+
+    for video_id, thumbnail, folder_path, checkin_time, file_name in rows:
+        if folder_path is None:
+            log.logprint(script_name, f"動画ファイルが HDD にないため再作成できません。(video_id={video_id})", level="Error")
+            continue
+        new_thumb = create_thumbnail(folder_path, checkin_time, file_name)
+        if new_thumb != thumbnail:
+            db.update_thumbnail(video_id, new_thumb)
+
+
+def requeue_orphans(keys: List[str]) -> None:
+    CHECKIN_DIR.mkdir(parents=True, exist_ok=True)
+    for key in keys:
+        src = MEDIA_DIR / key
+        dst = CHECKIN_DIR / src.name
+        if dst.exists():
+            log.logprint(script_name, f"Checkin に同名ファイルがあるためスキップ ({dst})", level="Error")
+            continue
+        shutil.move(src, dst)
+        log.logprint(script_name, f"未登録ファイルを Checkin へ戻しました。({key})")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="media/ と Videos.db の整合性チェック")
+    parser.add_argument("--fix", action="store_true", help="missing を HDD_flag=0 にし、欠けたサムネイルを再作成する")
+    parser.add_argument("--requeue-orphans", action="store_true", help="未登録ファイルを Checkin フォルダへ戻す")
+    args = parser.parse_args(argv)
+
+    log.logprint(script_name, "スクリプトを開始しました")
+    db = videosDBWriter(VIDEO_DB_PATH)
+    result = find_inconsistencies(db)
+
+    for key in result["orphan"]:
+        log.logprint(script_name, f"[orphan] 未登録ファイル: {key}")
+    for file_id in result["missing"]:
+        log.logprint(script_name, f"[missing] ファイルなし: {file_id}")
+    for row in result["thumbnail"]:
+        log.logprint(script_name, f"[thumbnail] サムネイルなし: video_id={row[0]} {row[1]}")
+    log.logprint(
+        script_name,
+        f"orphan={len(result['orphan'])} missing={len(result['missing'])} thumbnail={len(result['thumbnail'])}",
+    )
+
+    if args.fix:
+        fix_missing(db, result["missing"])
+        fix_thumbnails(db, result["thumbnail"])
+    if args.requeue_orphans:
+        requeue_orphans(result["orphan"])
+
+    db.close()
+    log.logprint(script_name, "スクリプトを終了しました")
+    found = any(result.values())
+    return 1 if found and not (args.fix or args.requeue_orphans) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
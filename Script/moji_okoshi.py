@@ -1,50 +1,353 @@
+import argparse
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
 import cv2
+import numpy as np
 import pytesseract
-from pathlib import Path
 
 # フォルダ定義
 SNAPSHOT_DIR = Path("snapshot")
 MONO_DIR = Path("monoqlo")
 TEXT_DIR = Path("srt-text")
 
-MONO_DIR.mkdir(exist_ok=True)
-TEXT_DIR.mkdir(exist_ok=True)
-
 # OCR設定（日本語）
 TESSERACT_LANG = "jpn"
 
-def to_monochrome(src_path: Path, dst_path: Path):
-    img = cv2.imread(str(src_path))
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+# 字幕の変化検出
+SNAPSHOT_FPS = 2.0          # moji_snap.bat の fps と合わせる
+SIGNATURE_WIDTH = 160       # 比較用に縮小する幅
+CHANGE_THRESHOLD = 0.02     # 2 値化画素の不一致率がこれを超えたら別の字幕とみなす
+MIN_INK_RATIO = 0.002       # 文字（白画素）がこれ未満なら字幕なしとみなす
+SEGMENT_SAMPLES = 16        # 区間の中央のフレームを選ぶために手元に残すフレーム数の上限
+
+
+def binarize(img: np.ndarray) -> np.ndarray:
+    """BGR またはグレースケール画像を Otsu で 2 値化する（ファイルには書かない）。"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
 
     # 2値化（Otsu）
     _, binary = cv2.threshold(
         gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU
     )
+    return binary
 
-    cv2.imwrite(str(dst_path), binary)
 
-def ocr_image(img_path: Path) -> str:
-    img = cv2.imread(str(img_path))
+def crop_subtitle(img: np.ndarray, top: float = 0.0) -> np.ndarray:
+    """画像の下側（高さ比 top 以降）を字幕領域として切り出す。"""
+    return img[int(img.shape[0] * top):]
+
+
+def to_monochrome(src_path: Path, dst_path: Path):
+    img = cv2.imread(str(src_path))
+    cv2.imwrite(str(dst_path), binarize(img))
+
+
+def ocr_image(img: np.ndarray) -> str:
+    """2 値化済みの NumPy 配列をそのまま tesseract に渡す。"""
     text = pytesseract.image_to_string(img, lang=TESSERACT_LANG)
     return text.strip()
 
-def main():
-    for png in sorted(SNAPSHOT_DIR.glob("*.png")):
-        mono_path = MONO_DIR / png.name
-        text_path = TEXT_DIR / (png.stem + ".txt")
 
-        print(f"Processing: {png.name}")
+def _init_worker():
+    # tesseract 内部の OpenMP スレッドとプロセスプールが取り合わないようにする
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+# --------------------
+# 字幕の変化検出
+# 連続するスナップショットはほとんどが同じ字幕なので、縮小した 2 値画像を
+# 前フレームと比較して字幕の区間（セグメント）にまとめ、OCR は区間ごとに 1 回だけ行う。
+# --------------------
+def frame_signature(img: np.ndarray, top: float = 0.0) -> np.ndarray:
+    """字幕領域を縮小・2 値化した bool 配列（比較用）を返す。"""
+    region = crop_subtitle(img, top)
+    h, w = region.shape[:2]
+    small = cv2.resize(region, (SIGNATURE_WIDTH, max(1, h * SIGNATURE_WIDTH // w)), interpolation=cv2.INTER_AREA)
+    return binarize(small) > 0
+
+
+def _has_ink(sig: np.ndarray) -> bool:
+    # Otsu は背景側が多数派になるので、少数派の画素を文字とみなす
+    ratio = sig.mean()
+    return MIN_INK_RATIO <= min(ratio, 1.0 - ratio)
+
+
+class SegmentTracker:
+    """
+    signature を 1 フレームずつ受け取り、字幕が変わらない区間 [start, end)
+    （フレーム番号）が確定したら返す。字幕の無い区間は返さない。
+    """
+    def __init__(self, threshold: float = CHANGE_THRESHOLD):
+        self.threshold = threshold
+        self.start = None
+        self.prev = None
+        self.count = 0
+
+    def feed(self, sig: np.ndarray) -> Optional[Tuple[int, int]]:
+        i = self.count
+        self.count += 1
+        prev, self.prev = self.prev, sig
+        ink = _has_ink(sig)
+        changed = prev is None or sig.shape != prev.shape or np.count_nonzero(sig != prev) > self.threshold * sig.size
+        closed = None
+        if self.start is not None and (changed or not ink):
+            closed = (self.start, i)
+            self.start = None
+        if ink and self.start is None:
+            self.start = i
+        return closed
+
+    def close(self) -> Optional[Tuple[int, int]]:
+        if self.start is None:
+            return None
+        closed, self.start = (self.start, self.count), None
+        return closed
+
+
+def group_segments(signatures: Iterable[np.ndarray], threshold: float = CHANGE_THRESHOLD) -> List[Tuple[int, int]]:
+    """signature の列をまとめて区間に分ける。"""
+    tracker = SegmentTracker(threshold)
+    segments = [seg for seg in map(tracker.feed, signatures) if seg is not None]
+    last = tracker.close()
+    if last is not None:
+        segments.append(last)
+    return segments
+
+
+def _format_srt_time(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def merge_cues(segments: List[Tuple[int, int]], texts: List[str], fps: float) -> List[Tuple[float, float, str]]:
+    """空のテキストを除き、同じテキストが続く区間をつなげて (開始秒, 終了秒, テキスト) にする。"""
+    cues = []
+    for (start, end), text in zip(segments, texts):
+        if not text:
+            continue
+        if cues and cues[-1][2] == text and abs(cues[-1][1] - start / fps) < 1e-6:
+            cues[-1] = (cues[-1][0], end / fps, text)
+        else:
+            cues.append((start / fps, end / fps, text))
+    return cues
+
+
+def write_srt(cues: List[Tuple[float, float, str]], path: Path) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for no, (start, end, text) in enumerate(cues, start=1):
+            f.write(f"{no}\n{_format_srt_time(start)} --> {_format_srt_time(end)}\n{text}\n\n")
+
+
+# --------------------
+# snapshot/*.png の処理（ワーカープロセスで実行）
+# --------------------
+def _snapshot_signature(task: Tuple[Path, float]) -> np.ndarray:
+    png, top = task
+    img = cv2.imread(str(png))
+    if img is None:
+        return np.zeros((1, SIGNATURE_WIDTH), dtype=bool)
+    return frame_signature(img, top)
+
+
+def _ocr_snapshot(task: Tuple[Path, float, Optional[Path]]) -> str:
+    png, top, mono_path = task
+    img = cv2.imread(str(png))
+    if img is None:
+        return ""
+    binary = binarize(crop_subtitle(img, top))
+    if mono_path is not None:
+        cv2.imwrite(str(mono_path), binary)
+    return ocr_image(binary)
+
+
+def _ocr_array(binary: np.ndarray) -> str:
+    return ocr_image(binary)
+
+
+# --------------------
+# 動画から直接抽出
+# ffmpeg で 1 回だけデコードし、字幕領域を fps 枚/秒のグレースケール生データとして
+# pipe で受け取る。PNG を書き出さずにそのまま変化検出・OCR に渡す。
+# --------------------
+def probe_size(video_path: str) -> Tuple[int, int]:
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height",
+        "-of", "csv=p=0:s=x", video_path,
+    ]
+    out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+    w, h = out.strip().splitlines()[0].split("x")[:2]
+    return int(w), int(h)
+
+
+def iter_video_frames(video_path: str, fps: float = SNAPSHOT_FPS, top: float = 0.7) -> Iterator[np.ndarray]:
+    """動画の字幕領域（高さ比 top より下）を fps 枚/秒で NumPy 配列として返す。"""
+    w, h = probe_size(video_path)
+    crop_y = int(h * top) & ~1
+    crop_h = h - crop_y
+    cmd = [
+        "ffmpeg", "-v", "error", "-i", video_path,
+        "-an", "-sn",
+        "-vf", f"crop={w}:{crop_h}:0:{crop_y},fps={fps}",
+        "-pix_fmt", "gray", "-f", "rawvideo", "-",
+    ]
+    frame_size = w * crop_h
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=frame_size * 4)
+    try:
+        while True:
+            buf = proc.stdout.read(frame_size)
+            if len(buf) < frame_size:
+                break
+            yield np.frombuffer(buf, dtype=np.uint8).reshape(crop_h, w)
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
+
+
+def extract_from_video(video_path: str, output: Path, workers: int, fps: float, top: float, threshold: float) -> List[Tuple[float, float, str]]:
+    """
+    動画から字幕区間を検出して OCR し、SRT を出力する。
+    区間が確定するたびに OCR をプールへ投入するので、デコードと OCR が並行して進む。
+    """
+    tracker = SegmentTracker(threshold)
+    segments = []
+    futures = []
+    # 現在の区間から等間隔に間引いたフレーム [(フレーム番号, フレーム)]。
+    # 上限を超えたら 1 つおきに捨てて間隔を倍にするので、長い区間でも SEGMENT_SAMPLES 枚までしか持たない。
+    samples = []
+    stride = 1
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        def submit(seg):
+            start, end = seg
+            center = (start + end - 1) // 2
+            _, mid = min(samples, key=lambda s: abs(s[0] - center))
+            segments.append(seg)
+            futures.append(pool.submit(_ocr_array, binarize(mid)))
+
+        for frame in iter_video_frames(video_path, fps, top):
+            i = tracker.count
+            seg = tracker.feed(frame_signature(frame))
+            if seg is not None:
+                submit(seg)
+            if tracker.start is None:
+                continue
+            if tracker.start == i:
+                samples, stride = [], 1
+            if (i - tracker.start) % stride == 0:
+                samples.append((i, frame))
+                if len(samples) > SEGMENT_SAMPLES:
+                    samples, stride = samples[::2], stride * 2
+        seg = tracker.close()
+        if seg is not None:
+            submit(seg)
+        texts = [f.result() for f in futures]
+
+    cues = merge_cues(segments, texts, fps)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    write_srt(cues, output)
+    print(f"フレーム {tracker.count} 枚 → 字幕区間 {len(segments)} 件 → SRT {len(cues)} 件 ({output})")
+    return cues
+
+
+def lookup_video(file_id: str) -> str:
+    """videos.db の file_id から動画ファイルのパスを返す。"""
+    from config.settings import VIDEO_DB_PATH
+    from lib.db import videosDBWriter
+
+    db = videosDBWriter(VIDEO_DB_PATH)
+    row = db.select_video_path(file_id)
+    db.close()
+    if row is None:
+        raise SystemExit(f"file_id が見つかりません。({file_id})")
+    return os.path.join(row[0], row[1])
+
+
+def store_subtitles(file_id: str, cues: List[Tuple[float, float, str]]) -> None:
+    """抽出した字幕を videos.db の Subtitle テーブル（全文検索用）に登録する。"""
+    from config.settings import VIDEO_DB_PATH
+    from lib.db import videosDBWriter
+
+    db = videosDBWriter(VIDEO_DB_PATH)
+    db.ensure_subtitles()
+    video_id = db.select_video_id(file_id)
+    db.replace_subtitles(video_id, [(int(start * 1000), int(end * 1000), text) for start, end, text in cues])
+    db.close()
+
+
+def is_up_to_date(srcs: List[Path], dst: Path) -> bool:
+    try:
+        newest = max(p.stat().st_mtime for p in srcs)
+        return dst.stat().st_mtime >= newest
+    except (FileNotFoundError, ValueError):
+        return False
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="snapshot/*.png の字幕を OCR して SRT を作成する")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="OCR の並列プロセス数（既定: CPU コア数）")
+    parser.add_argument("--fps", type=float, default=SNAPSHOT_FPS, help="スナップショットの取得間隔（枚/秒）")
+    parser.add_argument("--top", type=float, default=None,
+                        help="字幕領域の開始位置（画像の高さに対する比率。既定: snapshot は 0、動画は 0.7）")
+    parser.add_argument("--threshold", type=float, default=CHANGE_THRESHOLD, help="字幕が変わったとみなす画素の不一致率")
+    parser.add_argument("--output", type=Path, default=TEXT_DIR / "snapshot.srt", help="出力する SRT ファイル")
+    parser.add_argument("--write-mono", action="store_true", help="区間ごとの 2 値化画像を monoqlo/ に保存する")
+    parser.add_argument("--force", action="store_true", help="SRT が新しくても OCR をやり直す")
+    parser.add_argument("--video", help="snapshot/ を使わず、動画ファイルから直接抽出する")
+    parser.add_argument("--file-id", help="videos.db の file_id の動画から直接抽出する")
+    args = parser.parse_args(argv)
+
+    if args.video or args.file_id:
+        video_path = args.video or lookup_video(args.file_id)
+        output = args.output
+        if args.file_id and output == parser.get_default("output"):
+            output = TEXT_DIR / f"{args.file_id}.srt"
+        top = args.top if args.top is not None else 0.7   # moji_snap.bat と同じく下 30% を字幕領域とする
+        cues = extract_from_video(video_path, output, args.workers, args.fps, top, args.threshold)
+        if args.file_id:
+            store_subtitles(args.file_id, cues)
+        return
+
+    top = args.top if args.top is not None else 0.0   # snapshot/ は moji_snap.bat で切り出し済み
+    pngs = sorted(SNAPSHOT_DIR.glob("*.png"))
+    if not pngs:
+        print(f"スナップショットがありません。({SNAPSHOT_DIR})")
+        return
+    if not args.force and is_up_to_date(pngs, args.output):
+        print(f"{args.output} は最新です。")
+        return
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    if args.write_mono:
+        MONO_DIR.mkdir(exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        # 1. 変化検出（縮小画像の比較のみなので軽い）
+        signatures = pool.map(_snapshot_signature, [(p, top) for p in pngs], chunksize=64)
+        segments = group_segments(signatures, args.threshold)
+        print(f"スナップショット {len(pngs)} 枚 → 字幕区間 {len(segments)} 件")
 
-        # 1. モノクロ化
-        to_monochrome(png, mono_path)
+        # 2. 区間の中央のフレームだけ OCR
+        tasks = []
+        for start, end in segments:
+            png = pngs[(start + end - 1) // 2]
+            mono_path = MONO_DIR / png.name if args.write_mono else None
+            tasks.append((png, top, mono_path))
+        texts = list(pool.map(_ocr_snapshot, tasks, chunksize=2))
 
-        # 2. OCR
-        text = ocr_image(mono_path)
+    # 3. SRT 出力
+    cues = merge_cues(segments, texts, args.fps)
+    write_srt(cues, args.output)
+    print(f"SRT を出力しました。({args.output}, {len(cues)} 件)")
 
-        # 3. 保存
-        with open(text_path, "w", encoding="utf-8") as f:
-            f.write(text)
 
 if __name__ == "__main__":
     main()
@@ -1 +1 @@
-ffmpeg -i %%1 -vf "crop=iw:ih*0.3:0:ih*0.7,select=gt(scene\,0.3)" -vsync vfr snapshot\sub_%04d.png
\ No newline at end of file
+ffmpeg -i %%1 -vf "crop=iw:ih*0.3:0:ih*0.7,fps=2" snapshot\sub_%%06d.png
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""movie_mng.py
+
+各スクリプトをまとめて呼び出すコマンド。
+サブコマンドのモジュールは実行するときに初めて import するので、
+cv2 / pytesseract / numpy / Flask などは使うサブコマンドでしか読み込まない。
+
+使い方（例。MOVIE_MNG 直下で）:
+  python Script\\movie_mng.py checkin [--recover [--rollback]]
+  python Script\\movie_mng.py playlist
+  python Script\\movie_mng.py bd-import <ドライブ | マウントポイント | .iso> <CSV> [--human-number N]
+  python Script\\movie_mng.py volume [D: ... | /dev/sr0 ... | --drives | --iso-dir DIR | --manifest CSV]
+  python Script\\movie_mng.py iso-import [BD001.iso ... | --iso-dir DIR] [--dry-run]
+  python Script\\movie_mng.py stats show [--top 20] [--json] | rebuild | refresh | fill [--duration]
+  python Script\\movie_mng.py sync export <フォルダ> [--target server] [--full] | import <フォルダ> | status
+  python Script\\movie_mng.py scan [--fix] [--requeue-orphans]
+  python Script\\movie_mng.py ocr [--file-id ID | --video PATH] ...
+  python Script\\movie_mng.py jobs run [--workers 4] [--once] | status | enqueue verify ...
+  python Script\\movie_mng.py serve [--asgi] [--host 127.0.0.1] [--port 5000]
+
+サブコマンド以降の引数は、そのまま各スクリプトに渡す。
+"""
+import os
+import sys
+
+
+# --------------------
+# サブコマンド
+# 各関数の中で import する（モジュールの先頭では import しない）
+# --------------------
+def cmd_checkin(argv):
+    # cron / フォルダ監視から頻繁に呼ばれるので、Checkin にファイルが 1 つも無ければ
+    # checkin_tool（DB・ハッシュ計算など）も設定ファイルも読み込まずに終わる。
+    # 動画かどうかの判定は checkin_tool に任せる
+    if "--recover" not in argv and not any(a in ("-h", "--help") for a in argv):
+        try:
+            with os.scandir("Checkin") as it:
+                if not any(e.is_file() for e in it):
+                    return 0
+        except FileNotFoundError:
+            return 0
+
+    import checkin_tool
+    return checkin_tool.main(argv)
+
+
+def cmd_playlist(argv):
+    import playlist_register
+    return playlist_register.main(argv)
+
+
+def cmd_bd_import(argv):
+    import BD_Volume_and_File_Insert
+    return BD_Volume_and_File_Insert.main(argv)
+
+
+def cmd_volume(argv):
+    import volume_register
+    return volume_register.main(argv)
+
+
+def cmd_iso_import(argv):
+    import iso_import
+    return iso_import.main(argv)
+
+
+def cmd_sync(argv):
+    import catalog_sync
+    return catalog_sync.main(argv)
+
+
+def cmd_stats(argv):
+    import library_stats
+    return library_stats.main(argv)
+
+
+def cmd_scan(argv):
+    import media_scan
+    return media_scan.main(argv)
+
+
+def cmd_ocr(argv):
+    import moji_okoshi
+    return moji_okoshi.main(argv)
+
+
+def cmd_jobs(argv):
+    import job_runner
+    return job_runner.main(argv)
+
+
+def cmd_serve(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog="movie_mng serve", description="動画一覧の Web サーバを起動する")
+    parser.add_argument("--asgi", action="store_true", help="ASGI 版（starlette + uvicorn）で起動する")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "video_app"))
+    if args.asgi:
+        import uvicorn
+        import asgi_server
+        uvicorn.run(asgi_server.app, host=args.host, port=args.port or 8000)
+    else:
+        import server
+        server.app.run(host=args.host, port=args.port or 5000)
+    return 0
+
+
+COMMANDS = {
+    "checkin": (cmd_checkin, "Checkin フォルダの動画を登録する（checkin_tool.py）"),
+    "playlist": (cmd_playlist, "プレイリスト・サムネイル・プレビューを更新する（playlist_register.py）"),
+    "bd-import": (cmd_bd_import, "BD の CSV を media.db に登録する（BD_Volume_and_File_Insert.py）"),
+    "volume": (cmd_volume, "ボリューム（BD / .iso）を media.db にまとめて登録する（volume_register.py）"),
+    "iso-import": (cmd_iso_import, "ディスクイメージをマウントせずに media.db に登録する（iso_import.py）"),
+    "sync": (cmd_sync, "カタログを別の PC へ書き出し・取り込みする（catalog_sync.py）"),
+    "stats": (cmd_stats, "作者・月・BD ごとの統計を表示する・集計表を作り直す（library_stats.py）"),
+    "scan": (cmd_scan, "media フォルダと DB の整合性を確認する（media_scan.py）"),
+    "ocr": (cmd_ocr, "字幕を OCR して SRT / DB に登録する（moji_okoshi.py）"),
+    "jobs": (cmd_jobs, "バックグラウンド作業のジョブキューを操作・実行する（job_runner.py）"),
+    "serve": (cmd_serve, "動画一覧の Web サーバを起動する（video_app）"),
+}
+
+
+def usage():
+    lines = ["usage: movie_mng <command> [args...]", "", "commands:"]
+    lines += [f"  {name:<10} {help_text}" for name, (_, help_text) in COMMANDS.items()]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command = COMMANDS.get(argv[0])
+    if command is None:
+        print(f"不明なコマンドです: {argv[0]}\n\n{usage()}", file=sys.stderr)
+        return 2
+    ret = command[0](argv[1:])
+    return ret if isinstance(ret, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""near_dup_scan.py
+
+再エンコード・解像度違いなど、SHA-256 では検出できない近似重複の動画を探す。
+
+各動画から PHASH_FRAMES 枚のフレームを取り出して 64bit pHash を計算し、
+VideoPHash テーブルに保存する（playlist_register でも登録時に計算される）。
+レポート時はマルチインデックス・ハッシュで距離 PHASH_THRESHOLD 以内の
+フレームを引き、一定数以上のフレームが一致する動画をクラスタとして出力する。
+
+使い方（例）:
+  python Script\\near_dup_scan.py            # 未計算の動画をハッシュ化してレポート
+  python Script\\near_dup_scan.py --no-build # 保存済みのハッシュだけでレポート
+"""
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+# ファイル名のみ（例: my_script.py）
+script_name = os.path.basename(__file__)
+
+#------------------------------
+# 初期変数の読み込み
+#------------------------------
+from config.settings import VIDEO_DB_PATH, PHASH_FRAMES, PHASH_THRESHOLD
+
+#------------------------------
+# ログ出力
+#------------------------------
+import lib.log as log
+
+# --------------------
+# DB Writer (SQLite)
+# --------------------
+from lib.db import videosDBWriter
+
+import lib.phash as phash
+
+
+def register_phash(db: videosDBWriter, video_id: int, folder_path: str, file_name: str, frames: int = PHASH_FRAMES) -> None:
+    video_path = os.path.join(folder_path, file_name)
+    hashes = phash.phash_frames(phash.sample_frames(video_path, frames))
+    if len(hashes) == 0:
+        log.logprint(script_name, f"フレームを取得できませんでした。({video_path})", level="Error")
+        return
+    db.save_phash(video_id, len(hashes), phash.to_blob(hashes))
+    log.logprint(script_name, f"pHash を登録しました。(video_id={video_id}, frames={len(hashes)})")
+
+
+def build(db: videosDBWriter, frames: int) -> None:
+    rows = db.videos_without_phash()
+    log.logprint(script_name, f"pHash 未計算の動画: {len(rows)} 件")
+    for video_id, folder_path, file_name in rows:
+        register_phash(db, video_id, folder_path, file_name, frames)
+
+
+def report(db: videosDBWriter, threshold: int, min_frames: int) -> List[List[int]]:
+    videos = {video_id: phash.from_blob(blob) for video_id, blob in db.load_phash()}
+    clusters = phash.find_clusters(videos, threshold=threshold, min_frames=min_frames)
+    for no, cluster in enumerate(clusters, start=1):
+        info = db.select_titles(cluster)
+        log.logprint(script_name, f"重複候補 #{no} ({len(cluster)} 件)")
+        for video_id in cluster:
+            file_id, title, author = info.get(video_id, ("?", "?", "?"))
+            log.logprint(script_name, f"  id={video_id} file_id={file_id} {title} / {author}")
+    log.logprint(script_name, f"{len(videos)} 件中、重複候補クラスタ {len(clusters)} 件")
+    return clusters
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="pHash による近似重複動画の検出")
+    parser.add_argument("--no-build", action="store_true", help="未計算の動画のハッシュ化を行わない")
+    parser.add_argument("--frames", type=int, default=PHASH_FRAMES, help="1 動画あたりのサンプルフレーム数")
+    parser.add_argument("--threshold", type=int, default=PHASH_THRESHOLD, help="一致とみなすハミング距離")
+    parser.add_argument("--min-frames", type=int, default=3, help="重複とみなす一致フレーム数")
+    args = parser.parse_args(argv)
+
+    log.logprint(script_name, "スクリプトを開始しました")
+    db = videosDBWriter(VIDEO_DB_PATH)
+    db.ensure_phash()
+    if not args.no_build:
+        build(db, args.frames)
+    report(db, args.threshold, args.min_frames)
+    db.close()
+    log.logprint(script_name, "スクリプトを終了しました")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,10 @@
+import argparse
 import sqlite3
 import os
+import socket
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 # check_thumbnail.py を読み込む
 # import check_thumbnail
@@ -9,7 +12,7 @@ from datetime import datetime
 #------------------------------
 # 初期変数の読み込み
 #------------------------------
-from config.settings import VIDEO_DB_PATH, MEDIA_DIR, THUMBNAIL_DIR
+from config.settings import VIDEO_DB_PATH, MEDIA_DIR, THUMBNAIL_DIR, PREVIEW_FRAMES, PREVIEW_WORKERS
 # ファイル名のみ（例: my_script.py）
 script_name = os.path.basename(__file__)
 
@@ -25,15 +28,14 @@ import lib.log as log
 # --------------------
 from lib.db import videosDBWriter
 
+import lib.preview as preview
+
+MAX_ATTEMPTS = 5    # ffmpeg の失敗などで再試行する回数の上限
 
-def get_unregistered_videos(db):
-    rows = db.p_diff_v_table()
-    
-    for row in rows:
-        # print("追加候補:", row)
-        log.logprint(script_name, f"追加候補: {row}")
 
-    return rows
+def worker_name():
+    """キューのリースの持ち主（ホスト名:PID）。"""
+    return f"{socket.gethostname()}:{os.getpid()}"
 
 
 def create_thumbnail(folder_path, created_at, file_name):
@@ -85,17 +87,106 @@ def create_thumbnail(folder_path, created_at, file_name):
     return thumb_path
 
 
-def register_playlist():
+def _make_preview(video_id, thumbnail, folder_path, file_name, frames):
+    """スレッドプール上で実行する。DB には触らず、結果だけを返す。"""
+    video_path = os.path.join(folder_path, file_name)
+    sprite_path, vtt_path = preview.preview_paths(thumbnail)
+
+    # 前回 DB への登録前に止まっていた場合は、作成済みのファイルをそのまま使う
+    if os.path.exists(vtt_path) and os.path.exists(sprite_path) \
+            and os.path.getmtime(sprite_path) >= os.path.getmtime(video_path):
+        with open(vtt_path, encoding="utf-8") as f:
+            made = sum(1 for line in f if "#xywh=" in line)
+    else:
+        made = preview.generate_preview(video_path, sprite_path, vtt_path, f"/preview/{video_id}", frames)
+    return video_id, sprite_path, vtt_path, made
+
+
+def register_previews(db, frames=PREVIEW_FRAMES, workers=PREVIEW_WORKERS):
+    """
+    スプライトとストーリーボードが未作成の動画だけを、スレッドプールで並列に作る。
+    ffmpeg は別プロセスなのでスレッドで十分。DB への書き込みはメインスレッドで行う。
+    """
+    db.ensure_preview()
+    rows = db.videos_without_preview()
+    log.logprint(script_name, f"プレビュー未作成の動画: {len(rows)} 件")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_make_preview, *row, frames) for row in rows if os.path.exists(os.path.join(row[2], row[3]))]
+        for future in as_completed(futures):
+            video_id, sprite_path, vtt_path, made = future.result()
+            if made:
+                db.save_preview(video_id, sprite_path, vtt_path, made)
+                log.logprint(script_name, f"プレビューを登録しました。(video_id={video_id}, {made} コマ)")
+
+
+def process_queue(db, owner, max_attempts=MAX_ATTEMPTS, register_phash=None):
+    """
+    PlaylistQueue から 1 件ずつ取り出してサムネイルを作り、Playlist に登録する。
+    処理件数はキューに積まれた新しい動画の数だけで決まる（ライブラリ全体は走査しない）。
+    戻り値は (登録した件数, 失敗した件数)。
+    """
+    done = failed = 0
+    while True:
+        job = db.claim_playlist_job(owner)
+        if job is None:
+            break
+        id, file_id, title, checkin_time, folder_path, file_name = job
+        log.logprint(script_name, f"追加候補: {job}")
+
+        try:
+            if file_id is None:
+                raise RuntimeError("Videos / HDD にレコードがありません。")
+            thumbnail = create_thumbnail(folder_path, checkin_time, file_name)
+            if not os.path.exists(thumbnail):
+                raise RuntimeError(f"サムネイルを作成できませんでした。({thumbnail})")
+        except Exception as e:
+            db.fail_playlist_job(id, str(e), owner, max_attempts)
+            log.logprint(script_name, f"プレイリスト登録に失敗しました。後で再試行します。(video_id={id}) {e}", level="Error")
+            failed += 1
+            continue
+
+        if not db.complete_playlist_job(id, title, thumbnail, owner):
+            log.logprint(script_name, f"リースが他のワーカーに移ったため登録しませんでした。(video_id={id})", level="Error")
+            continue
+        log.logprint(script_name, f"Playlistテーブルに追加しました。({id})")
+        done += 1
+        if register_phash is not None:
+            register_phash(db, id, folder_path, file_name)
+    return done, failed
+
+
+def register_playlist(max_attempts=MAX_ATTEMPTS, retry_failed=False):
     db = videosDBWriter(VIDEO_DB_PATH)
+    db.ensure_playlist_queue()
+    if retry_failed:
+        log.logprint(script_name, f"失敗した作業を再投入しました。({db.retry_failed_playlist_jobs()} 件)")
+
+    # 近似重複検出用の pHash も登録時に計算しておく（numpy が無い環境では省略）
+    try:
+        from near_dup_scan import register_phash
+        db.ensure_phash()
+    except ImportError as e:
+        log.logprint(script_name, f"pHash の計算を省略します。({e})")
+        register_phash = None
+
+    done, failed = process_queue(db, worker_name(), max_attempts, register_phash)
+    log.logprint(script_name, f"プレイリスト登録: {done} 件, 失敗 {failed} 件, キュー {db.playlist_queue_counts()}")
+
+    # ホバープレビュー・シークバー用のスプライトと WebVTT を作る
+    register_previews(db)
 
-    videos = get_unregistered_videos(db)
+    # サーバが返す動画一覧（gzip 済み JSON ページ）を更新する
+    db.refresh_listing()
 
-    print(f"122行目：videos {videos}")
 
-    for id, file_id, title, checkin_time, folder_path, file_name in videos:
-        thumbnail = create_thumbnail(folder_path, checkin_time, file_name)
-        db.playlist_insert(id, title, thumbnail)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="登録キューの動画のサムネイルを作り、Playlist に追加する")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="この回数失敗したら再試行をやめる")
+    parser.add_argument("--retry-failed", action="store_true", help="再試行をやめた（failed）作業をもう一度キューに戻す")
+    args = parser.parse_args(argv)
+    register_playlist(args.max_attempts, args.retry_failed)
 
 
 if __name__ == '__main__':
-    register_playlist()
+    main()
@@ -0,0 +1,134 @@
+"""subtitle_index.py
+
+moji_okoshi.py で作成した字幕（SRT）を Videos.id に紐づけて Subtitle テーブルに登録し、
+全動画の字幕を横断してフレーズ検索する。
+
+使い方（例）:
+  # srt-text\\<file_id>.srt をまとめて登録
+  python Script\\subtitle_index.py import srt-text
+  # 1 ファイルだけ file_id を指定して登録
+  python Script\\subtitle_index.py import srt-text\\snapshot.srt --file-id 5jhlw7h5ym4
+  # 検索
+  python Script\\subtitle_index.py search "ゆっくりしていってね"
+"""
+import argparse
+import os
+import re
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# ファイル名のみ（例: my_script.py）
+script_name = os.path.basename(__file__)
+
+#------------------------------
+# 初期変数の読み込み
+#------------------------------
+from config.settings import VIDEO_DB_PATH
+
+#------------------------------
+# ログ出力
+#------------------------------
+import lib.log as log
+
+# --------------------
+# DB Writer (SQLite)
+# --------------------
+from lib.db import videosDBWriter
+
+
+_TIME_RE = re.compile(r"(\d+):(\d\d):(\d\d)[,.](\d{3})\s*-->\s*(\d+):(\d\d):(\d\d)[,.](\d{3})")
+
+
+def _ms(h, m, s, ms) -> int:
+    return ((int(h) * 60 + int(m)) * 60 + int(s)) * 1000 + int(ms)
+
+
+def parse_srt(path: Path) -> List[Tuple[int, int, str]]:
+    """SRT を [(開始ms, 終了ms, テキスト)] に変換する。"""
+    cues = []
+    with open(path, encoding="utf-8-sig") as f:
+        blocks = f.read().replace("\r\n", "\n").split("\n\n")
+    for block in blocks:
+        lines = block.strip().split("\n")
+        for i, line in enumerate(lines):
+            m = _TIME_RE.match(line)
+            if m:
+                text = "\n".join(lines[i + 1:]).strip()
+                if text:
+                    cues.append((_ms(*m.groups()[:4]), _ms(*m.groups()[4:]), text))
+                break
+    return cues
+
+
+def format_time(ms: int) -> str:
+    s, ms = divmod(ms, 1000)
+    h, s = divmod(s, 3600)
+    m, s = divmod(s, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+def import_srt(db: videosDBWriter, paths: List[Path], file_id: Optional[str] = None) -> int:
+    """
+    SRT を登録する。file_id を省略した場合はファイル名（<file_id>.srt）から決める。
+    全ファイルを 1 トランザクションで executemany するので、数千本でもすぐ終わる。
+    """
+    count = 0
+    for path in paths:
+        fid = file_id or path.stem
+        video_id = db.select_video_id(fid)
+        if video_id is None:
+            log.logprint(script_name, f"Videos に file_id={fid} がありません。({path})", level="Error")
+            continue
+        cues = parse_srt(path)
+        db.replace_subtitles(video_id, cues, commit=False)
+        count += 1
+    db.conn.commit()
+    log.logprint(script_name, f"字幕を登録しました。({count} 本)")
+    return count
+
+
+def cmd_import(db: videosDBWriter, args) -> int:
+    target = Path(args.path)
+    paths = sorted(target.glob("*.srt")) if target.is_dir() else [target]
+    if args.file_id and len(paths) != 1:
+        log.logprint(script_name, "--file-id はファイルを 1 つだけ指定したときに使えます。", level="Error")
+        return 1
+    import_srt(db, paths, args.file_id)
+    return 0
+
+
+def cmd_search(db: videosDBWriter, args) -> int:
+    rows = db.search_subtitles(args.query, args.limit)
+    for video_id, file_id, title, start_ms, end_ms, text in rows:
+        print(f"[{file_id}] {format_time(start_ms)} {title or ''}")
+        print(f"    {text.replace(chr(10), ' / ')}")
+    print(f"{len(rows)} 件")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="字幕の登録と全文検索")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import", help="SRT ファイル（またはフォルダ内の *.srt）を登録する")
+    p.add_argument("path")
+    p.add_argument("--file-id", help="登録先の file_id（省略時はファイル名）")
+
+    p = sub.add_parser("search", help="字幕をフレーズ検索する")
+    p.add_argument("query")
+    p.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    db = videosDBWriter(VIDEO_DB_PATH)
+    db.ensure_subtitles()
+    try:
+        if args.command == "import":
+            return cmd_import(db, args)
+        return cmd_search(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""volume_register.py
+
+BD / DVD・マウント済みのディスク・ディスクイメージ（.iso）のボリュームラベルと UUID を読み取り、
+media.db の Volume テーブルにまとめて登録する（入力を求めない）。
+Windows ではドライブレター、Linux ではマウントポイント・デバイス（/dev/sr0）・.iso を指定する。
+同じ UUID・ラベルのボリュームが登録済みなら、新しく登録せずにその volume_id を表示する。
+
+使い方（例）:
+  python Script\\volume_register.py D: E:
+  python Script/volume_register.py /dev/sr0 /mnt/bd01 backup/BD001.iso
+  python Script/volume_register.py --drives                      # 光学ドライブをすべて
+  python Script/volume_register.py --iso-dir /archive/iso         # フォルダ内の .iso をすべて
+  python Script/volume_register.py --manifest volumes.csv         # 列: target, human_number, notes
+  python Script/volume_register.py --iso-dir /archive/iso --human-number "{name}" --dry-run
+
+human_number の既定値は "{name}"（.iso はファイル名、ドライブはラベル）。
+{label} {uuid} {name} を組み合わせて指定できる。
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from typing import List, Optional, Tuple
+
+from config.settings import MEDIA_DB_PATH
+import lib.csv_ingest as csv_ingest
+import lib.volume as volume
+
+WRITE_COUNT = 1
+
+
+def collect_targets(args) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """(対象, human_number, notes) の一覧。human_number / notes が None なら引数の既定値を使う。"""
+    targets = [(t, None, None) for t in args.targets]
+    if args.drives:
+        targets += [(d, None, None) for d in volume.list_optical_drives()]
+    for directory in args.iso_dir:
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith(".iso"):
+                targets.append((os.path.join(directory, name), None, None))
+    if args.manifest:
+        rows, reader = csv_ingest.read_rows(args.manifest, required=["target"])
+        for _, row in rows:
+            targets.append((row["target"], row.get("human_number") or None, row.get("notes") or None))
+        for issue in reader.issues:
+            print(f"{'NG' if issue.skipped else '--'}  {args.manifest} {issue.line_no} 行目: {issue.reason}")
+    return targets
+
+
+def human_number_for(template: str, info: volume.VolumeInfo) -> str:
+    if info.image:
+        name = os.path.splitext(os.path.basename(info.image))[0]
+    else:
+        name = info.label or ""
+    return template.format(label=info.label or "", uuid=info.uuid or "", name=name)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="ボリューム（BD / .iso）を media.db の Volume にまとめて登録する")
+    parser.add_argument("targets", nargs="*", help="ドライブレター・マウントポイント・デバイス・.iso")
+    parser.add_argument("--drives", action="store_true", help="光学ドライブをすべて対象にする（空のドライブは飛ばす）")
+    parser.add_argument("--iso-dir", action="append", default=[], help="このフォルダの .iso をすべて対象にする")
+    parser.add_argument("--manifest", help="対象・human_number・notes を並べた CSV（列: target, human_number, notes）")
+    parser.add_argument("--human-number", default="{name}", help="human_number の書式（{label} {uuid} {name}）")
+    parser.add_argument("--notes", default="", help="notes に書く文字列")
+    parser.add_argument("--db", default=str(MEDIA_DB_PATH), help="media.db のパス")
+    parser.add_argument("--dry-run", action="store_true", help="読み取り結果を表示するだけで登録しない")
+    args = parser.parse_args(argv)
+
+    targets = collect_targets(args)
+    if not targets:
+        parser.error("対象がありません。ドライブ・.iso を指定するか、--drives / --iso-dir / --manifest を使ってください。")
+
+    conn = None if args.dry_run else sqlite3.connect(args.db)
+    errors = registered = reused = 0
+    try:
+        for target, human_number, notes in targets:
+            info = volume.identify(target)
+            if info is None or not info.label:
+                print(f"NG  {target}: ボリュームラベルを取得できませんでした（メディアが無い・読めない）")
+                errors += 1
+                continue
+            human_number = human_number or human_number_for(args.human_number, info)
+            summary = f"{target}: label={info.label} uuid={info.uuid} fs={info.fs_type} ({info.source}) human_number={human_number}"
+            if conn is None:
+                print(f"--  {summary}")
+                continue
+            try:
+                volume_id, created = volume.register_volume(conn, info, human_number, notes or args.notes, WRITE_COUNT)
+            except volume.VolumeConflict as e:
+                print(f"NG  {summary}: {e}")
+                errors += 1
+                continue
+            if created:
+                registered += 1
+                print(f"新規 {summary} -> volume_id={volume_id}")
+            else:
+                reused += 1
+                print(f"既存 {summary} -> volume_id={volume_id}")
+    finally:
+        if conn is not None:
+            conn.close()
+
+    print(f"新規登録: {registered}, 登録済み: {reused}, 失敗: {errors}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
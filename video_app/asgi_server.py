@@ -0,0 +1,318 @@
+"""asgi_server.py
+
+server.py（Flask）と同じエンドポイントを ASGI（Starlette）で提供する。
+多数のクライアントが同時に動画を再生しても、待ち時間の間は OS スレッドを占有しない。
+
+  - DB アクセスは AsyncDB（少数の専用スレッド + スレッドごとの接続）に流す
+  - 動画・サムネイルの読み出しは CapacityLimiter で同時数を絞ったスレッドで
+    チャンク単位に行い、送信待ちはイベントループ上で待つ
+
+起動（例。video_app の親ディレクトリで）:
+  pip install starlette uvicorn
+  uvicorn --app-dir video_app asgi_server:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import contextlib
+import gzip
+import mimetypes
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import anyio
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+import hls
+import queries
+
+DB_PATH = "database/Videos.db"
+MEDIA_DB_PATH = "database/media.db"
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+DB_THREADS = 4          # SQLite に問い合わせるスレッド数
+IO_LIMIT = 32           # 同時に read() するスレッド数の上限（ストリーム数の上限ではない）
+CHUNK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+# --------------------
+# 非同期 DB アクセス
+# sqlite3 はブロッキングなので、専用スレッドで実行して await で結果を待つ。
+# 接続はスレッドごとに 1 本作って使い回す。
+# --------------------
+class AsyncDB:
+    def __init__(self, db_path, threads=DB_THREADS):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="sqlite")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = queries.connect(self.db_path)
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+        return conn
+
+    async def run(self, func, *args):
+        """func(conn, *args) を DB スレッドで実行する。"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, lambda: func(self._conn(), *args))
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+db = None
+media_db = None
+io_limiter = None
+hls_service = None
+
+
+# --------------------
+# Range 対応のファイル送信
+# --------------------
+def parse_range(header, size):
+    """
+    Range ヘッダから (start, end) を返す（end を含む）。
+    ヘッダが無ければ None、満たせない範囲なら ValueError。
+    """
+    if not header:
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m or (m.group(1) == "" and m.group(2) == ""):
+        raise ValueError(header)
+    if m.group(1) == "":
+        # bytes=-N : 末尾 N バイト
+        start = max(size - int(m.group(2)), 0)
+        end = size - 1
+    else:
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else size - 1
+        end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+async def iter_file(path, start, end):
+    """start～end（end を含む）を CHUNK_SIZE ずつ読み出す。"""
+    f = await anyio.to_thread.run_sync(open, path, "rb", limiter=io_limiter)
+    try:
+        await anyio.to_thread.run_sync(f.seek, start, limiter=io_limiter)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await anyio.to_thread.run_sync(f.read, min(CHUNK_SIZE, remaining), limiter=io_limiter)
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await anyio.to_thread.run_sync(f.close, limiter=io_limiter)
+
+
+async def send_range(request, path):
+    stat = await anyio.to_thread.run_sync(os.stat, path, limiter=io_limiter)
+    size = stat.st_size
+    etag = f'"{int(stat.st_mtime)}-{size}"'
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    headers = {"Accept-Ranges": "bytes", "ETag": etag}
+
+    # If-Range が一致しないときは全体を返す
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        if size == 0:
+            return Response(b"", media_type=media_type, headers=headers)
+        return StreamingResponse(iter_file(path, 0, size - 1), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(iter_file(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+
+# --------------------
+# エンドポイント
+# --------------------
+def _int_arg(request, name, default):
+    try:
+        return int(request.query_params.get(name, default))
+    except ValueError:
+        return default
+
+
+async def api_videos(request):
+    result = await db.run(
+        queries.list_videos,
+        _int_arg(request, "offset", 0),
+        _int_arg(request, "limit", 60),
+        request.query_params.get("q", "").strip(),
+    )
+    return JSONResponse(result)
+
+
+async def api_listing(request):
+    state = await db.run(queries.listing_state)
+    if state is None:
+        return Response(status_code=404)
+    return JSONResponse(state)
+
+
+async def api_listing_page(request):
+    """gzip 済み JSON をそのまま返す（Python の dict は作らない）。"""
+    page = request.path_params["page"]
+    found = await db.run(queries.listing_page, page)
+    if found is None:
+        return Response(status_code=404)
+
+    etag, body = found
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if f'"{etag}"' in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = gzip.decompress(body)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def thumbnail(request):
+    path = await db.run(queries.thumbnail_path, request.path_params["video_id"])
+    if path is None:
+        return Response(status_code=404)
+    # サムネイルは作り直すまで変わらないので、ブラウザにキャッシュさせる
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=86400"})
+
+
+async def _send_preview(request, kind, media_type):
+    path = await db.run(queries.preview_path, request.path_params["video_id"], kind)
+    if path is None:
+        return Response(status_code=404)
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": "public, max-age=86400"})
+
+
+async def preview_sprite(request):
+    return await _send_preview(request, "sprite", "image/jpeg")
+
+
+async def preview_storyboard(request):
+    return await _send_preview(request, "storyboard", "text/vtt")
+
+
+async def video(request):
+    path = await db.run(queries.video_path, request.path_params["video_id"])
+    if path is None:
+        return Response(status_code=404)
+    return await send_range(request, path)
+
+
+async def _hls_call(request, method, *args):
+    """
+    ffmpeg の完了を待つ呼び出しはスレッドで行う（同時実行数は HLSService 側で制限）。
+    戻り値が None なら 404、Busy なら 503 を返す。
+    """
+    file_id = request.path_params["file_id"]
+    source = await db.run(queries.video_path_by_file_id, file_id)
+    if source is None:
+        return None, Response(status_code=404)
+    try:
+        result = await anyio.to_thread.run_sync(method, file_id, source, *args)
+    except hls.Busy:
+        return None, Response(status_code=503, headers={"Retry-After": "5"})
+    if result is None:
+        return None, Response(status_code=404)
+    return result, None
+
+
+async def hls_playlist(request):
+    body, error = await _hls_call(request, hls_service.playlist)
+    if error:
+        return error
+    return Response(body, media_type="application/vnd.apple.mpegurl")
+
+
+async def hls_segment(request):
+    path, error = await _hls_call(request, hls_service.segment, request.path_params["index"])
+    if error:
+        return error
+    return FileResponse(path, media_type="video/mp2t", headers={"Cache-Control": "public, max-age=3600"})
+
+
+async def api_subtitle_search(request):
+    result = await db.run(
+        queries.search_subtitles,
+        request.query_params.get("q", "").strip(),
+        _int_arg(request, "limit", 50),
+    )
+    return JSONResponse(result)
+
+
+async def api_jobs(request):
+    result = await db.run(queries.job_status, _int_arg(request, "failures", 20))
+    return JSONResponse(result)
+
+
+async def api_stats(request):
+    """集計表（Script/library_stats.py rebuild で作る）を読むだけ。BD の集計は media.db があれば付ける。"""
+    result = await db.run(queries.library_stats, _int_arg(request, "top", 50))
+    if result is None:
+        return Response(status_code=404)
+    result["media"] = await media_db.run(queries.media_stats) if os.path.isfile(MEDIA_DB_PATH) else None
+    return JSONResponse(result)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global db, media_db, io_limiter, hls_service
+    db = AsyncDB(DB_PATH)
+    media_db = AsyncDB(MEDIA_DB_PATH, threads=1)
+    io_limiter = anyio.CapacityLimiter(IO_LIMIT)
+    hls_service = hls.HLSService()
+    try:
+        yield
+    finally:
+        db.close()
+        media_db.close()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/videos", api_videos),
+        Route("/api/listing", api_listing),
+        Route("/api/listing/{page:int}", api_listing_page),
+        Route("/thumbnail/{video_id:int}", thumbnail),
+        Route("/preview/{video_id:int}", preview_sprite),
+        Route("/storyboard/{video_id:int}", preview_storyboard),
+        Route("/video/{video_id:int}", video),
+        Route("/hls/{file_id}/index.m3u8", hls_playlist),
+        Route("/hls/{file_id}/{index:int}.ts", hls_segment),
+        Route("/api/subtitles/search", api_subtitle_search),
+        Route("/api/jobs", api_jobs),
+        Route("/api/stats", api_stats),
+        # index.html が相対パスで読む main.js / style.css もここで返す
+        Mount("/", StaticFiles(directory=STATIC_DIR, html=True), name="static"),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="127.0.0.1", port=8000)
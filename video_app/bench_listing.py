@@ -0,0 +1,102 @@
+"""bench_listing.py
+
+動画一覧 API の負荷テスト。/api/videos（毎回 SQL + jsonify）と
+/api/listing/<page>（作成済みの gzip JSON をそのまま返す）の requests/sec を比べる。
+
+使い方（例）:
+  # 合成データの一時 DB を作り、Flask のテストクライアントで計測
+  python video_app/bench_listing.py --videos 100000 --requests 2000
+  # 起動中のサーバに HTTP で負荷をかける（並列数 16）
+  python video_app/bench_listing.py --url http://127.0.0.1:5000 --requests 2000 --concurrency 16
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "Script"))
+sys.path.insert(0, str(ROOT / "video_app"))
+
+
+def build_db(path: str, count: int) -> None:
+    import lib.listing as listing
+
+    conn = sqlite3.connect(path)
+    conn.executescript((ROOT / "Script" / "Create_Videos.txt").read_text(encoding="utf-8"))
+    conn.executemany(
+        "INSERT INTO Videos(id, file_id, title, author) VALUES (?, ?, ?, ?)",
+        ((i, f"f{i:08d}", f"動画タイトル {i} " + "x" * (i % 40), f"作者{i % 300}@handle{i % 300}") for i in range(1, count + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO Playlist(video_id, title, thumbnail) VALUES (?, ?, ?)",
+        ((i, f"動画タイトル {i} " + "x" * (i % 40), f"thumbnail/{i}.png") for i in range(1, count + 1)),
+    )
+    conn.commit()
+    listing.ensure_listing(conn)
+    t = time.perf_counter()
+    listing.rebuild_listing(conn)
+    print(f"listing rebuild: {time.perf_counter() - t:.2f}s ({count} videos)")
+    conn.close()
+
+
+def run(name, fetch, paths, concurrency):
+    t = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            sizes = list(pool.map(fetch, paths))
+    else:
+        sizes = [fetch(p) for p in paths]
+    elapsed = time.perf_counter() - t
+    print(f"{name:<16} {len(paths) / elapsed:8.0f} req/s  avg {sum(sizes) / len(sizes) / 1024:6.1f} KiB/response")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="video list API load test")
+    parser.add_argument("--videos", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--page-size", type=int, default=60)
+    parser.add_argument("--url", help="起動中のサーバの URL（省略時は一時 DB とテストクライアント）")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+
+    if args.url:
+        state = urllib.request.urlopen(args.url + "/api/listing").read()
+        import json
+        total = json.loads(state)["total"]
+        pages = max(1, (total + args.page_size - 1) // args.page_size)
+
+        def fetch(path):
+            req = urllib.request.Request(args.url + path, headers={"Accept-Encoding": "gzip"})
+            with urllib.request.urlopen(req) as res:
+                return len(res.read())
+    else:
+        tmp = tempfile.mkdtemp()
+        db_path = os.path.join(tmp, "videos.db")
+        build_db(db_path, args.videos)
+        total = args.videos
+        pages = (total + args.page_size - 1) // args.page_size
+
+        import server
+        server.DB_PATH = db_path
+        client = server.app.test_client()
+
+        def fetch(path):
+            res = client.get(path, headers={"Accept-Encoding": "gzip"})
+            return len(res.get_data())
+
+    offsets = [rnd.randrange(pages) for _ in range(args.requests)]
+    run("/api/videos", fetch, [f"/api/videos?offset={p * args.page_size}&limit={args.page_size}" for p in offsets], args.concurrency)
+    run("/api/listing/N", fetch, [f"/api/listing/{p}" for p in offsets], args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
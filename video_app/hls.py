@@ -0,0 +1,304 @@
+"""hls.py
+
+ブラウザで直接再生できない動画（mkv / flv / avi など）を、要求された時点で
+HLS（m3u8 + MPEG-TS セグメント）にして返す。
+
+  - コーデックが H.264 + AAC/MP3 なら再エンコードせずに remux する（-c copy）。
+    このときセグメントの境界はキーフレームに合わせる
+  - それ以外は libx264 / aac で再エンコードする（境界は SEGMENT_SECONDS ごと）
+  - セグメントは 1 つずつ要求されたときに作り、CACHE_DIR に保存する。
+    キャッシュは合計サイズの上限を超えると最後に使われたのが古い順に消す（LRU）
+  - ffmpeg / ffprobe の同時実行数は MAX_JOBS に制限し、空かなければ Busy を投げる
+"""
+import json
+import math
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.path.join("temp", "hls")
+CACHE_MAX_BYTES = 20 * 1024 ** 3
+SEGMENT_SECONDS = 6.0
+MAX_JOBS = 2                # 同時に動かす ffmpeg / ffprobe の数
+QUEUE_TIMEOUT = 30.0        # 空きを待つ最大秒数
+
+COPY_VIDEO_CODECS = {"h264"}
+COPY_AUDIO_CODECS = {"aac", "mp3"}
+
+
+class Busy(Exception):
+    """ffmpeg の同時実行数が上限に達していて、待っても空かなかった。"""
+
+
+# --------------------
+# セグメントキャッシュ（LRU）
+# 最後に使った時刻はファイルの mtime に持たせ、再起動後も順序を引き継ぐ。
+# --------------------
+class SegmentCache:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # path -> size（古い順）
+        self._total = 0
+        self._load()
+
+    def _load(self):
+        found = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(".ts"):
+                    continue
+                path = os.path.join(dirpath, name)
+                st = os.stat(path)
+                found.append((st.st_mtime, path, st.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._total += size
+
+    def touch(self, path):
+        """キャッシュにあれば最新として扱い True を返す。"""
+        with self._lock:
+            if path not in self._entries:
+                return False
+            self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def add(self, path):
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old, old_size = self._entries.popitem(last=False)
+                self._total -= old_size
+                try:
+                    os.remove(old)
+                except OSError:
+                    # 送信中（Windows）や既に消えている場合
+                    pass
+
+    def discard_dir(self, directory):
+        """directory 以下のファイルを削除し、キャッシュの管理からも外す。"""
+        prefix = os.path.join(directory, "")
+        with self._lock:
+            for path in [p for p in self._entries if p.startswith(prefix)]:
+                self._total -= self._entries.pop(path)
+            for name in os.listdir(directory):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    # 送信中（Windows）や既に消えている場合
+                    pass
+
+    @property
+    def total_bytes(self):
+        return self._total
+
+
+# --------------------
+# ffprobe
+# --------------------
+def probe(path):
+    """
+    {"duration": 秒, "video": コーデック名, "audio": コーデック名 or None, "pix_fmt": ...}
+    を返す。動画ストリームが無ければ None。
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration:stream=codec_type,codec_name,pix_fmt",
+        "-of", "json", path,
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        data = json.loads(proc.stdout)
+        duration = float(data["format"]["duration"])
+    except (ValueError, KeyError):
+        return None
+
+    video = next((s for s in data.get("streams", []) if s.get("codec_type") == "video"), None)
+    audio = next((s for s in data.get("streams", []) if s.get("codec_type") == "audio"), None)
+    if video is None:
+        return None
+    return {
+        "duration": duration,
+        "video": video.get("codec_name"),
+        "pix_fmt": video.get("pix_fmt"),
+        "audio": audio.get("codec_name") if audio else None,
+    }
+
+
+def keyframe_times(path):
+    """動画のキーフレームの時刻（秒）。パケットを読むだけでデコードはしない。"""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=print_section=0", path,
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    times = []
+    for line in proc.stdout.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            times.append(float(pts))
+    return sorted(times)
+
+
+def plan_segments(duration, keyframes, target=SEGMENT_SECONDS):
+    """
+    セグメントの開始時刻のリストを返す。
+    keyframes があればキーフレームのうち前の境界から target 秒以上離れたものを境界にし、
+    無ければ target 秒ごとに区切る。
+    """
+    if not keyframes:
+        return [i * target for i in range(max(1, math.ceil(duration / target)))]
+    starts = [0.0]
+    for t in keyframes:
+        if t - starts[-1] >= target and t < duration:
+            starts.append(t)
+    return starts
+
+
+# --------------------
+# HLS サービス
+# --------------------
+class HLSService:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_jobs=MAX_JOBS):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.cache = SegmentCache(cache_dir, max_bytes)
+        self._jobs = threading.BoundedSemaphore(max_jobs)
+        self._lock = threading.Lock()
+        self._inflight = {}     # 作成中のパス -> threading.Event
+
+    def _dir(self, file_id):
+        return os.path.join(self.cache_dir, file_id)
+
+    def _run_once(self, out_path, build):
+        """
+        out_path が無ければ build(tmp_path) で作る。同じファイルを同時に要求されたときは
+        先に来た 1 件だけが作り、残りはそれを待つ。
+        """
+        while True:
+            if os.path.exists(out_path):
+                return out_path
+            with self._lock:
+                event = self._inflight.get(out_path)
+                if event is None:
+                    event = self._inflight[out_path] = threading.Event()
+                    break
+            event.wait()
+
+        try:
+            if not self._jobs.acquire(timeout=QUEUE_TIMEOUT):
+                raise Busy(out_path)
+            try:
+                tmp = out_path + ".tmp"
+                build(tmp)
+                os.replace(tmp, out_path)
+            finally:
+                self._jobs.release()
+        finally:
+            with self._lock:
+                del self._inflight[out_path]
+            event.set()
+        return out_path
+
+    def meta(self, file_id, video_path):
+        """コーデックとセグメント境界を調べ、file_id ごとに meta.json に保存する。"""
+        os.makedirs(self._dir(file_id), exist_ok=True)
+        path = os.path.join(self._dir(file_id), "meta.json")
+
+        def build(tmp):
+            info = probe(video_path)
+            if info is None:
+                raise ValueError(f"動画ストリームがありません。({video_path})")
+            copy_video = info["video"] in COPY_VIDEO_CODECS and info["pix_fmt"] in ("yuv420p", "yuvj420p")
+            starts = plan_segments(info["duration"], keyframe_times(video_path) if copy_video else [])
+            info.update(
+                copy_video=copy_video,
+                copy_audio=info["audio"] in COPY_AUDIO_CODECS,
+                starts=starts,
+                mtime=os.path.getmtime(video_path),
+            )
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(info, f)
+
+        self._run_once(path, build)
+        with open(path, encoding="utf-8") as f:
+            info = json.load(f)
+        if info["mtime"] != os.path.getmtime(video_path):
+            # 元の動画が差し替えられたので作り直す
+            self.cache.discard_dir(self._dir(file_id))
+            return self.meta(file_id, video_path)
+        return info
+
+    def playlist(self, file_id, video_path):
+        info = self.meta(file_id, video_path)
+        starts = info["starts"]
+        ends = starts[1:] + [info["duration"]]
+        lengths = [e - s for s, e in zip(starts, ends)]
+
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{math.ceil(max(lengths))}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:VOD",
+        ]
+        for i, length in enumerate(lengths):
+            lines += [f"#EXTINF:{length:.3f},", f"{i}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    def segment(self, file_id, video_path, index):
+        """セグメント index の .ts のパスを返す。範囲外なら None。"""
+        info = self.meta(file_id, video_path)
+        starts = info["starts"]
+        if not 0 <= index < len(starts):
+            return None
+        start = starts[index]
+        length = (starts[index + 1] if index + 1 < len(starts) else info["duration"]) - start
+
+        out_path = os.path.join(self._dir(file_id), f"{index}.ts")
+        if self.cache.touch(out_path):
+            return out_path
+
+        def build(tmp):
+            cmd = [
+                "ffmpeg", "-v", "error", "-y",
+                "-ss", f"{start:.3f}", "-i", video_path, "-t", f"{length:.3f}",
+                "-map", "0:v:0", "-map", "0:a:0?", "-sn", "-dn",
+            ]
+            if info["copy_video"]:
+                cmd += ["-c:v", "copy"]
+            else:
+                cmd += [
+                    "-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p",
+                    # セグメントの先頭を必ずキーフレームにする
+                    "-force_key_frames", "expr:eq(n,0)",
+                ]
+            cmd += ["-c:a", "copy"] if info["copy_audio"] else ["-c:a", "aac", "-b:a", "128k", "-ac", "2"]
+            # 各セグメントのタイムスタンプを動画全体の時刻に合わせる
+            cmd += ["-output_ts_offset", f"{start:.3f}", "-muxdelay", "0", "-f", "mpegts", tmp]
+
+            t = time.perf_counter()
+            proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            if proc.returncode != 0 or not os.path.exists(tmp):
+                raise RuntimeError(f"ffmpeg に失敗しました。({video_path} #{index}) {proc.stderr.strip()}")
+            _log(f"{file_id} #{index} {'remux' if info['copy_video'] else 'transcode'} {time.perf_counter() - t:.1f}s")
+
+        self._run_once(out_path, build)
+        self.cache.add(out_path)
+        return out_path
+
+
+def _log(message):
+    print(f"[hls.py] {message}")
@@ -0,0 +1,163 @@
+"""load_test.py
+
+起動中の動画サーバ（server.py / asgi_server.py）に、動画の Range 再生と
+サムネイル取得を多数同時に行わせ、スループットと応答時間を測る。
+クライアント側は asyncio のソケットで HTTP/1.1 を直接話すので、
+数百接続でもスレッドを使わない。
+
+使い方（例）:
+  python video_app/load_test.py --url http://127.0.0.1:8000 --video-ids 1-50 --streams 200 --thumbs 200 --duration 30
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from urllib.parse import urlsplit
+
+CHUNK = 1024 * 1024     # 1 リクエストで取得する Range の大きさ（シーク再生を想定）
+
+
+class Stats:
+    def __init__(self):
+        self.latency = []   # 最初のバイトまでの時間
+        self.bytes = 0
+        self.errors = 0
+
+    def summary(self, name, elapsed):
+        if not self.latency:
+            return f"{name:<10} 応答なし（エラー {self.errors}）"
+        lat = sorted(self.latency)
+        p95 = lat[int(len(lat) * 0.95) - 1] if len(lat) >= 20 else lat[-1]
+        return (
+            f"{name:<10} {len(lat) / elapsed:8.1f} req/s  {self.bytes / elapsed / 1024 / 1024:8.1f} MiB/s  "
+            f"TTFB 中央値 {statistics.median(lat) * 1000:7.1f}ms  p95 {p95 * 1000:7.1f}ms  エラー {self.errors}"
+        )
+
+
+async def request(host, port, path, headers=None):
+    """
+    HTTP/1.1 の GET を 1 回行い (status, ヘッダ, 本文の長さ, TTFB) を返す。
+    本文は読み捨てる。
+    """
+    t = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        lines = [f"GET {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close"]
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        ttfb = time.perf_counter() - t
+        status = int(status_line.split()[1])
+        resp_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            resp_headers[k.strip().lower()] = v.strip()
+
+        size = 0
+        if resp_headers.get("transfer-encoding") == "chunked":
+            while True:
+                n = int((await reader.readline()).split(b";")[0], 16)
+                if n == 0:
+                    break
+                size += len(await reader.readexactly(n))
+                await reader.readline()
+        else:
+            while True:
+                data = await reader.read(256 * 1024)
+                if not data:
+                    break
+                size += len(data)
+        return status, resp_headers, size, ttfb
+    finally:
+        writer.close()
+
+
+async def stream_client(host, port, video_ids, deadline, stats, rnd):
+    """動画を 1 本選び、先頭から Range で順に取得する（途中でシークもする）。"""
+    while time.perf_counter() < deadline:
+        video_id = rnd.choice(video_ids)
+        offset = 0
+        size = None
+        while time.perf_counter() < deadline:
+            try:
+                status, headers, n, ttfb = await request(
+                    host, port, f"/video/{video_id}", {"Range": f"bytes={offset}-{offset + CHUNK - 1}"}
+                )
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                stats.errors += 1
+                break
+            if status != 206:
+                stats.errors += 1
+                break
+            stats.latency.append(ttfb)
+            stats.bytes += n
+            if size is None:
+                size = int(headers["content-range"].rsplit("/", 1)[1])
+            offset += n
+            if rnd.random() < 0.05:
+                offset = rnd.randrange(size)
+            if offset >= size:
+                break
+
+
+async def thumb_client(host, port, video_ids, deadline, stats, rnd):
+    while time.perf_counter() < deadline:
+        try:
+            status, _, n, ttfb = await request(host, port, f"/thumbnail/{rnd.choice(video_ids)}")
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            stats.errors += 1
+            continue
+        if status != 200:
+            stats.errors += 1
+            continue
+        stats.latency.append(ttfb)
+        stats.bytes += n
+
+
+def parse_ids(text):
+    ids = []
+    for part in text.split(","):
+        lo, _, hi = part.partition("-")
+        ids.extend(range(int(lo), int(hi or lo) + 1))
+    return ids
+
+
+async def main_async(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    video_ids = parse_ids(args.video_ids)
+    deadline = time.perf_counter() + args.duration
+    rnd = random.Random(0)
+
+    streams, thumbs = Stats(), Stats()
+    tasks = [stream_client(host, port, video_ids, deadline, streams, random.Random(rnd.random())) for _ in range(args.streams)]
+    tasks += [thumb_client(host, port, video_ids, deadline, thumbs, random.Random(rnd.random())) for _ in range(args.thumbs)]
+
+    t = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t
+
+    print(f"同時ストリーム {args.streams} / 同時サムネイル {args.thumbs} / {elapsed:.1f}s")
+    print(streams.summary("video", elapsed))
+    print(thumbs.summary("thumbnail", elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="video server streaming load test")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--video-ids", default="1-20", help="対象の video_id（例: 1-50,80）")
+    parser.add_argument("--streams", type=int, default=100, help="同時に再生するクライアント数")
+    parser.add_argument("--thumbs", type=int, default=100, help="同時にサムネイルを取得するクライアント数")
+    parser.add_argument("--duration", type=float, default=20.0, help="計測時間（秒）")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""Flask 版（server.py）と ASGI 版（asgi_server.py）で共通の DB 問い合わせ。
+
+どの関数も sqlite3.Connection（row_factory = sqlite3.Row）を受け取り、
+JSON にそのまま渡せる値を返す。
+"""
+import json
+import os
+import sqlite3
+import time
+
+PAGE_SIZE_MAX = 200
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def like_pattern(q):
+    """LIKE ... ESCAPE '\\' 用に % _ \\ をエスケープした部分一致パターン。"""
+    return "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _has_table(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def list_videos(conn, offset, limit, q):
+    """
+    動画一覧をページ単位で返す。
+      offset, limit : 取得範囲（新しい順）
+      q             : タイトル・作者の部分一致
+    total は offset=0 のときだけ数える（スクロール領域の高さ計算用）。
+    """
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), PAGE_SIZE_MAX)
+
+    where = ""
+    params = []
+    if q:
+        pattern = like_pattern(q)
+        where = "WHERE p.title LIKE ? ESCAPE '\\' OR v.author LIKE ? ESCAPE '\\'"
+        params = [pattern, pattern]
+
+    rows = conn.execute(f"""
+        SELECT
+            p.video_id,
+            p.title,
+            v.author
+        FROM Playlist p
+            JOIN Videos v ON v.id = p.video_id
+        {where}
+        ORDER BY p.video_id DESC
+        LIMIT ? OFFSET ?
+    """, params + [limit, offset]).fetchall()
+    total = None
+    if offset == 0:
+        total = conn.execute(f"""
+            SELECT COUNT(*)
+            FROM Playlist p
+                JOIN Videos v ON v.id = p.video_id
+            {where}
+        """, params).fetchone()[0]
+
+    return {
+        "offset": offset,
+        "total": total,
+        "items": [
+            {
+                "video_id": r["video_id"],
+                "title": r["title"],
+                "author": r["author"],
+                "thumbnail": f"/thumbnail/{r['video_id']}",
+            }
+            for r in rows
+        ],
+    }
+
+
+def listing_state(conn):
+    """
+    マテリアライズ済み一覧（Script/lib/listing.py）の状態を返す。
+    ページは video_id の昇順なので、新しい順に表示するときは末尾のページから読む。
+    """
+    if not _has_table(conn, "ListingState"):
+        return None
+    row = conn.execute("SELECT version, total, page_size FROM ListingState WHERE id = 1").fetchone()
+    return dict(row) if row else None
+
+
+def listing_page(conn, page):
+    """(ETag, gzip 済み JSON) を返す。"""
+    if not _has_table(conn, "ListingPage"):
+        return None
+    row = conn.execute("SELECT version, body FROM ListingPage WHERE page = ?", (page,)).fetchone()
+    if row is None:
+        return None
+    return f"{row['version']}-{page}", row["body"]
+
+
+def thumbnail_path(conn, video_id):
+    row = conn.execute(
+        "SELECT thumbnail FROM Playlist WHERE video_id = ?", (video_id,)
+    ).fetchone()
+    if row is None or not os.path.isfile(row["thumbnail"]):
+        return None
+    return row["thumbnail"]
+
+
+def preview_path(conn, video_id, kind):
+    """kind は "sprite"（スプライト画像）か "storyboard"（WebVTT）。"""
+    if kind not in ("sprite", "storyboard"):
+        raise ValueError(kind)
+    row = conn.execute(
+        f"SELECT {kind} FROM Playlist WHERE video_id = ?", (video_id,)
+    ).fetchone()
+    if row is None or row[0] is None or not os.path.isfile(row[0]):
+        return None
+    return row[0]
+
+
+def video_path(conn, video_id, column="id"):
+    row = conn.execute(f"""
+        SELECT h.folder_path, v.file_name
+        FROM Videos v JOIN HDD h ON h.file_id = v.file_id
+        WHERE v.{column} = ?
+    """, (video_id,)).fetchone()
+    if row is None:
+        return None
+    path = os.path.join(row["folder_path"], row["file_name"])
+    return path if os.path.isfile(path) else None
+
+
+def video_path_by_file_id(conn, file_id):
+    return video_path(conn, file_id, column="file_id")
+
+
+def search_subtitles(conn, q, limit):
+    """字幕（Subtitle テーブル）をフレーズ検索し、動画と再生位置（秒）を返す。"""
+    limit = min(limit, 500)
+    if not q:
+        return []
+    # subtitle_index.py を一度も実行していない DB には字幕のテーブルが無い
+    if not _has_table(conn, "Subtitle") or not _has_table(conn, "SubtitleFTS"):
+        return []
+
+    if len(q) >= 3:
+        # trigram トークナイザのフレーズ検索
+        rows = conn.execute("""
+            SELECT s.video_id, v.file_id, v.title, s.start_ms, s.end_ms, s.text
+            FROM SubtitleFTS f
+                JOIN Subtitle s ON s.id = f.rowid
+                JOIN Videos v ON v.id = s.video_id
+            WHERE SubtitleFTS MATCH ?
+            ORDER BY f.rank
+            LIMIT ?
+        """, ('"' + q.replace('"', '""') + '"', limit)).fetchall()
+    else:
+        # trigram は 3 文字未満を検索できないため LIKE で探す
+        rows = conn.execute("""
+            SELECT s.video_id, v.file_id, v.title, s.start_ms, s.end_ms, s.text
+            FROM Subtitle s JOIN Videos v ON v.id = s.video_id
+            WHERE s.text LIKE ? ESCAPE '\\'
+            ORDER BY s.video_id, s.start_ms
+            LIMIT ?
+        """, (like_pattern(q), limit)).fetchall()
+
+    return [
+        {
+            "video_id": r["video_id"],
+            "file_id": r["file_id"],
+            "title": r["title"],
+            "start": r["start_ms"] / 1000,
+            "end": r["end_ms"] / 1000,
+            "text": r["text"],
+        }
+        for r in rows
+    ]
+
+
+def job_status(conn, failures=20):
+    """
+    バックグラウンド作業（Jobs テーブル、Script/job_runner.py）の状態。
+    種類 x 状態ごとの件数、実行中のジョブと資源の使用数、最近の失敗を返す。
+    job_runner.py status も同じ関数を使う（row_factory の無い接続でも動くよう、行はタプルとして読む）。
+    資源の上限（config/settings.py の JOB_LIMITS）はサーバからは見えないので含めず、job_runner.py 側で足す。
+    """
+    if not _has_table(conn, "Jobs"):
+        return {"counts": {}, "running": [], "resources": {}, "failures": []}
+
+    counts = {}
+    for job_type, state, n in conn.execute("SELECT type, state, COUNT(*) FROM Jobs GROUP BY type, state"):
+        counts.setdefault(job_type, {})[state] = n
+
+    now = time.time()
+    running = []
+    resources = {}
+    for job_id, job_type, names, owner, lease_until, started_at, attempts in conn.execute("""
+        SELECT id, type, resources, lease_owner, lease_until, started_at, attempts
+        FROM Jobs WHERE state = 'running' ORDER BY id
+    """):
+        alive = lease_until is not None and lease_until >= now
+        if alive:
+            for name in names.split():
+                resources[name] = resources.get(name, 0) + 1
+        running.append({
+            "id": job_id,
+            "type": job_type,
+            "resources": names.split(),
+            "owner": owner,
+            "started_at": started_at,
+            "attempts": attempts,
+            "lease_expired": not alive,
+        })
+
+    recent = [
+        {
+            "id": job_id,
+            "type": job_type,
+            "state": state,
+            "attempts": attempts,
+            "error": error,
+            "payload": json.loads(payload),
+        }
+        for job_id, job_type, state, attempts, error, payload in conn.execute("""
+            SELECT id, type, state, attempts, last_error, payload FROM Jobs
+            WHERE last_error IS NOT NULL AND state IN ('pending', 'failed')
+            ORDER BY id DESC LIMIT ?
+        """, (min(failures, 500),))
+    ]
+    return {"counts": counts, "running": running, "resources": dict(sorted(resources.items())), "failures": recent}
+
+
+def library_stats(conn, top=50):
+    """
+    ライブラリの集計（Script/lib/stats.py の LibraryStats）。
+    集計表をグループ数だけ読む（Videos は読まない）。まだ集計していなければ None。
+      top : 作者は動画数の多い順にこの件数まで返す（author_count は全体の作者数）
+    """
+    if not _has_table(conn, "StatsState"):
+        return None
+    state = conn.execute("SELECT * FROM StatsState WHERE id = 1").fetchone()
+    if state is None or state["rebuilt_at"] is None:
+        return None
+
+    dims = {}
+    for r in conn.execute("SELECT * FROM LibraryStats"):
+        row = dict(r)
+        dims.setdefault(row.pop("dim"), []).append(row)
+    total = dims["total"][0]
+    del total["key"]
+    authors = sorted(dims.get("author", []), key=lambda r: (-r["videos"], r["key"]))
+    months = sorted(dims.get("month", []), key=lambda r: r["key"], reverse=True)
+
+    backup = None
+    if state["coverage_at"] is not None:
+        backup = {
+            "videos": state["backup_videos"],
+            "bytes": state["backup_bytes"],
+            "ratio": state["backup_videos"] / total["videos"] if total["videos"] else None,
+            "checked_at": state["coverage_at"],
+        }
+    return {
+        "total": total,
+        "author_count": len(authors),
+        "authors": [{"author": r.pop("key"), **r} for r in authors[:min(max(top, 0), PAGE_SIZE_MAX)]],
+        "months": [{"month": r.pop("key"), **r} for r in months],
+        "backup": backup,
+        "rebuilt_at": state["rebuilt_at"],
+    }
+
+
+def media_stats(conn):
+    """BD（media.db の MediaStats）の集計。ボリュームごと・月ごと。まだ集計していなければ None。"""
+    # 集計はトリガを作ったとき（lib/stats.py の ensure_media_stats）に始まる
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'stats_file_ai'").fetchone():
+        return None
+    total = conn.execute(
+        "SELECT files, bytes FROM MediaStats WHERE dim = 'total' AND key = ''"
+    ).fetchone()
+    volumes = conn.execute("""
+        SELECT CAST(s.key AS INTEGER) AS volume_id, v.volume_label, v.human_number, s.files, s.bytes
+        FROM MediaStats s
+            LEFT JOIN Volume v ON v.volume_id = CAST(s.key AS INTEGER)
+        WHERE s.dim = 'volume'
+        ORDER BY volume_id
+    """).fetchall()
+    months = conn.execute(
+        "SELECT key AS month, files, bytes FROM MediaStats WHERE dim = 'month' ORDER BY key DESC"
+    ).fetchall()
+    return {
+        "total": dict(total),
+        "volume_count": conn.execute("SELECT COUNT(*) FROM Volume").fetchone()[0],
+        "volumes": [dict(r) for r in volumes],
+        "months": [dict(r) for r in months],
+    }
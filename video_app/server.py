@@ -1,31 +1,177 @@
-from flask import Flask, jsonify, send_from_directory
-import sqlite3
+from flask import Flask, Response, abort, jsonify, request, send_file, send_from_directory
+import gzip
+import os
+
+import hls
+import queries
 
 app = Flask(__name__, static_folder="static")
 
 DB_PATH = "database/Videos.db"
+MEDIA_DB_PATH = "database/media.db"
+
+hls_service = None
+
+
+def get_hls():
+    global hls_service
+    if hls_service is None:
+        hls_service = hls.HLSService()
+    return hls_service
 
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return queries.connect(DB_PATH)
 
 
 @app.route("/api/videos")
 def api_videos():
     db = get_db()
-    rows = db.execute("""
-        SELECT
-            video_id,
-            title,
-            thumbnail,
-        FROM Playlist
-        ORDER BY id DESC
-    """).fetchall()
+    result = queries.list_videos(
+        db,
+        request.args.get("offset", 0, type=int),
+        request.args.get("limit", 60, type=int),
+        request.args.get("q", "").strip(),
+    )
     db.close()
+    return jsonify(result)
+
+
+@app.route("/api/listing")
+def api_listing():
+    db = get_db()
+    state = queries.listing_state(db)
+    db.close()
+    if state is None:
+        abort(404)
+    return jsonify(state)
+
+
+@app.route("/api/listing/<int:page>")
+def api_listing_page(page):
+    """gzip 済み JSON をそのまま返す（Python の dict は作らない）。"""
+    db = get_db()
+    found = queries.listing_page(db, page)
+    db.close()
+    if found is None:
+        abort(404)
+
+    etag, body = found
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
 
-    return jsonify([dict(r) for r in rows])
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if "gzip" in request.accept_encodings:
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = gzip.decompress(body)
+    return Response(body, mimetype="application/json", headers=headers)
+
+
+@app.route("/thumbnail/<int:video_id>")
+def thumbnail(video_id):
+    db = get_db()
+    path = queries.thumbnail_path(db, video_id)
+    db.close()
+    if path is None:
+        abort(404)
+    # サムネイルは作り直すまで変わらないので、ブラウザにキャッシュさせる
+    return send_file(path, max_age=86400)
+
+
+@app.route("/preview/<int:video_id>")
+def preview_sprite(video_id):
+    return _send_preview(video_id, "sprite", "image/jpeg")
+
+
+@app.route("/storyboard/<int:video_id>")
+def preview_storyboard(video_id):
+    return _send_preview(video_id, "storyboard", "text/vtt")
+
+
+def _send_preview(video_id, kind, mimetype):
+    db = get_db()
+    path = queries.preview_path(db, video_id, kind)
+    db.close()
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype=mimetype, max_age=86400)
+
+
+@app.route("/video/<int:video_id>")
+def video(video_id):
+    db = get_db()
+    path = queries.video_path(db, video_id)
+    db.close()
+    if path is None:
+        abort(404)
+    # conditional=True で Range リクエスト（シーク）に対応する
+    return send_file(path, conditional=True)
+
+
+def _hls_source(file_id):
+    db = get_db()
+    path = queries.video_path_by_file_id(db, file_id)
+    db.close()
+    if path is None:
+        abort(404)
+    return path
+
+
+@app.route("/hls/<file_id>/index.m3u8")
+def hls_playlist(file_id):
+    try:
+        body = get_hls().playlist(file_id, _hls_source(file_id))
+    except hls.Busy:
+        return Response(status=503, headers={"Retry-After": "5"})
+    return Response(body, mimetype="application/vnd.apple.mpegurl")
+
+
+@app.route("/hls/<file_id>/<int:index>.ts")
+def hls_segment(file_id, index):
+    try:
+        path = get_hls().segment(file_id, _hls_source(file_id), index)
+    except hls.Busy:
+        return Response(status=503, headers={"Retry-After": "5"})
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype="video/mp2t", max_age=3600)
+
+
+@app.route("/api/subtitles/search")
+def api_subtitle_search():
+    db = get_db()
+    result = queries.search_subtitles(
+        db,
+        request.args.get("q", "").strip(),
+        request.args.get("limit", 50, type=int),
+    )
+    db.close()
+    return jsonify(result)
+
+
+@app.route("/api/jobs")
+def api_jobs():
+    db = get_db()
+    result = queries.job_status(db, request.args.get("failures", 20, type=int))
+    db.close()
+    return jsonify(result)
+
+
+@app.route("/api/stats")
+def api_stats():
+    """集計表（Script/library_stats.py rebuild で作る）を読むだけ。BD の集計は media.db があれば付ける。"""
+    db = get_db()
+    result = queries.library_stats(db, request.args.get("top", 50, type=int))
+    db.close()
+    if result is None:
+        abort(404)
+    result["media"] = None
+    if os.path.isfile(MEDIA_DB_PATH):
+        media = queries.connect(MEDIA_DB_PATH)
+        result["media"] = queries.media_stats(media)
+        media.close()
+    return jsonify(result)
 
 
 @app.route("/")
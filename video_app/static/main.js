@@ -1,24 +1,292 @@
-fetch("/api/videos")
-  .then(res => res.json())
-  .then(videos => {
-    const list = document.getElementById("video-list");
-
-    videos.forEach(v => {
-      const card = document.createElement("div");
-      card.className = "video-card";
-
-      card.innerHTML = `
-        <img src="${v.thumbnail_path || 'noimage.png'}">
-        <div class="info">
-          <div>${v.title}</div>
-          <small>${v.channel || ''}</small>
-        </div>
-      `;
-
-      list.appendChild(card);
+// 動画一覧（仮想スクロール）
+//  - ページ単位で取得し、見えている行のカードだけを DOM に置く
+//    検索なし: /api/listing/<page>（サーバで作成済みの gzip JSON。video_id 昇順）
+//    検索あり: /api/videos?q=...（新しい順）。一覧ページがまだ作られていないときも /api/videos を使う
+//  - サムネイルは IntersectionObserver で画面に近づいたときに読み込む
+//  - 検索ボックスの内容はサーバ側で絞り込む
+//  - カードにマウスを乗せると、/storyboard/<id>（WebVTT）とスプライト画像でプレビューする
+
+const PAGE_SIZE = 60;
+const CARD_WIDTH = 200;
+const CARD_HEIGHT = 190;
+const GAP = 16;
+const BUFFER_ROWS = 3;
+
+const list = document.getElementById("video-list");
+const spacer = document.createElement("div");
+spacer.className = "video-spacer";
+list.appendChild(spacer);
+
+let query = "";
+let total = 0;
+let listingPageSize = PAGE_SIZE;
+let useListing = false;      // 作成済みの一覧ページ（/api/listing）を使うか
+let generation = 0;          // 検索条件が変わるたびに増やし、古い応答を捨てる
+let pages = new Map();       // ページ番号 -> 動画の配列
+let loading = new Set();     // 取得中のページ番号
+let cards = new Map();       // 表示中の index -> カード要素
+
+const thumbObserver = new IntersectionObserver(entries => {
+  entries.forEach(entry => {
+    if (entry.isIntersecting) {
+      const img = entry.target;
+      img.src = img.dataset.src;
+      thumbObserver.unobserve(img);
+    }
+  });
+}, { root: list, rootMargin: "200px" });
+
+function columns() {
+  return Math.max(1, Math.floor((list.clientWidth - GAP) / (CARD_WIDTH + GAP)));
+}
+
+// 一覧ページは古い順に並んでいるので、表示位置を逆にたどる
+function pageOf(index) {
+  return useListing ? Math.floor((total - 1 - index) / listingPageSize) : Math.floor(index / PAGE_SIZE);
+}
+
+function slotOf(index) {
+  return useListing ? (total - 1 - index) % listingPageSize : index % PAGE_SIZE;
+}
+
+function pageUrl(page) {
+  if (useListing) {
+    return `/api/listing/${page}`;
+  }
+  const params = new URLSearchParams({ offset: page * PAGE_SIZE, limit: PAGE_SIZE, q: query });
+  return `/api/videos?${params}`;
+}
+
+function fetchPage(page) {
+  if (pages.has(page) || loading.has(page)) {
+    return;
+  }
+  loading.add(page);
+  const gen = generation;
+
+  fetch(pageUrl(page))
+    .then(res => res.json())
+    .then(data => {
+      if (gen !== generation) {
+        return;
+      }
+      loading.delete(page);
+      pages.set(page, Array.isArray(data) ? data : data.items);
+      if (data.total !== undefined && data.total !== null) {
+        total = data.total;
+        layout();
+      }
+      render();
+    })
+    .catch(err => {
+      loading.delete(page);
+      console.error(err);
+      alert("動画一覧の取得に失敗しました");
     });
-  })
-  .catch(err => {
-    console.error(err);
-    alert("動画一覧の取得に失敗しました");
+}
+
+function videoAt(index) {
+  const page = pages.get(pageOf(index));
+  return page ? page[slotOf(index)] : undefined;
+}
+
+// --------------------
+// ホバープレビュー
+// --------------------
+const storyboards = new Map();   // video_id -> Promise（コマの配列。無ければ null）
+
+function parseStoryboard(text) {
+  const re = /^(.+)#xywh=(\d+),(\d+),(\d+),(\d+)$/;
+  const cues = [];
+  text.split("\n").forEach(line => {
+    const m = re.exec(line.trim());
+    if (m) {
+      cues.push({ url: m[1], x: +m[2], y: +m[3], w: +m[4], h: +m[5] });
+    }
+  });
+  if (cues.length === 0) {
+    return null;
+  }
+  cues.width = Math.max(...cues.map(c => c.x + c.w));
+  cues.height = Math.max(...cues.map(c => c.y + c.h));
+  return cues;
+}
+
+function loadStoryboard(videoId) {
+  if (!storyboards.has(videoId)) {
+    storyboards.set(videoId, fetch(`/storyboard/${videoId}`)
+      .then(res => (res.ok ? res.text() : null))
+      .then(text => (text ? parseStoryboard(text) : null))
+      .catch(() => null));
+  }
+  return storyboards.get(videoId);
+}
+
+function attachPreview(card, img, videoId) {
+  const overlay = document.createElement("div");
+  overlay.className = "preview";
+  card.appendChild(overlay);
+
+  let cues = null;
+  let hovering = false;
+  card.addEventListener("mouseenter", () => {
+    hovering = true;
+    loadStoryboard(videoId).then(result => { cues = result; });
+  });
+  card.addEventListener("mouseleave", () => {
+    hovering = false;
+    overlay.style.display = "none";
   });
+  card.addEventListener("mousemove", e => {
+    if (!cues || !hovering) {
+      return;
+    }
+    // カーソルの横位置を動画内の位置とみなしてコマを選ぶ
+    const rect = img.getBoundingClientRect();
+    const ratio = Math.min(Math.max((e.clientX - rect.left) / rect.width, 0), 0.999);
+    const cue = cues[Math.floor(ratio * cues.length)];
+    const scale = rect.width / cue.w;
+    overlay.style.backgroundImage = `url("${cue.url}")`;
+    overlay.style.backgroundSize = `${cues.width * scale}px ${cues.height * scale}px`;
+    overlay.style.backgroundPosition = `${-cue.x * scale}px ${-cue.y * scale}px`;
+    overlay.style.display = "block";
+  });
+}
+
+function createCard(v) {
+  const card = document.createElement("div");
+  card.className = "video-card";
+
+  const img = document.createElement("img");
+  img.loading = "lazy";
+  img.alt = "";
+  img.dataset.src = v.thumbnail || "noimage.png";
+  img.onerror = () => { img.onerror = null; img.src = "noimage.png"; };
+  thumbObserver.observe(img);
+
+  const info = document.createElement("div");
+  info.className = "info";
+  const title = document.createElement("div");
+  title.textContent = v.title;
+  const author = document.createElement("small");
+  author.textContent = v.author || "";
+  info.append(title, author);
+
+  card.append(img, info);
+  attachPreview(card, img, v.video_id);
+  return card;
+}
+
+function removeCard(index) {
+  const card = cards.get(index);
+  const img = card.querySelector("img");
+  if (img) {
+    thumbObserver.unobserve(img);
+  }
+  card.remove();
+  cards.delete(index);
+}
+
+function layout() {
+  const rows = Math.ceil(total / columns());
+  spacer.style.height = `${rows * (CARD_HEIGHT + GAP) + GAP}px`;
+}
+
+function render() {
+  const cols = columns();
+  const rowHeight = CARD_HEIGHT + GAP;
+  const firstRow = Math.max(0, Math.floor(list.scrollTop / rowHeight) - BUFFER_ROWS);
+  const lastRow = Math.ceil((list.scrollTop + list.clientHeight) / rowHeight) + BUFFER_ROWS;
+  const first = firstRow * cols;
+  const last = Math.min(total, lastRow * cols);
+
+  // 範囲外のカードを外す
+  for (const index of [...cards.keys()]) {
+    if (index < first || index >= last) {
+      removeCard(index);
+    }
+  }
+
+  // 足りないページを取得し、取得済みのものだけカードを置く
+  for (let index = first; index < last; index++) {
+    if (cards.has(index)) {
+      continue;
+    }
+    const v = videoAt(index);
+    if (v === undefined) {
+      fetchPage(pageOf(index));
+      continue;
+    }
+    const card = createCard(v);
+    card.style.transform =
+      `translate(${GAP + (index % cols) * (CARD_WIDTH + GAP)}px, ${GAP + Math.floor(index / cols) * rowHeight}px)`;
+    cards.set(index, card);
+    spacer.appendChild(card);
+  }
+}
+
+function reset() {
+  generation++;
+  pages = new Map();
+  loading = new Set();
+  [...cards.keys()].forEach(removeCard);
+  total = 0;
+  list.scrollTop = 0;
+  useListing = false;
+  if (query) {
+    fetchPage(0);
+    return;
+  }
+
+  const gen = generation;
+  fetch("/api/listing")
+    .then(res => (res.ok ? res.json() : null))
+    .then(state => {
+      if (gen !== generation) {
+        return;
+      }
+      if (state === null) {
+        // 一覧ページがまだ作られていない（playlist_register / checkin の前）ので、DB から直接ページを読む
+        fetchPage(0);
+        return;
+      }
+      useListing = true;
+      total = state.total;
+      listingPageSize = state.page_size;
+      layout();
+      render();
+    })
+    .catch(err => {
+      console.error(err);
+      alert("動画一覧の取得に失敗しました");
+    });
+}
+
+let scheduled = false;
+list.addEventListener("scroll", () => {
+  if (!scheduled) {
+    scheduled = true;
+    requestAnimationFrame(() => {
+      scheduled = false;
+      render();
+    });
+  }
+});
+
+window.addEventListener("resize", () => {
+  // 列数が変わると位置がすべて変わるので置き直す
+  [...cards.keys()].forEach(removeCard);
+  layout();
+  render();
+});
+
+let searchTimer = null;
+document.getElementById("search").addEventListener("input", e => {
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(() => {
+    query = e.target.value.trim();
+    reset();
+  }, 300);
+});
+
+reset();